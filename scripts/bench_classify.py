@@ -0,0 +1,78 @@
+"""Throughput benchmark for the batch commit classifier.
+
+Usage: python -m scripts.bench_classify [--count 1000000] [--unique 50000]
+"""
+import argparse
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from scripts.classify_change import classify_subject, classify_subjects
+
+TEMPLATES = [
+    'feat({scope}): add {noun} support',
+    'fix({scope}): handle empty {noun}',
+    'fix!: drop legacy {noun} format',
+    'docs: update {noun} section in README',
+    'refactor({scope}): cleanup {noun} handling',
+    'chore(deps): bump {noun} from 1.{n}.0 to 1.{m}.0',
+    'perf: speed up {noun} lookups',
+    'Add {noun} to the {scope} page',
+    'Merge pull request #{n} from team/{noun}',
+    'address review comments on {noun}',
+    'fix lint again',
+]
+NOUNS = ['tag', 'changelog', 'release', 'token', 'prompt', 'issue', 'label', 'commit', 'page', 'cache']
+SCOPES = ['api', 'ui', 'cli', 'ingest', 'llm', 'publish']
+
+
+def legacy_classify(subject: str) -> str:
+    """The previous four-search implementation, kept for comparison."""
+    s = subject.lower()
+    if re.search(r'\bfeat\b|feature|add ', s):
+        return 'feature'
+    if re.search(r'\bfix\b|bugfix|patch', s):
+        return 'bug'
+    if re.search(r'doc|readme|changelog', s):
+        return 'docs'
+    if re.search(r'refactor|cleanup', s):
+        return 'refactor'
+    return 'unknown'
+
+
+def make_subjects(count: int, unique: int, seed: int = 7) -> list:
+    rng = random.Random(seed)
+    pool = [
+        rng.choice(TEMPLATES).format(
+            scope=rng.choice(SCOPES), noun=rng.choice(NOUNS), n=rng.randint(1, 9999), m=rng.randint(1, 99)
+        )
+        for _ in range(unique)
+    ]
+    return [rng.choice(pool) for _ in range(count)]
+
+
+def timed(label: str, func, subjects) -> None:
+    start = time.perf_counter()
+    func(subjects)
+    elapsed = time.perf_counter() - start
+    print(f'{label:<28} {elapsed:8.3f}s  {len(subjects) / elapsed / 1e6:6.2f}M subjects/s')
+
+
+if __name__ == '__main__':
+    p = argparse.ArgumentParser(description='Benchmark commit classification throughput')
+    p.add_argument('--count', type=int, default=1_000_000, help='Number of subjects to classify')
+    p.add_argument('--unique', type=int, default=50_000, help='Number of distinct subjects')
+    args = p.parse_args()
+
+    subjects = make_subjects(args.count, args.unique)
+    print(f'{args.count} subjects, {args.unique} distinct')
+
+    timed('legacy per-commit loop', lambda items: [legacy_classify(s) for s in items], subjects)
+    classify_subject.cache_clear()
+    timed('classify_subjects (cold)', classify_subjects, subjects)
+    timed('classify_subjects (warm)', classify_subjects, subjects)
+    print(f'cache: {classify_subject.cache_info()}')
@@ -1,15 +1,118 @@
-"""Simple rule-based classifier for commit messages."""
+"""Rule-based classifier for commit messages.
+
+Conventional-commit headers (``type(scope)!: description``) are parsed first;
+anything else falls back to keyword rules matched by one compiled alternation.
+"""
 import re
-from typing import Literal
-
-def classify_commit(subject: str) -> Literal['feature','bug','docs','chore','refactor','unknown']:
-    s = subject.lower()
-    if re.search(r'\bfeat\b|feature|add ', s):
-        return 'feature'
-    if re.search(r'\bfix\b|bugfix|patch', s):
-        return 'bug'
-    if re.search(r'doc|readme|changelog', s):
-        return 'docs'
-    if re.search(r'refactor|cleanup', s):
-        return 'refactor'
-    return 'unknown'
+from functools import lru_cache
+from typing import Dict, Iterable, List, Literal, NamedTuple, Optional, Union
+
+CommitType = Literal['feature', 'bug', 'docs', 'chore', 'refactor', 'unknown']
+
+HEADER_RE = re.compile(
+    r'^(?P<type>[A-Za-z]+)(?:\((?P<scope>[^()]*)\))?(?P<breaking>!)?:[ \t]*(?P<description>.*)$'
+)
+BREAKING_RE = re.compile(r'^BREAKING[ -]CHANGE:', re.MULTILINE)
+
+# Conventional-commit types mapped onto the classifier's categories
+TYPE_MAP: Dict[str, CommitType] = {
+    'feat': 'feature', 'feature': 'feature',
+    'fix': 'bug', 'bugfix': 'bug', 'hotfix': 'bug',
+    'docs': 'docs', 'doc': 'docs',
+    'refactor': 'refactor', 'perf': 'refactor',
+    'chore': 'chore', 'build': 'chore', 'ci': 'chore', 'style': 'chore',
+    'test': 'chore', 'tests': 'chore', 'deps': 'chore', 'revert': 'chore',
+}
+
+# One pass over the subject; the group name is the category. When several
+# groups match, the earliest entry in KEYWORD_PRIORITY wins.
+KEYWORD_RE = re.compile(
+    r'(?P<feature>\bfeat\b|feature|add )'
+    r'|(?P<bug>\bfix\b|bugfix|patch)'
+    r'|(?P<docs>doc|readme|changelog)'
+    r'|(?P<refactor>refactor|cleanup)'
+    r'|(?P<chore>\bchore\b|\bbump\b|\bdeps?\b|dependenc|\bci\b|\blint\b)'
+)
+KEYWORD_PRIORITY = {'feature': 0, 'bug': 1, 'docs': 2, 'refactor': 3, 'chore': 4}
+
+
+class Classification(NamedTuple):
+    type: CommitType
+    scope: Optional[str] = None
+    breaking: bool = False
+    conventional: bool = False
+
+
+def parse_conventional(subject: str) -> Optional[Dict]:
+    """Split a conventional-commit header into type, scope, breaking flag and description."""
+    match = HEADER_RE.match(subject.strip())
+    if not match:
+        return None
+    return {
+        'type': match.group('type').lower(),
+        'scope': match.group('scope') or None,
+        'breaking': bool(match.group('breaking')),
+        'description': match.group('description'),
+    }
+
+
+def _keyword_type(subject: str) -> CommitType:
+    best = None
+    for match in KEYWORD_RE.finditer(subject.lower()):
+        kind = match.lastgroup
+        if best is None or KEYWORD_PRIORITY[kind] < KEYWORD_PRIORITY[best]:
+            best = kind
+            if best == 'feature':
+                break
+    return best or 'unknown'
+
+
+@lru_cache(maxsize=65536)
+def classify_subject(subject: str) -> Classification:
+    """Classify one subject line; results are memoised by subject."""
+    header = parse_conventional(subject)
+    if header and header['type'] in TYPE_MAP:
+        return Classification(TYPE_MAP[header['type']], header['scope'], header['breaking'], True)
+    kind = _keyword_type(subject)
+    if header:
+        # Unknown type prefix such as "bugfix(x): ..." still carries scope and "!"
+        return Classification(kind, header['scope'], header['breaking'], False)
+    return Classification(kind)
+
+
+def classify_subjects(subjects: Iterable[str]) -> List[Classification]:
+    """Classify a whole list of subjects in one call."""
+    return [classify_subject(subject) for subject in subjects]
+
+
+def classify_commits(commits: List[Dict], model=None, min_confidence: float = 0.6) -> List[Dict]:
+    """Annotate commit dicts in place with ``type``, ``scope`` and ``breaking``.
+
+    A ``BREAKING CHANGE:`` trailer, found by ``extract_commits_local``
+    (``breaking_trailer``, folded into ``breaking`` here) or in an
+    already-loaded body, also marks the commit as breaking. When a trained ``model`` (see ``scripts.commit_model``)
+    is given, commits the rules leave as ``unknown`` are labelled by it in one
+    batch if it is confident enough.
+    """
+    unknown = []
+    for commit, result in zip(commits, classify_subjects(c.get('subject', '') for c in commits)):
+        commit['type'] = result.type
+        commit['scope'] = result.scope
+        commit['breaking'] = result.breaking or commit.pop('breaking_trailer', False) or bool(
+            commit.get('body') and BREAKING_RE.search(commit['body'])
+        )
+        if result.type == 'unknown':
+            unknown.append(commit)
+
+    if model is not None and unknown:
+        predictions = model.predict([c.get('subject', '') for c in unknown], min_confidence=min_confidence)
+        for commit, (label, _) in zip(unknown, predictions):
+            commit['type'] = label
+    return commits
+
+
+def classify_commit(subject: Union[str, Dict]) -> CommitType:
+    """Classify a single commit subject (or commit dict) into a category."""
+    if isinstance(subject, dict):
+        subject = subject.get('subject', '')
+    return classify_subject(subject).type
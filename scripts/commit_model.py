@@ -0,0 +1,219 @@
+"""Trainable hashed-feature naive Bayes commit classifier (optional, needs numpy).
+
+The model is trained offline from a repository's own history, using commits
+that follow the conventional-commit format as weak labels, and saved as a
+small ``.npz`` file. Inference scores a whole batch of subjects with one
+gather + ``reduceat`` over the feature log-probability matrix.
+
+That matrix step handles a few thousand subjects per millisecond, but the
+end-to-end rate is bound by tokenising and hashing subjects in Python: about
+100 new subjects per ms, and under 1000 per ms for subjects already featurised
+(kept per model, ``FEATURE_CACHE_SIZE``). Release-sized batches (thousands of
+commits) still take tens of milliseconds.
+
+numpy is an optional dependency (see requirements.txt); without it
+``get_model`` returns None and classification stays rule-based.
+
+Usage:
+  python -m scripts.commit_model train --repo-path . --out models/commit_classifier.npz
+  python -m scripts.commit_model predict --model models/commit_classifier.npz "Add dark mode"
+"""
+import argparse
+import re
+import sys
+import zlib
+from functools import lru_cache
+from itertools import chain
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from scripts.classify_change import TYPE_MAP, parse_conventional
+
+DEFAULT_MODEL_PATH = 'models/commit_classifier.npz'
+
+TOKEN_RE = re.compile(r"[a-z0-9_']+")
+BIAS_FEATURE = '__bias__'
+# Featurised subjects kept per model; repeated subjects skip tokenising and hashing
+FEATURE_CACHE_SIZE = 65536
+
+
+def _numpy():
+    try:
+        import numpy as np
+        return np
+    except ImportError:
+        raise ValueError("numpy package not installed. Run: pip install numpy")
+
+
+@lru_cache(maxsize=262144)
+def _hash_feature(feature: str) -> int:
+    return zlib.crc32(feature.encode('utf-8'))
+
+
+def tokenize(subject: str) -> List[str]:
+    """Unigrams and bigrams of the lowercased subject plus a bias feature."""
+    words = TOKEN_RE.findall(subject.lower())
+    return [BIAS_FEATURE] + words + [f'{a} {b}' for a, b in zip(words, words[1:])]
+
+
+class HashedNaiveBayes:
+    """Multinomial naive Bayes over hashed unigram/bigram features."""
+
+    def __init__(self, n_features: int = 2 ** 16, alpha: float = 0.5):
+        if n_features & (n_features - 1):
+            raise ValueError("n_features must be a power of two")
+        self.n_features = n_features
+        self.alpha = alpha
+        self.classes: List[str] = []
+        self.feature_log_prob = None  # (n_features, n_classes)
+        self.class_log_prior = None   # (n_classes,)
+        self._class_log_prob = None   # feature_log_prob.T, contiguous: one row per class
+        self._features = lru_cache(maxsize=FEATURE_CACHE_SIZE)(self._subject_features)
+
+    def _subject_features(self, subject: str) -> Tuple[int, ...]:
+        mask = self.n_features - 1
+        return tuple(_hash_feature(token) & mask for token in tokenize(subject))
+
+    def _featurize(self, subjects: Sequence[str]):
+        np = _numpy()
+        features = list(map(self._features, subjects))
+        lengths = np.fromiter(map(len, features), dtype=np.int64, count=len(features))
+        offsets = np.zeros(len(features), dtype=np.int64)
+        np.cumsum(lengths[:-1], out=offsets[1:])
+        indices = np.fromiter(chain.from_iterable(features), dtype=np.int64, count=int(lengths.sum()))
+        return indices, offsets
+
+    def _set_params(self, feature_log_prob, class_log_prior) -> None:
+        np = _numpy()
+        self.feature_log_prob = feature_log_prob
+        self.class_log_prior = class_log_prior
+        # Class-major rows keep the per-class gathers within one contiguous row
+        self._class_log_prob = np.ascontiguousarray(feature_log_prob.T)
+
+    def fit(self, subjects: Sequence[str], labels: Sequence[str]) -> 'HashedNaiveBayes':
+        np = _numpy()
+        self.classes = sorted(set(labels))
+        class_ids = {c: i for i, c in enumerate(self.classes)}
+        indices, offsets = self._featurize(subjects)
+
+        lengths = np.diff(np.append(offsets, len(indices)))
+        rows = np.repeat(np.asarray([class_ids[label] for label in labels]), lengths)
+        counts = np.zeros((len(self.classes), self.n_features), dtype=np.float64)
+        np.add.at(counts, (rows, indices), 1.0)
+
+        smoothed = counts + self.alpha
+        log_prob = np.log(smoothed) - np.log(smoothed.sum(axis=1, keepdims=True))
+        class_counts = np.bincount([class_ids[label] for label in labels], minlength=len(self.classes))
+        self._set_params(np.ascontiguousarray(log_prob.T, dtype=np.float32),
+                         np.log(class_counts / class_counts.sum()).astype(np.float32))
+        return self
+
+    def predict_log_proba(self, subjects: Sequence[str]):
+        """Normalised class log-probabilities, one row per subject."""
+        np = _numpy()
+        if self.feature_log_prob is None:
+            raise ValueError("Model is not trained")
+        if not subjects:
+            return np.zeros((0, len(self.classes)), dtype=np.float32)
+        indices, offsets = self._featurize(subjects)
+        scores = np.add.reduceat(self._class_log_prob[:, indices], offsets, axis=1).T + self.class_log_prior
+        scores -= scores.max(axis=1, keepdims=True)
+        return scores - np.log(np.exp(scores).sum(axis=1, keepdims=True))
+
+    def predict(self, subjects: Sequence[str], min_confidence: float = 0.0) -> List[Tuple[str, float]]:
+        """(label, probability) per subject; ``unknown`` below ``min_confidence``."""
+        np = _numpy()
+        log_proba = self.predict_log_proba(subjects)
+        best = log_proba.argmax(axis=1)
+        confidence = np.exp(log_proba[np.arange(len(best)), best])
+        labels = np.where(confidence >= min_confidence, np.asarray(self.classes, dtype=object)[best], 'unknown')
+        return list(zip(labels.tolist(), confidence.tolist()))
+
+    def save(self, path: str) -> None:
+        np = _numpy()
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        np.savez_compressed(
+            path,
+            classes=np.asarray(self.classes),
+            feature_log_prob=self.feature_log_prob,
+            class_log_prior=self.class_log_prior,
+            params=np.asarray([self.n_features, self.alpha]),
+        )
+
+    @classmethod
+    def load(cls, path: str) -> 'HashedNaiveBayes':
+        np = _numpy()
+        with np.load(path) as data:
+            model = cls(int(data['params'][0]), float(data['params'][1]))
+            model.classes = [str(c) for c in data['classes']]
+            model._set_params(data['feature_log_prob'], data['class_log_prior'])
+        return model
+
+
+def weak_labels(commits: Sequence[Dict]) -> Tuple[List[str], List[str]]:
+    """Training pairs from conventional commits: (description, mapped type).
+
+    The ``type(scope):`` prefix is stripped so the model learns from the
+    wording that non-conventional commits share.
+    """
+    subjects, labels = [], []
+    for commit in commits:
+        header = parse_conventional(commit.get('subject', ''))
+        if header and header['type'] in TYPE_MAP and header['description']:
+            subjects.append(header['description'])
+            labels.append(TYPE_MAP[header['type']])
+    return subjects, labels
+
+
+def train_from_history(path: str = '.', since: Optional[str] = None, min_examples: int = 20) -> HashedNaiveBayes:
+    """Train on the local repository's conventional-commit history."""
+    from scripts.extract_commits import extract_commits_local
+
+    subjects, labels = weak_labels(extract_commits_local(path, since=since))
+    if len(subjects) < min_examples or len(set(labels)) < 2:
+        raise ValueError(
+            f"Not enough conventional commits to train on ({len(subjects)} examples, "
+            f"{len(set(labels))} types)"
+        )
+    return HashedNaiveBayes().fit(subjects, labels)
+
+
+_models: Dict[str, Optional[HashedNaiveBayes]] = {}
+
+
+def get_model(path: Optional[str] = None) -> Optional[HashedNaiveBayes]:
+    """Load and cache a trained model; None when the file or numpy is missing."""
+    path = path or DEFAULT_MODEL_PATH
+    if path not in _models:
+        try:
+            _models[path] = HashedNaiveBayes.load(path) if Path(path).exists() else None
+        except (ValueError, OSError) as e:
+            print(f"Warning: could not load commit classifier model {path}: {e}")
+            _models[path] = None
+    return _models[path]
+
+
+if __name__ == '__main__':
+    p = argparse.ArgumentParser(description='Train or query the statistical commit classifier')
+    sub = p.add_subparsers(dest='command', required=True)
+
+    train = sub.add_parser('train', help='Train from local git history')
+    train.add_argument('--repo-path', default='.', help='Path to the git repository')
+    train.add_argument('--since', default=None, help='Only use commits since this date')
+    train.add_argument('--out', default=DEFAULT_MODEL_PATH, help='Where to write the model')
+
+    predict = sub.add_parser('predict', help='Classify subjects with a trained model')
+    predict.add_argument('--model', default=DEFAULT_MODEL_PATH, help='Model file')
+    predict.add_argument('subjects', nargs='+', help='Commit subjects to classify')
+
+    args = p.parse_args()
+    if args.command == 'train':
+        model = train_from_history(args.repo_path, since=args.since)
+        model.save(args.out)
+        print(f'Trained on classes {model.classes}; wrote {args.out}')
+    else:
+        model = HashedNaiveBayes.load(args.model)
+        for subject, (label, confidence) in zip(args.subjects, model.predict(args.subjects)):
+            print(f'{label:<10} {confidence:5.2f}  {subject}')
@@ -18,30 +18,101 @@ try:
 except ImportError:
     pass
 
-def extract_commits_local(path: str = '.', since: str | None = None, until: str | None = None) -> List[Dict]:
-    """Extract commits from local git repository."""
+def extract_commits_local(path: str = '.', since: str | None = None, until: str | None = None,
+                          with_body: bool = False) -> List[Dict]:
+    """Extract commit headers from local git repository.
+
+    Bodies are left out unless ``with_body`` is set; call ``load_commit_bodies``
+    for just the commits that end up in the prompt. Commits whose message has a
+    ``BREAKING CHANGE:`` trailer get ``breaking_trailer`` set, so classification
+    sees it without their bodies.
+    """
+    # Unit/record separators keep subjects containing '|' intact
     cmd = [
-        'git', '-C', path, 'log', '--pretty=format:%H|%an|%s|%b|%cd|%ci'
+        'git', '-C', path, 'log', '--pretty=format:%H%x1f%an%x1f%s%x1f%cd%x1f%ci%x1e'
     ]
     if since:
         cmd.extend(['--since', since])
     if until:
         cmd.extend(['--until', until])
     out = subprocess.check_output(cmd, text=True, stderr=subprocess.DEVNULL)
+    # git searches the messages itself, so only the hashes of breaking commits come back
+    breaking = set(subprocess.check_output(
+        cmd[:4] + ['--format=%H', '-E', '--grep=^BREAKING[ -]CHANGE:'] + cmd[5:],
+        text=True, stderr=subprocess.DEVNULL
+    ).split())
     commits = []
-    for line in out.splitlines():
-        if not line.strip():
-            continue
-        parts = line.split('|', 5)
-        if len(parts) >= 6:
+    for record in out.split('\x1e'):
+        parts = record.strip('\n').split('\x1f')
+        if len(parts) == 5:
             commits.append({
                 'hash': parts[0],
                 'author': parts[1],
                 'subject': parts[2],
-                'body': parts[3],
-                'date': parts[4],
-                'commit_date': parts[5]
+                'date': parts[3],
+                'commit_date': parts[4],
+                'breaking_trailer': parts[0] in breaking
             })
+    if with_body:
+        load_commit_bodies(commits, path)
+    return commits
+
+def load_commit_bodies(commits: List[Dict], path: str = '.', max_chars: Optional[int] = None) -> List[Dict]:
+    """Fill in 'body' for header-only commits through a single git cat-file --batch session."""
+    pending = [c for c in commits if 'body' not in c and c.get('hash')]
+    if not pending:
+        return commits
+    
+    request = ''.join(f"{c.get('full_hash') or c['hash']}\n" for c in pending).encode()
+    try:
+        out = subprocess.run(
+            ['git', '-C', path, 'cat-file', '--batch'],
+            input=request, capture_output=True, check=True
+        ).stdout
+    except (OSError, subprocess.CalledProcessError):
+        for c in pending:
+            c['body'] = ''
+        return commits
+    
+    pos = 0
+    for c in pending:
+        newline = out.index(b'\n', pos)
+        header = out[pos:newline].split()
+        pos = newline + 1
+        if len(header) != 3 or header[1] != b'commit':
+            # "<object> missing" has no payload
+            c['body'] = ''
+            continue
+        size = int(header[2])
+        raw = out[pos:pos + size]
+        pos += size + 1
+        message = raw.split(b'\n\n', 1)[1] if b'\n\n' in raw else b''
+        body = message.decode('utf-8', errors='replace').partition('\n')[2].strip()
+        c['body'] = body[:max_chars] if max_chars else body
+    return commits
+
+def load_commit_paths(commits: List[Dict], path: str = '.') -> List[Dict]:
+    """Fill in 'files' (changed paths) for commits missing it, with one git log --stdin --no-walk run."""
+    pending = [c for c in commits if 'files' not in c and c.get('hash')]
+    if not pending:
+        return commits
+
+    request = ''.join(f"{c.get('full_hash') or c['hash']}\n" for c in pending)
+    try:
+        out = subprocess.run(
+            ['git', '-C', path, 'log', '--stdin', '--no-walk=unsorted', '--name-only', '--format=%x1e%H'],
+            input=request, capture_output=True, text=True, check=True
+        ).stdout
+    except (OSError, subprocess.CalledProcessError):
+        # Commits from GitHub may not exist locally; themes then fall back to text only
+        return commits
+
+    files = {}
+    for record in out.split('\x1e')[1:]:
+        sha, _, names = record.partition('\n')
+        files[sha.strip()] = [name for name in names.split('\n') if name]
+    for c in pending:
+        c['files'] = files.get(c.get('full_hash') or c['hash'], [])
     return commits
 
 def extract_commits_github(repo: str, token: str, since: str | None = None, until: str | None = None, sha: str | None = None) -> List[Dict]:
@@ -1,11 +1,39 @@
 """Fetch previous release notes and changelogs from GitHub."""
+import os
 import requests
 import yaml
-from typing import List, Dict, Optional
+from itertools import islice
+from typing import Callable, Dict, Iterator, List, Optional
 from datetime import datetime
 
-def fetch_github_releases(repo: str, token: str, limit: int = 10) -> List[Dict]:
-    """Fetch GitHub releases."""
+# Common changelog file names, in order of preference
+CHANGELOG_FILES = ['CHANGELOG.md', 'CHANGELOG', 'Changelog.md', 'changelog.md', 'HISTORY.md']
+
+_changelog_blobs: Dict[str, str] = {}
+
+def iter_releases(repo: str, headers: Dict, per_page: int = 30) -> Iterator[Dict]:
+    """Releases of ``repo`` as the API returns them, newest first.
+    
+    Pages are requested lazily by following the ``next`` links, so a caller
+    that stops early never downloads the pages after the one it stopped in.
+    """
+    url = f'https://api.github.com/repos/{repo}/releases'
+    params = {'per_page': max(1, min(per_page, 100))}
+    while url:
+        r = requests.get(url, headers=headers, params=params)
+        r.raise_for_status()
+        yield from r.json()
+        url = r.links.get('next', {}).get('url')
+        params = {}
+
+def fetch_github_releases(repo: str, token: str, limit: int = 10, body_limit: Optional[int] = None,
+                          skip: Optional[Callable[[Dict], bool]] = None,
+                          per_page: Optional[int] = None) -> List[Dict]:
+    """Fetch GitHub releases, optionally keeping only the first ``body_limit`` chars of each body.
+    
+    Releases for which ``skip`` (given the API's release dict) is true are
+    passed over and do not count towards ``limit``.
+    """
     # Reload environment variables to ensure we have latest token
     import os
     from pathlib import Path
@@ -36,38 +64,23 @@ def fetch_github_releases(repo: str, token: str, limit: int = 10) -> List[Dict]:
         'Accept': 'application/vnd.github.v3+json'
     }
     
-    url = f'https://api.github.com/repos/{repo}/releases'
-    params = {'per_page': limit}
-    
+    wanted = (r for r in iter_releases(repo, headers, per_page or limit) if skip is None or not skip(r))
     releases = []
-    while url:
-        r = requests.get(url, headers=headers, params=params)
-        r.raise_for_status()
-        data = r.json()
-        
-        for release in data:
-            releases.append({
-                'tag_name': release.get('tag_name', ''),
-                'name': release.get('name', ''),
-                'body': release.get('body', ''),
-                'published_at': release.get('published_at', ''),
-                'created_at': release.get('created_at', ''),
-                'author': release.get('author', {}).get('login', '') if release.get('author') else '',
-                'prerelease': release.get('prerelease', False),
-                'draft': release.get('draft', False),
-                'url': release.get('html_url', '')
-            })
-        
-        if 'next' in r.links:
-            url = r.links['next']['url']
-            params = {}
-        else:
-            url = None
-        
-        if len(releases) >= limit:
-            break
+    for release in islice(wanted, limit):
+        body = release.get('body') or ''
+        releases.append({
+            'tag_name': release.get('tag_name', ''),
+            'name': release.get('name', ''),
+            'body': body[:body_limit] if body_limit else body,
+            'published_at': release.get('published_at', ''),
+            'created_at': release.get('created_at', ''),
+            'author': release.get('author', {}).get('login', '') if release.get('author') else '',
+            'prerelease': release.get('prerelease', False),
+            'draft': release.get('draft', False),
+            'url': release.get('html_url', '')
+        })
     
-    return releases[:limit]
+    return releases
 
 def fetch_release_by_tag(repo: str, token: str, tag: str) -> Optional[Dict]:
     """Fetch a specific release by tag."""
@@ -151,39 +164,77 @@ def fetch_changelog_from_repo(repo: str, token: str) -> Optional[str]:
     
     headers = {
         'Authorization': f'token {token}',
-        'Accept': 'application/vnd.github.v3.raw'
+        'Accept': 'application/vnd.github.v3+json'
     }
     
-    # Try common changelog file names
-    changelog_files = ['CHANGELOG.md', 'CHANGELOG', 'Changelog.md', 'changelog.md', 'HISTORY.md']
-    
-    for filename in changelog_files:
-        try:
-            url = f'https://api.github.com/repos/{repo}/contents/{filename}'
-            r = requests.get(url, headers=headers)
-            if r.status_code == 200:
-                content = r.json().get('content', '')
-                # Base64 decode if needed
-                import base64
-                if content:
-                    return base64.b64decode(content).decode('utf-8')
-        except:
-            continue
+    # One listing of the repository root gives every candidate's blob SHA
+    try:
+        r = requests.get(f'https://api.github.com/repos/{repo}/contents/', headers=headers)
+        if r.status_code != 200:
+            return None
+        blobs = {entry['name']: entry['sha'] for entry in r.json() if entry.get('type') == 'file'}
+        
+        for filename in CHANGELOG_FILES:
+            sha = blobs.get(filename)
+            if sha:
+                return _fetch_changelog_blob(repo, sha, headers)
+    except requests.RequestException as e:
+        print(f"Error fetching changelog: {e}")
     
     return None
 
-def get_previous_release_notes(repo: str, token: str, current_version: str, count: int = 3) -> List[Dict]:
-    """Get previous release notes before the current version."""
-    releases = fetch_github_releases(repo, token, limit=50)
-    
-    # Filter out current version and get previous ones
-    previous = []
-    for release in releases:
-        if release['tag_name'] != current_version and not release['draft']:
-            previous.append(release)
-        if len(previous) >= count:
-            break
+def _fetch_changelog_blob(repo: str, sha: str, headers: Dict) -> Optional[str]:
+    """Return blob content, downloading it only if this SHA was never seen before."""
+    if sha in _changelog_blobs:
+        return _changelog_blobs[sha]
+    
+    try:
+        from src.utils import cache_dir
+        cache_file = cache_dir('changelogs') / sha
+    except ImportError:
+        cache_file = None
+    
+    if cache_file is not None and cache_file.exists():
+        content = cache_file.read_text(encoding='utf-8')
+    else:
+        r = requests.get(
+            f'https://api.github.com/repos/{repo}/git/blobs/{sha}',
+            headers={**headers, 'Accept': 'application/vnd.github.v3.raw'}
+        )
+        if r.status_code != 200:
+            return None
+        content = r.content.decode('utf-8', errors='replace')
+        if cache_file is not None:
+            # Blobs are content-addressed, so a cached copy never goes stale; it is written
+            # aside and renamed so an interrupted write cannot leave a truncated copy behind
+            tmp = cache_file.with_suffix(f'.{os.getpid()}.tmp')
+            try:
+                tmp.write_text(content, encoding='utf-8')
+                os.replace(tmp, cache_file)
+            except OSError as e:
+                print(f"Warning: could not cache changelog blob {sha}: {e}")
+                tmp.unlink(missing_ok=True)
+    
+    _changelog_blobs[sha] = content
+    return content
+
+_previous_release_cache: Dict[tuple, List[Dict]] = {}
+
+def get_previous_release_notes(repo: str, token: str, current_version: str, count: int = 3,
+                               body_limit: Optional[int] = 500) -> List[Dict]:
+    """Get previous release notes before the current version, memoised per (repo, version)."""
+    cache_key = (repo, current_version, count, body_limit)
+    if cache_key in _previous_release_cache:
+        return _previous_release_cache[cache_key]
+    
+    # Newest first; drafts and the current version are passed over while paging, so each
+    # page is read once and only until ``count`` releases are found or none are left
+    previous = fetch_github_releases(
+        repo, token, limit=count, body_limit=body_limit, per_page=count * 2,
+        skip=lambda r: r.get('draft') or r.get('tag_name') == current_version
+    )
     
+    _previous_release_cache[cache_key] = previous
     return previous
 
 if __name__ == '__main__':
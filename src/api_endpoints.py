@@ -1,7 +1,9 @@
 """Enhanced API endpoints for the release notes generator."""
-import asyncio
 import json
 import os
+import queue
+import re
+import threading
 from datetime import datetime
 from pathlib import Path
 from typing import Dict, List, Optional, Any
@@ -23,10 +25,19 @@ try:
     print("Nuclear GitHub fix activated")
 except Exception as e:
     print(f"Warning: Nuclear fix failed: {e}")
-from src.llm_service import LLMService, list_available_models
+from src.llm_service import GENERATION_MODES, LLMService, list_available_models
+from src.llm_clients import run_async
+from src.template_registry import get_template_registry
+from src.llm_cache import get_response_cache
+from src.resilience import breaker_states
+from src.rate_limit import get_admission_controller
+from src.ollama_client import get_ollama_client
 from src.publish_to_confluence import publish as publish_to_confluence
 from src.enhanced_api_endpoints import add_enhanced_endpoints
 
+# Release versions accepted by the generation endpoints (they become part of file names)
+VERSION_RE = re.compile(r'^[A-Za-z0-9][A-Za-z0-9._+-]{0,99}$')
+
 
 def create_enhanced_app() -> Flask:
     """Create Flask app with enhanced endpoints."""
@@ -35,6 +46,11 @@ def create_enhanced_app() -> Flask:
     # Disable Flask's default error handlers that return HTML
     app.config['PROPAGATE_EXCEPTIONS'] = True
     
+    # Compile all templates up front so broken placeholders are reported at startup
+    get_template_registry()
+    # Start loading local models now so the first generation does not wait for a cold load
+    LLMService().warm_up_local_models()
+    
     # CORS headers
     @app.after_request
     def add_cors_headers(resp):
@@ -239,7 +255,7 @@ def create_enhanced_app() -> Flask:
             
             # Test the model
             llm_service = LLMService()
-            result = asyncio.run(llm_service.call_llm(test_prompt, model, 0.0))
+            result = run_async(llm_service.call_llm(test_prompt, model, 0.0))
             
             return jsonify({
                 'status': 'ok',
@@ -264,7 +280,7 @@ def create_enhanced_app() -> Flask:
             branch = request.args.get('branch')
             
             service = DataIngestionService()
-            commits = asyncio.run(service.ingest_commits(
+            commits = run_async(service.ingest_commits(
                 source=source,
                 repo=repo,
                 from_tag=from_tag,
@@ -296,7 +312,7 @@ def create_enhanced_app() -> Flask:
             project_key = request.args.get('project_key')
             
             service = DataIngestionService()
-            issues = asyncio.run(service.ingest_issues(
+            issues = run_async(service.ingest_issues(
                 source=source,
                 repo=repo,
                 milestone=milestone,
@@ -325,7 +341,7 @@ def create_enhanced_app() -> Flask:
             current_version = request.args.get('current_version')
             
             service = DataIngestionService()
-            releases = asyncio.run(service.ingest_previous_releases(
+            releases = run_async(service.ingest_previous_releases(
                 source=source,
                 repo=repo,
                 count=count,
@@ -425,51 +441,16 @@ def create_enhanced_app() -> Flask:
             data = request.get_json(force=True, silent=True) or {}
             
             # Required parameters
-            version = data.get('version')
-            if not version:
-                return jsonify({'status': 'error', 'error': 'Version is required'}), 400
-            
-            # Optional parameters with defaults
-            repo = data.get('repo')
-            audience = data.get('audience', 'users')
-            from_tag = data.get('from_tag')
-            since = data.get('since')
-            
-            # Source configurations
-            commit_source = data.get('commit_source', 'auto')
-            issue_source = data.get('issue_source', 'github')
-            release_source = data.get('release_source', 'auto')
-            
-            # Filters
-            milestone = data.get('milestone')
-            labels = data.get('labels', [])
-            project_key = data.get('project_key')
-            json_file = data.get('json_file')
-            
-            # LLM configuration
-            model = data.get('model')
-            temperature = data.get('temperature')
-            template = data.get('template')
-            custom_sections = data.get('custom_sections', [])
-            
-            # Publishing options
-            publish_confluence = data.get('publish_confluence', False)
-            publish_github = data.get('publish_github', False)
-            publish_slack = data.get('publish_slack', False)
-            
-            # Collect publishing platforms
-            publish_platforms = []
-            if publish_confluence:
-                publish_platforms.append('confluence')
-            if publish_github:
-                publish_platforms.append('github')
-            if publish_slack:
-                publish_platforms.append('slack')
-            
-            # Get repository from config if not provided
-            if not repo:
-                cfg = load_config()
-                repo = cfg.get('repo')
+            valid, error = validate_generation_request(data)
+            if not valid:
+                return jsonify({'status': 'error', 'error': error}), 400
+            version = data['version']
+            
+            options = enhanced_generation_options(data)
+            repo = options['repo']
+            audience = options['audience']
+            from_tag = options['from_tag']
+            publish_confluence = 'confluence' in options['publish_platforms']
             
             if not repo:
                 return jsonify({'status': 'error', 'error': 'Repository not specified'}), 400
@@ -480,7 +461,6 @@ def create_enhanced_app() -> Flask:
             try:
                 # Use enhanced async generation
                 from src.enhanced_generate_notes import generate_enhanced_release_notes
-                import asyncio
                 import io
                 import sys
                 
@@ -491,25 +471,7 @@ def create_enhanced_app() -> Flask:
                 sys.stderr = io.TextIOWrapper(io.BytesIO(), encoding='utf-8', errors='replace')
                 
                 try:
-                    result = asyncio.run(generate_enhanced_release_notes(
-                        version=version,
-                        repo=repo,
-                        audience=audience,
-                        from_tag=from_tag,
-                        since=since,
-                        commit_source=commit_source,
-                        issue_source=issue_source,
-                        release_source=release_source,
-                        milestone=milestone,
-                        labels=labels if isinstance(labels, list) else labels.split(',') if labels else [],
-                        project_key=project_key,
-                        json_file=json_file,
-                        model=model,
-                        temperature=temperature,
-                        template=template,
-                        custom_sections=custom_sections if isinstance(custom_sections, list) else custom_sections.split(',') if custom_sections else [],
-                        publish_platforms=publish_platforms
-                    ))
+                    result = run_async(generate_enhanced_release_notes(**options))
                 finally:
                     sys.stdout = old_stdout
                     sys.stderr = old_stderr
@@ -608,6 +570,53 @@ def create_enhanced_app() -> Flask:
                 headers={'Content-Type': 'application/json'}
             )
 
+    @app.route('/api/generate/stream', methods=['POST'])
+    def generate_stream():
+        """Enhanced generation streamed as server-sent events.
+        
+        Takes the same body as /api/generate/enhanced. Emits ``token`` events
+        (``{"audience": ..., "text": ...}``) as the LLM produces the notes,
+        then one ``done`` event with the full result or an ``error`` event.
+        """
+        from flask import Response
+        from src.enhanced_generate_notes import generate_enhanced_release_notes
+        
+        data = request.get_json(force=True, silent=True) or {}
+        # Rejected here, before the worker thread starts, rather than as an error event
+        valid, error = validate_generation_request(data)
+        if not valid:
+            return jsonify({'status': 'error', 'error': error}), 400
+        options = enhanced_generation_options(data)
+        if not options['repo']:
+            return jsonify({'status': 'error', 'error': 'Repository not specified'}), 400
+        
+        events = queue.Queue()
+        
+        def run():
+            try:
+                result = run_async(generate_enhanced_release_notes(
+                    **options,
+                    on_token=lambda audience, piece: events.put(('token', {'audience': audience, 'text': piece}))
+                ))
+                events.put(('error' if result.get('status') == 'error' else 'done', result))
+            except Exception as e:
+                events.put(('error', {'status': 'error', 'error': str(e)}))
+            finally:
+                events.put(None)
+        
+        threading.Thread(target=run, daemon=True).start()
+        
+        def stream():
+            while True:
+                event = events.get()
+                if event is None:
+                    return
+                name, payload = event
+                yield f"event: {name}\ndata: {json.dumps(payload, default=str)}\n\n"
+        
+        return Response(stream(), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
     # Progress tracking endpoint
     @app.route('/api/generate/status/<task_id>', methods=['GET'])
     def get_generation_status(task_id):
@@ -676,34 +685,21 @@ def create_enhanced_app() -> Flask:
     # Template management endpoints
     @app.route('/api/templates', methods=['GET'])
     def list_templates():
-        """List available templates."""
-        templates_dir = Path('templates')
-        templates = []
-        
-        if templates_dir.exists():
-            for template_file in templates_dir.glob('*.md'):
-                templates.append({
-                    'name': template_file.stem,
-                    'path': str(template_file),
-                    'modified': datetime.fromtimestamp(template_file.stat().st_mtime).isoformat()
-                })
-        
+        """List available templates with their placeholders and validation status."""
+        templates = [compiled.describe() for compiled in get_template_registry().templates()]
         return jsonify({'templates': templates})
 
     @app.route('/api/templates/<template_name>', methods=['GET'])
     def get_template(template_name):
         """Get a specific template."""
-        template_path = Path(f'templates/{template_name}.md')
+        compiled = get_template_registry().get(template_name)
         
-        if not template_path.exists():
+        if compiled is None:
             return jsonify({'error': 'Template not found'}), 404
         
-        content = template_path.read_text(encoding='utf-8')
-        
         return jsonify({
-            'name': template_name,
-            'content': content,
-            'path': str(template_path)
+            **compiled.describe(),
+            'content': compiled.source
         })
 
     @app.route('/api/templates/<template_name>', methods=['PUT'])
@@ -716,21 +712,47 @@ def create_enhanced_app() -> Flask:
             if not content:
                 return jsonify({'error': 'Content required'}), 400
             
-            templates_dir = Path('templates')
+            registry = get_template_registry()
+            templates_dir = registry.directory
             templates_dir.mkdir(exist_ok=True)
             
             template_path = templates_dir / f'{template_name}.md'
             template_path.write_text(content, encoding='utf-8')
+            registry.reload()
             
             return jsonify({
                 'status': 'ok',
-                'name': template_name,
-                'path': str(template_path)
+                **registry.get(template_name).describe()
             })
             
         except Exception as e:
             return jsonify({'error': str(e)}), 500
 
+    # LLM response cache endpoints
+    @app.route('/api/llm/cache', methods=['GET'])
+    def llm_cache_stats():
+        """Size and hit counts of the LLM response cache."""
+        return jsonify(get_response_cache(load_config().get('llm', {}).get('cache')).stats())
+
+    @app.route('/api/llm/cache', methods=['DELETE'])
+    def clear_llm_cache():
+        """Remove every cached LLM response."""
+        removed = get_response_cache(load_config().get('llm', {}).get('cache')).invalidate()
+        return jsonify({'status': 'ok', 'removed': removed})
+
+    @app.route('/api/llm/providers', methods=['GET'])
+    def llm_provider_health():
+        """Circuit breaker state per provider (unavailable ones fail fast) and rate limiter usage."""
+        return jsonify({
+            'providers': breaker_states(),
+            'rate_limits': get_admission_controller(load_config().get('llm', {}).get('rate_limits')).snapshot(),
+        })
+
+    @app.route('/api/llm/local', methods=['GET'])
+    def local_llm_status():
+        """Reachability of the local model server and load state of its models."""
+        return jsonify(get_ollama_client().status())
+
     # Add enhanced endpoints
     add_enhanced_endpoints(app)
     
@@ -738,6 +760,44 @@ def create_enhanced_app() -> Flask:
 
 
 # Utility functions for the API
+def enhanced_generation_options(data: Dict) -> Dict[str, Any]:
+    """Keyword arguments for generate_enhanced_release_notes from a request body."""
+    def as_list(value):
+        return value if isinstance(value, list) else value.split(',') if value else []
+    
+    # Get repository from config if not provided
+    repo = data.get('repo') or load_config().get('repo')
+    return {
+        'version': data.get('version'),
+        'repo': repo,
+        'audience': data.get('audience', 'users'),
+        'audiences': as_list(data.get('audiences')) or None,
+        'from_tag': data.get('from_tag'),
+        'since': data.get('since'),
+        # Source configurations
+        'commit_source': data.get('commit_source', 'auto'),
+        'issue_source': data.get('issue_source', 'github'),
+        'release_source': data.get('release_source', 'auto'),
+        # Filters
+        'milestone': data.get('milestone'),
+        'labels': as_list(data.get('labels', [])),
+        'project_key': data.get('project_key'),
+        'json_file': data.get('json_file'),
+        # LLM configuration
+        'model': data.get('model'),
+        'temperature': data.get('temperature'),
+        'template': data.get('template'),
+        'custom_sections': as_list(data.get('custom_sections', [])),
+        'mode': data.get('mode'),
+        'themes': data.get('themes'),
+        'structured': data.get('structured'),
+        'cache': 'bypass' if data.get('no_cache') else 'refresh' if data.get('invalidate_cache') else None,
+        # Publishing options
+        'publish_platforms': [
+            platform for platform in ('confluence', 'github', 'slack') if data.get(f'publish_{platform}', False)
+        ],
+    }
+
 def validate_generation_request(data: Dict) -> tuple[bool, Optional[str]]:
     """Validate generation request data."""
     required_fields = ['version']
@@ -746,9 +806,18 @@ def validate_generation_request(data: Dict) -> tuple[bool, Optional[str]]:
         if field not in data or not data[field]:
             return False, f"Missing required field: {field}"
     
+    # The version names the output file, so it must be a plain tag
+    if not isinstance(data['version'], str) or not VERSION_RE.match(data['version']):
+        return False, "Invalid version. Use a tag such as v1.2.0 (letters, digits, '.', '-', '_' and '+')"
+    
     # Validate audience
     if 'audience' in data and data['audience'] not in ['users', 'developers', 'managers']:
         return False, "Invalid audience. Must be one of: users, developers, managers"
+    audiences = data.get('audiences') or []
+    if isinstance(audiences, str):
+        audiences = audiences.split(',')
+    if not set(audiences) <= {'users', 'developers', 'managers'}:
+        return False, "Invalid audiences. Each must be one of: users, developers, managers"
     
     # Validate sources
     valid_commit_sources = ['local', 'github', 'auto']
@@ -759,4 +828,7 @@ def validate_generation_request(data: Dict) -> tuple[bool, Optional[str]]:
     if 'issue_source' in data and data['issue_source'] not in valid_issue_sources:
         return False, f"Invalid issue_source. Must be one of: {valid_issue_sources}"
     
+    if data.get('mode') and data['mode'] not in GENERATION_MODES:
+        return False, f"Invalid mode. Must be one of: {list(GENERATION_MODES)}"
+    
     return True, None
\ No newline at end of file
@@ -0,0 +1,188 @@
+"""Regenerate release notes for many versions through a provider batch API.
+
+Backfills do not need answers within seconds, so instead of one
+synchronous completion per version, every version's prompt is sent in one
+batch (OpenAI or Anthropic models) at lower cost, polled until it ends
+and written to ``examples/release_<version>.md``. A batch can be
+submitted now and collected later with ``--resume``.
+"""
+import argparse
+import asyncio
+from typing import Any, Dict, List, Optional
+
+import sys
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.batch_llm import load_manifest
+from src.data_ingestion import ingest_all_data
+from src.enhanced_generate_notes import release_output_path
+from src.llm_service import LLMService
+
+
+async def submit_backfill(
+    versions: List[str],
+    repo: Optional[str] = None,
+    audience: str = 'users',
+    from_tag: Optional[str] = None,
+    commit_source: str = 'auto',
+    issue_source: str = 'github',
+    release_source: str = 'auto',
+    model: Optional[str] = None,
+    temperature: Optional[float] = None,
+    template: Optional[str] = None,
+    llm_service: Optional[LLMService] = None
+) -> Dict[str, Any]:
+    """Ingest each version's changes (since the previous version in the list) and submit one batch.
+
+    ``versions`` are in release order; ``from_tag`` is the tag before the first one.
+    """
+    llm_service = llm_service or LLMService()
+    jobs = []
+    previous = from_tag
+    for version in versions:
+        print(f'Ingesting {version} (from {previous or "the beginning"})...')
+        data = await ingest_all_data(
+            version=version,
+            repo=repo,
+            from_tag=previous,
+            to_tag=version,
+            commit_source=commit_source,
+            issue_source=issue_source,
+            release_source=release_source
+        )
+        jobs.append(llm_service.prepare_batch_job(
+            version=version,
+            commits=data['commits'],
+            issues=data['issues'],
+            audience=audience,
+            previous_releases=data['previous_releases'],
+            template=template,
+            model=model
+        ))
+        previous = version
+    manifest = await llm_service.submit_batch(jobs, model=model, temperature=temperature)
+    print(f"Submitted batch {manifest['batch_id']} ({len(jobs)} versions, {manifest['model']})")
+    return manifest
+
+
+async def collect_backfill(
+    manifest: Dict[str, Any],
+    poll_interval: Optional[float] = None,
+    timeout: Optional[float] = None,
+    output_dir: Optional[str] = None,
+    llm_service: Optional[LLMService] = None
+) -> Dict[str, Any]:
+    """Wait for a backfill batch and write one markdown file per version."""
+    llm_service = llm_service or LLMService()
+    results = await llm_service.collect_batch(manifest, poll_interval=poll_interval, timeout=timeout)
+    written, failed = {}, {}
+    for job in manifest['jobs']:
+        result = results[job['custom_id']]
+        if 'error' in result:
+            failed[job['version']] = result['error']
+            print(f"  [FAIL] {job['version']}: {result['error']}")
+            continue
+        path = (Path(output_dir) / f"release_{job['version']}.md" if output_dir
+                else release_output_path(job['version']))
+        path.write_text(
+            result['raw_output'] + f"\n\n---\n*Generated with AI model: {manifest['model']}*\n", encoding='utf-8'
+        )
+        written[job['version']] = str(path)
+        print(f"  [OK] {job['version']}: {path}")
+    return {'batch_id': manifest['batch_id'], 'written': written, 'failed': failed, 'results': results}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Backfill release notes for many versions with a provider batch API',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Submit and wait (batches can take minutes to hours)
+  python -m src.backfill_notes --versions v1.0.0,v1.1.0,v1.2.0 --model gpt-4o-mini
+
+  # Submit now, collect later
+  python -m src.backfill_notes --versions v1.0.0,v1.1.0 --model claude-3-5-haiku-latest --submit-only
+  python -m src.backfill_notes --resume msgbatch_123
+        """
+    )
+    parser.add_argument('--versions',
+                       help='Comma-separated versions in release order')
+    parser.add_argument('--resume',
+                       help='Collect a previously submitted batch by id')
+    parser.add_argument('--repo',
+                       help='Repository in format owner/repo')
+    parser.add_argument('--audience',
+                       choices=['users', 'developers', 'managers'],
+                       default='users',
+                       help='Target audience for release notes')
+    parser.add_argument('--from-tag',
+                       help='Tag before the first version')
+    parser.add_argument('--commit-source',
+                       choices=['auto', 'local', 'github'],
+                       default='auto',
+                       help='Source for commit data')
+    parser.add_argument('--issue-source',
+                       choices=['github', 'jira', 'json'],
+                       default='github',
+                       help='Source for issue data')
+    parser.add_argument('--release-source',
+                       choices=['auto', 'github', 'local', 'changelog'],
+                       default='auto',
+                       help='Source for previous release notes')
+    parser.add_argument('--model',
+                       help='OpenAI (gpt-*) or Anthropic (claude-*) model; others have no batch API')
+    parser.add_argument('--temperature',
+                       type=float,
+                       help='LLM temperature (0.0-1.0)')
+    parser.add_argument('--template',
+                       help='Custom template name or path')
+    parser.add_argument('--poll-interval',
+                       type=float,
+                       help='Seconds between batch status checks (default: llm.batch.poll_interval or 60)')
+    parser.add_argument('--timeout',
+                       type=float,
+                       help='Stop waiting after this many seconds; collect later with --resume')
+    parser.add_argument('--submit-only',
+                       action='store_true',
+                       help='Submit the batch and exit without waiting for it')
+    parser.add_argument('--output-dir',
+                       help='Directory for the generated files (default: examples)')
+
+    args = parser.parse_args()
+    if not args.versions and not args.resume:
+        parser.error('either --versions or --resume is required')
+
+    async def main() -> Dict[str, Any]:
+        service = LLMService()
+        if args.resume:
+            manifest = load_manifest(args.resume)
+        else:
+            manifest = await submit_backfill(
+                versions=[v.strip() for v in args.versions.split(',') if v.strip()],
+                repo=args.repo,
+                audience=args.audience,
+                from_tag=args.from_tag,
+                commit_source=args.commit_source,
+                issue_source=args.issue_source,
+                release_source=args.release_source,
+                model=args.model,
+                temperature=args.temperature,
+                template=args.template,
+                llm_service=service
+            )
+            if args.submit_only:
+                print(f"Collect it later with: python -m src.backfill_notes --resume {manifest['batch_id']}")
+                return {'failed': {}}
+        return await collect_backfill(manifest, args.poll_interval, args.timeout, args.output_dir, service)
+
+    try:
+        outcome = asyncio.run(main())
+    except ValueError as e:
+        print(f'\n[ERROR] Backfill failed: {e}')
+        exit(1)
+    if outcome['failed']:
+        exit(1)
@@ -0,0 +1,196 @@
+"""Provider batch APIs for bulk, latency-insensitive generation.
+
+OpenAI (Files + Batches API) and Anthropic (Message Batches API) run
+requests asynchronously within 24 hours at about half the price of
+synchronous calls. A client here submits a list of ``{'custom_id',
+'body'}`` requests, reports a normalized status and returns the results
+keyed by ``custom_id``. Manifests of submitted batches are kept under
+``cache_dir('batches')`` so a backfill can be collected by a later run.
+"""
+import json
+import time
+from typing import Any, Dict, List, Optional
+
+import requests
+
+from src.llm_clients import REQUEST_TIMEOUT
+from src.utils import cache_dir
+
+OPENAI_BASE_URL = 'https://api.openai.com/v1'
+ANTHROPIC_BASE_URL = 'https://api.anthropic.com/v1'
+ANTHROPIC_VERSION = '2023-06-01'
+COMPLETION_WINDOW = '24h'
+# Normalized batch states
+RUNNING, ENDED, FAILED = 'running', 'ended', 'failed'
+
+
+def _check(response: requests.Response) -> requests.Response:
+    if response.status_code >= 400:
+        raise ValueError(f"Batch API error {response.status_code}: {response.text[:300]}")
+    return response
+
+
+def _jsonl(text: str) -> List[Dict[str, Any]]:
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+class OpenAIBatchClient:
+    """Chat completions through the OpenAI Batch API."""
+
+    provider = 'openai'
+    endpoint = '/v1/chat/completions'
+
+    def __init__(self, api_key: str, base_url: Optional[str] = None, session: Optional[requests.Session] = None):
+        self.base_url = (base_url or OPENAI_BASE_URL).rstrip('/')
+        self.session = session or requests.Session()
+        self.session.headers['Authorization'] = f'Bearer {api_key}'
+
+    def submit(self, batch_requests: List[Dict[str, Any]], description: str = '') -> str:
+        """Upload the requests as a JSONL file and start a batch; returns the batch id."""
+        lines = '\n'.join(
+            json.dumps({'custom_id': r['custom_id'], 'method': 'POST', 'url': self.endpoint, 'body': r['body']})
+            for r in batch_requests
+        )
+        upload = _check(self.session.post(
+            f'{self.base_url}/files',
+            data={'purpose': 'batch'},
+            files={'file': ('requests.jsonl', lines.encode('utf-8'), 'application/jsonl')},
+            timeout=REQUEST_TIMEOUT
+        )).json()
+        batch = _check(self.session.post(
+            f'{self.base_url}/batches',
+            json={'input_file_id': upload['id'], 'endpoint': self.endpoint,
+                  'completion_window': COMPLETION_WINDOW, 'metadata': {'description': description}},
+            timeout=REQUEST_TIMEOUT
+        )).json()
+        return batch['id']
+
+    def status(self, batch_id: str) -> Dict[str, Any]:
+        batch = _check(self.session.get(f'{self.base_url}/batches/{batch_id}', timeout=REQUEST_TIMEOUT)).json()
+        state = batch.get('status')
+        counts = batch.get('request_counts') or {}
+        return {
+            'id': batch_id,
+            'state': ENDED if state == 'completed' else FAILED if state in ('failed', 'expired', 'cancelled')
+            else RUNNING,
+            'provider_status': state,
+            'completed': counts.get('completed', 0),
+            'failed': counts.get('failed', 0),
+            'total': counts.get('total', 0),
+            'batch': batch,
+        }
+
+    def results(self, status: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+        """``{'text', 'finish_reason', 'usage'}`` or ``{'error'}`` per custom_id of an ended batch."""
+        results = {}
+        for file_key in ('error_file_id', 'output_file_id'):
+            file_id = status['batch'].get(file_key)
+            if not file_id:
+                continue
+            content = _check(self.session.get(f'{self.base_url}/files/{file_id}/content', timeout=REQUEST_TIMEOUT))
+            for line in _jsonl(content.text):
+                response = line.get('response') or {}
+                body = response.get('body') or {}
+                if line.get('error') or response.get('status_code', 200) >= 400:
+                    error = line.get('error') or body.get('error') or {}
+                    results[line['custom_id']] = {'error': error.get('message') or json.dumps(error)}
+                    continue
+                choice = body['choices'][0]
+                usage = body.get('usage') or {}
+                results[line['custom_id']] = {
+                    'text': choice['message']['content'],
+                    'finish_reason': choice.get('finish_reason'),
+                    'usage': {
+                        'input_tokens': usage.get('prompt_tokens', 0),
+                        'cached_tokens': (usage.get('prompt_tokens_details') or {}).get('cached_tokens', 0),
+                        'output_tokens': usage.get('completion_tokens', 0),
+                    },
+                }
+        return results
+
+
+class AnthropicBatchClient:
+    """Messages through the Anthropic Message Batches API."""
+
+    provider = 'anthropic'
+
+    def __init__(self, api_key: str, base_url: Optional[str] = None, session: Optional[requests.Session] = None):
+        self.base_url = (base_url or ANTHROPIC_BASE_URL).rstrip('/')
+        self.session = session or requests.Session()
+        self.session.headers.update({'x-api-key': api_key, 'anthropic-version': ANTHROPIC_VERSION})
+
+    def submit(self, batch_requests: List[Dict[str, Any]], description: str = '') -> str:
+        batch = _check(self.session.post(
+            f'{self.base_url}/messages/batches',
+            json={'requests': [{'custom_id': r['custom_id'], 'params': r['body']} for r in batch_requests]},
+            timeout=REQUEST_TIMEOUT
+        )).json()
+        return batch['id']
+
+    def status(self, batch_id: str) -> Dict[str, Any]:
+        batch = _check(self.session.get(
+            f'{self.base_url}/messages/batches/{batch_id}', timeout=REQUEST_TIMEOUT
+        )).json()
+        counts = batch.get('request_counts') or {}
+        failed = sum(counts.get(k, 0) for k in ('errored', 'canceled', 'expired'))
+        return {
+            'id': batch_id,
+            'state': ENDED if batch.get('processing_status') == 'ended' else RUNNING,
+            'provider_status': batch.get('processing_status'),
+            'completed': counts.get('succeeded', 0),
+            'failed': failed,
+            'total': counts.get('processing', 0) + counts.get('succeeded', 0) + failed,
+            'batch': batch,
+        }
+
+    def results(self, status: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+        url = status['batch'].get('results_url')
+        if not url:
+            return {}
+        results = {}
+        for line in _jsonl(_check(self.session.get(url, timeout=REQUEST_TIMEOUT)).text):
+            result = line.get('result') or {}
+            if result.get('type') != 'succeeded':
+                error = (result.get('error') or {}).get('error') or result.get('error') or {}
+                results[line['custom_id']] = {'error': error.get('message') or result.get('type', 'failed')}
+                continue
+            message = result['message']
+            usage = message.get('usage') or {}
+            cached = usage.get('cache_read_input_tokens', 0) or 0
+            written = usage.get('cache_creation_input_tokens', 0) or 0
+            results[line['custom_id']] = {
+                'text': ''.join(block.get('text', '') for block in message.get('content', [])
+                                if block.get('type') == 'text'),
+                'finish_reason': message.get('stop_reason'),
+                'usage': {
+                    'input_tokens': usage.get('input_tokens', 0) + cached + written,
+                    'cached_tokens': cached,
+                    'output_tokens': usage.get('output_tokens', 0),
+                },
+            }
+        return results
+
+
+BATCH_CLIENTS = {'openai': OpenAIBatchClient, 'anthropic': AnthropicBatchClient}
+BATCH_API_KEYS = {'openai': 'OPENAI_API_KEY', 'anthropic': 'ANTHROPIC_API_KEY'}
+
+
+def get_batch_client(provider: str, api_key: str, base_url: Optional[str] = None):
+    """Batch client for ``provider``; raises ValueError for providers without a batch API."""
+    if provider not in BATCH_CLIENTS:
+        raise ValueError(
+            f"Provider '{provider}' has no batch API; use a model from {sorted(BATCH_CLIENTS)}"
+        )
+    return BATCH_CLIENTS[provider](api_key, base_url)
+
+
+def save_manifest(manifest: Dict[str, Any]) -> None:
+    path = cache_dir('batches') / f"{manifest['batch_id']}.json"
+    path.write_text(json.dumps({**manifest, 'saved': time.time()}, indent=2), encoding='utf-8')
+
+
+def load_manifest(batch_id: str) -> Dict[str, Any]:
+    path = cache_dir('batches') / f'{batch_id}.json'
+    if not path.exists():
+        raise ValueError(f"No manifest for batch {batch_id} in {path.parent}")
+    return json.loads(path.read_text(encoding='utf-8'))
@@ -0,0 +1,204 @@
+"""Offset-indexed CHANGELOG access with mmap-backed section reads."""
+import mmap
+import os
+import re
+import shutil
+import tempfile
+from datetime import date
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional
+
+
+# Matches "## [1.2.3] - 2024-01-01", "## v1.2.3", "# 1.2", "## [Unreleased]"
+HEADER_RE = re.compile(
+    rb'^#{1,3}[ \t]+\[?(?P<version>[vV]?\d+\.\d+(?:\.\d+)?(?:-[0-9A-Za-z.-]+)?|[Uu]nreleased)\]?'
+    rb'(?P<rest>[^\r\n]*)\r?$',
+    re.MULTILINE
+)
+
+UNRELEASED = 'Unreleased'
+
+
+class SectionSpan(NamedTuple):
+    """Byte span of one changelog section body (the text after its header line)."""
+    offset: int
+    length: int
+    title: str
+
+
+class ChangelogIndex:
+    """Index of version -> byte span over a changelog file.
+
+    The file is scanned once per (mtime, size); sections are then served as
+    slices of a read-only mmap, so lookups do not depend on the file length.
+    """
+
+    def __init__(self, path: str = 'CHANGELOG.md'):
+        self.path = Path(path)
+        self._spans: Dict[str, SectionSpan] = {}
+        self._stamp = None
+        self._file = None
+        self._mmap = None
+
+    def _current_stamp(self):
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _ensure_loaded(self) -> None:
+        stamp = self._current_stamp()
+        if stamp == self._stamp and (self._mmap is not None or not self._spans):
+            return
+        self.close()
+        self._stamp = stamp
+        self._spans = {}
+        if stamp is None or stamp[1] == 0:
+            return
+
+        self._file = open(self.path, 'rb')
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._spans = self._scan(self._mmap)
+
+    @staticmethod
+    def _scan(buffer) -> Dict[str, SectionSpan]:
+        spans: Dict[str, SectionSpan] = {}
+        previous = None
+        for match in HEADER_RE.finditer(buffer):
+            if previous is not None:
+                version, title, body_start = previous
+                spans.setdefault(version, SectionSpan(body_start, match.start() - body_start, title))
+            version = match.group('version').decode('utf-8')
+            if version.lower() == 'unreleased':
+                version = UNRELEASED
+            title = match.group(0).decode('utf-8', errors='replace').strip().lstrip('#').strip()
+            body_start = min(match.end() + 1, len(buffer))
+            previous = (version, title, body_start)
+        if previous is not None:
+            version, title, body_start = previous
+            spans.setdefault(version, SectionSpan(body_start, len(buffer) - body_start, title))
+        return spans
+
+    def close(self) -> None:
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def versions(self, include_unreleased: bool = False) -> List[str]:
+        """Versions in file order (newest first for conventional changelogs)."""
+        self._ensure_loaded()
+        return [v for v in self._spans if include_unreleased or v != UNRELEASED]
+
+    def span(self, version: str) -> Optional[SectionSpan]:
+        self._ensure_loaded()
+        return self._spans.get(version) or self._spans.get(_toggle_prefix(version))
+
+    def section(self, version: str, limit: Optional[int] = None) -> Optional[str]:
+        """Return the body of ``version``, optionally only its first ``limit`` bytes."""
+        span = self.span(version)
+        if span is None:
+            return None
+        length = span.length if limit is None else min(span.length, limit)
+        return self._mmap[span.offset:span.offset + length].decode('utf-8', errors='ignore')
+
+    def releases(self, count: int, current_version: Optional[str] = None,
+                 body_limit: Optional[int] = None) -> List[Dict]:
+        """Previous releases in the dict shape used by the ingestion layer."""
+        skip = {current_version, _toggle_prefix(current_version)} if current_version else set()
+        releases = []
+        for version in self.versions():
+            if version in skip:
+                continue
+            span = self._spans[version]
+            releases.append({
+                'version': version,
+                'name': span.title,
+                'body': self.section(version, limit=body_limit),
+                'source': 'changelog'
+            })
+            if len(releases) >= count:
+                break
+        return releases
+
+    def prepend(self, version: str, body: str, release_date: Optional[str] = None) -> None:
+        """Insert a section above the newest release without re-reading or re-parsing the file.
+
+        Bytes before the insertion point are copied, the new section is
+        written, and the remainder is streamed with ``copyfileobj``; existing
+        spans are shifted rather than rescanned. If ``version`` already has a
+        section (e.g. when notes are regenerated), that section is replaced
+        in place instead.
+        """
+        self._ensure_loaded()
+        header = f"## [{version}] - {release_date or date.today().isoformat()}"
+        section = f"{header}\n\n{body.strip()}\n\n".encode('utf-8')
+
+        existing = self.span(version)
+        released = [span for v, span in self._spans.items() if v != UNRELEASED]
+        if existing is not None:
+            # Header line starts right before the replaced body, which ends where the next header starts
+            insert_at = self._mmap.rfind(b'\n', 0, existing.offset - 1) + 1
+            removed = existing.offset + existing.length - insert_at
+        elif released:
+            insert_at = self._mmap.rfind(b'\n', 0, released[0].offset - 1) + 1
+            removed = 0
+        else:
+            insert_at = len(self._mmap) if self._mmap is not None else 0
+            removed = 0
+
+        if self._mmap is not None and insert_at and self._mmap[insert_at - 1:insert_at] != b'\n':
+            section = b'\n' + section
+
+        self.close()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=str(self.path.parent), prefix='.changelog-')
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                if self.path.exists():
+                    with open(self.path, 'rb') as src:
+                        out.write(src.read(insert_at))
+                        out.write(section)
+                        src.seek(removed, os.SEEK_CUR)
+                        shutil.copyfileobj(src, out)
+                else:
+                    out.write(b'# Changelog\n\n' + section)
+                    insert_at = len(b'# Changelog\n\n')
+            os.replace(tmp_path, self.path)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+
+        shift = len(section) - removed
+        body_offset = insert_at + section.index(b'\n', 1 if section[:1] == b'\n' else 0) + 1
+        spans = {v: span for v, span in self._spans.items() if span != existing}
+        spans[version] = SectionSpan(body_offset, insert_at + len(section) - body_offset, header.lstrip('#').strip())
+        for v, span in spans.items():
+            if v != version and span.offset > insert_at:
+                spans[v] = span._replace(offset=span.offset + shift)
+        self._spans = dict(sorted(spans.items(), key=lambda item: item[1].offset))
+
+        self._file = open(self.path, 'rb')
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._stamp = self._current_stamp()
+
+
+def _toggle_prefix(version: Optional[str]) -> Optional[str]:
+    """``v1.2.3`` <-> ``1.2.3`` so lookups match either tag style."""
+    if not version:
+        return version
+    return version[1:] if version[:1] in ('v', 'V') else f'v{version}'
+
+
+_indexes: Dict[str, ChangelogIndex] = {}
+
+
+def get_changelog_index(path: str = 'CHANGELOG.md') -> ChangelogIndex:
+    """Shared index per changelog path; it revalidates itself against the file's mtime."""
+    key = str(Path(path).resolve())
+    if key not in _indexes:
+        _indexes[key] = ChangelogIndex(path)
+    return _indexes[key]
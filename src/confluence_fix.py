@@ -4,8 +4,12 @@ import re
 import os
 from dotenv import load_dotenv
 
-def publish_to_confluence_fixed(version: str, md_path: str, update_existing: bool = False):
-    """Fixed Confluence publishing function using environment variables."""
+def publish_to_confluence_fixed(version: str, md_path: str, update_existing: bool = False, storage: str = None):
+    """Fixed Confluence publishing function using environment variables.
+    
+    ``storage`` is a ready page body (e.g. rendered from structured notes); without it
+    the markdown file is converted.
+    """
     
     # Load environment variables
     load_dotenv()
@@ -120,6 +124,8 @@ def publish_to_confluence_fixed(version: str, md_path: str, update_existing: boo
     
     # Create new page
     payload = md_to_storage_format(md, title)
+    if storage is not None:
+        payload['body']['storage']['value'] = storage
     
     url = f'{BASE}/wiki/rest/api/content'
     r = requests.post(url, auth=(USER, TOKEN), json=payload)
@@ -4,10 +4,18 @@ import yaml
 from pathlib import Path
 from typing import List, Dict, Optional, Union, Any
 from datetime import datetime, timedelta
+from itertools import islice
 import requests
 from src.utils import env, load_config
+from src.changelog import get_changelog_index
 from scripts.extract_commits import extract_commits_local, extract_commits_github, extract_commits_between_tags
 from scripts.fetch_issues import fetch_github_issues
+from scripts.fetch_releases import iter_releases
+from scripts.classify_change import classify_commits
+from scripts.commit_model import get_model
+
+# Previous releases are only used as tone/format context, so bodies are cut at read time
+RELEASE_CONTEXT_CHARS = 500
 
 # Force import GitHub token fix
 try:
@@ -20,6 +28,9 @@ except ImportError:
 class DataIngestionService:
     """Unified service for ingesting data from multiple sources."""
     
+    # (repo, current_version, count) -> trimmed GitHub releases, shared across instances
+    _release_context_cache: Dict[tuple, List[Dict]] = {}
+    
     def __init__(self, config: Optional[Dict] = None):
         self.config = config or load_config()
         self.jira_config = self._load_jira_config()
@@ -82,9 +93,9 @@ class DataIngestionService:
                 print(f"🚨 BulletproofGitHub failed: {e}")
                 # Fallback to local if everything fails
                 print("📁 Falling back to local git")
-                return extract_commits_local('.', since=since, until=until)
+                return extract_commits_local(self.config.get('repo_path', '.'), since=since, until=until)
         elif source == 'local':
-            return extract_commits_local('.', since=since, until=until)
+            return extract_commits_local(self.config.get('repo_path', '.'), since=since, until=until)
         else:
             raise ValueError(f"Unsupported commit source: {source}")
     
@@ -258,29 +269,30 @@ class DataIngestionService:
         if github_token:
             headers['Authorization'] = f'token {github_token}'
         
-        url = f'https://api.github.com/repos/{repo}/releases'
-        params = {'per_page': count * 2}  # Get extra in case current version is included
+        cache_key = (repo, current_version, count)
+        if cache_key in self._release_context_cache:
+            return self._release_context_cache[cache_key]
         
         try:
-            response = requests.get(url, headers=headers, params=params)
-            response.raise_for_status()
-            releases = response.json()
-            
-            # Filter out current version and drafts
-            filtered = []
-            for release in releases:
-                if (release.get('tag_name') != current_version and 
-                    not release.get('draft', False) and
-                    len(filtered) < count):
-                    filtered.append({
-                        'version': release.get('tag_name'),
-                        'name': release.get('name'),
-                        'body': release.get('body', ''),
-                        'published_at': release.get('published_at'),
-                        'url': release.get('html_url'),
-                        'source': 'github'
-                    })
+            # Newest first; drafts and the current version are passed over while paging,
+            # and further pages are read only until ``count`` releases are found
+            published = (
+                release for release in iter_releases(repo, headers, per_page=count * 2)
+                if release.get('tag_name') != current_version and not release.get('draft', False)
+            )
+            filtered = [
+                {
+                    'version': release.get('tag_name'),
+                    'name': release.get('name'),
+                    'body': (release.get('body') or '')[:RELEASE_CONTEXT_CHARS],
+                    'published_at': release.get('published_at'),
+                    'url': release.get('html_url'),
+                    'source': 'github'
+                }
+                for release in islice(published, count)
+            ]
             
+            self._release_context_cache[cache_key] = filtered
             return filtered
             
         except Exception as e:
@@ -310,7 +322,9 @@ class DataIngestionService:
                 continue
             
             try:
-                content = file_path.read_text(encoding='utf-8')
+                # Read only the part of the file that the prompt will keep
+                with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+                    content = f.read(RELEASE_CONTEXT_CHARS)
                 # Extract title from first line
                 lines = content.strip().split('\n')
                 title = lines[0].strip('# ') if lines else version
@@ -332,40 +346,11 @@ class DataIngestionService:
     
     def _parse_changelog_file(self, count: int, current_version: Optional[str]) -> List[Dict]:
         """Parse releases from CHANGELOG.md file."""
-        changelog_path = Path('CHANGELOG.md')
-        if not changelog_path.exists():
-            return []
-        
         try:
-            content = changelog_path.read_text(encoding='utf-8')
-            # Basic changelog parsing - can be enhanced based on format
-            # This is a simple implementation
-            releases = []
-            current_release = None
-            
-            for line in content.split('\n'):
-                # Look for version headers (## [1.2.3] or # v1.2.3)
-                if line.startswith('##') and '[' in line and ']' in line:
-                    if current_release and len(releases) < count:
-                        releases.append(current_release)
-                    
-                    version = line.split('[')[1].split(']')[0]
-                    if version != current_version:
-                        current_release = {
-                            'version': version,
-                            'name': line.strip('# '),
-                            'body': '',
-                            'source': 'changelog'
-                        }
-                elif current_release:
-                    current_release['body'] += line + '\n'
-            
-            # Add last release
-            if current_release and len(releases) < count:
-                releases.append(current_release)
-            
-            return releases[:count]
-            
+            # The index is built once per file version and sections are read as mmap slices
+            return get_changelog_index('CHANGELOG.md').releases(
+                count, current_version, body_limit=RELEASE_CONTEXT_CHARS
+            )
         except Exception as e:
             print(f"Error parsing CHANGELOG.md: {e}")
             return []
@@ -413,6 +398,7 @@ async def ingest_all_data(
         since=since,
         **{k: v for k, v in kwargs.items() if k in ['to_tag', 'until', 'branch']}
     )
+    classify_commits(commits, model=get_model(service.config.get('classifier', {}).get('model_path')))
     
     # Ingest issues
     issues = await service.ingest_issues(
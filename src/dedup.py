@@ -0,0 +1,177 @@
+"""Near-duplicate commit collapsing with MinHash and LSH banding.
+
+Subjects are normalised to a set of content words (numbers, issue refs,
+hashes and follow-up filler such as "again" or "wip" stripped), exact
+duplicates are merged up front, and the remaining distinct word sets get
+MinHash signatures. Signatures are split into bands; subjects sharing a
+band bucket are candidates and are merged (union-find) when the Jaccard
+similarity of their word sets reaches the threshold. Each bucket is only
+compared against its first member, so the work stays linear in the number
+of commits. Only commits of the same type and scope are compared with
+each other.
+
+Signatures are computed with NumPy when it is installed and in pure
+Python otherwise.
+"""
+import re
+import zlib
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# 10 bands of 3 rows: pairs with Jaccard 0.8 share a bucket >99% of the time, 0.6 ~91%, 0.2 about 8%
+BANDS = 10
+ROWS = 3
+NUM_PERM = BANDS * ROWS
+# High enough that subjects differing in one content word ("add export button" /
+# "add import button", J=0.67) stay apart; lower it to also merge rewordings
+DEFAULT_THRESHOLD = 0.8
+
+WORD_RE = re.compile(r'[a-z][a-z_]+')
+NOISE_RE = re.compile(r'#\d+|\b[0-9a-f]{7,40}\b|\d+')
+STOPWORDS = frozenset({
+    'a', 'an', 'and', 'the', 'to', 'of', 'in', 'on', 'for', 'with', 'from', 'into', 'by', 'at',
+    'is', 'it', 'this', 'that', 'be', 'as', 'or', 'pr', 'pull', 'request', 'merge', 'branch',
+})
+# Words that mark a follow-up of the same change ("fix lint again", "address review comments")
+FILLER_WORDS = frozenset({
+    'again', 'more', 'some', 'another', 'round', 'comment', 'comments', 'wip', 'fixup', 'nit', 'nits', 'minor',
+})
+IGNORED_WORDS = STOPWORDS | FILLER_WORDS
+
+_MASK64 = (1 << 64) - 1
+
+
+def _permutations(count: int = NUM_PERM, seed: int = 1) -> List[Tuple[int, int]]:
+    # Deterministic (a, b) pairs for multiply-shift hashing: ((a*x + b) mod 2**64) >> 32, a odd
+    state = seed
+    pairs = []
+    for _ in range(count):
+        state = (state * 6364136223846793005 + 1442695040888963407) & _MASK64
+        a = state | 1
+        state = (state * 6364136223846793005 + 1442695040888963407) & _MASK64
+        pairs.append((a, state))
+    return pairs
+
+
+PERMUTATIONS = _permutations()
+
+
+def shingles(subject: str) -> frozenset:
+    """Content words of a commit subject, ignoring numbers, refs, hashes and filler."""
+    text = NOISE_RE.sub(' ', subject.lower())
+    return frozenset(word for word in WORD_RE.findall(text) if word not in IGNORED_WORDS)
+
+
+def _signatures_python(word_sets: Sequence[frozenset]) -> List[Tuple[int, ...]]:
+    signatures = []
+    for words in word_sets:
+        hashes = [zlib.crc32(w.encode('utf-8')) for w in words] or [0]
+        signatures.append(tuple(
+            min(((a * h + b) & _MASK64) >> 32 for h in hashes) for a, b in PERMUTATIONS
+        ))
+    return signatures
+
+
+def _signatures_numpy(np, word_sets: Sequence[frozenset]):
+    lengths = np.fromiter((max(len(words), 1) for words in word_sets), dtype=np.int64, count=len(word_sets))
+    hashes = np.fromiter(
+        (h for words in word_sets for h in ([zlib.crc32(w.encode('utf-8')) for w in words] or [0])),
+        dtype=np.uint64, count=int(lengths.sum())
+    )
+    offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    a = np.asarray([pa for pa, _ in PERMUTATIONS], dtype=np.uint64)
+    b = np.asarray([pb for _, pb in PERMUTATIONS], dtype=np.uint64)
+    # uint64 arithmetic wraps modulo 2**64, matching the pure-Python path
+    values = (hashes[:, None] * a[None, :] + b[None, :]) >> np.uint64(32)
+    return np.minimum.reduceat(values, offsets, axis=0)
+
+
+def signatures(word_sets: Sequence[frozenset]):
+    """MinHash signature rows (one per word set), NumPy-backed when available."""
+    try:
+        import numpy as np
+    except ImportError:
+        return _signatures_python(word_sets)
+    if not word_sets:
+        return []
+    return [tuple(row) for row in _signatures_numpy(np, word_sets).tolist()]
+
+
+class _UnionFind:
+    def __init__(self, size: int):
+        self.parent = list(range(size))
+
+    def find(self, i: int) -> int:
+        while self.parent[i] != i:
+            self.parent[i] = self.parent[self.parent[i]]
+            i = self.parent[i]
+        return i
+
+    def union(self, i: int, j: int) -> None:
+        ri, rj = self.find(i), self.find(j)
+        if ri != rj:
+            self.parent[max(ri, rj)] = min(ri, rj)
+
+
+def jaccard(a: frozenset, b: frozenset) -> float:
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+def cluster_subjects(subjects: Sequence[str], threshold: float = DEFAULT_THRESHOLD) -> List[int]:
+    """Cluster id (index of the cluster's first subject) for every subject."""
+    distinct: Dict[frozenset, int] = {}
+    owner = []
+    for subject in subjects:
+        owner.append(distinct.setdefault(shingles(subject), len(distinct)))
+    word_sets = list(distinct)
+
+    sigs = signatures(word_sets)
+    uf = _UnionFind(len(word_sets))
+    for band in range(BANDS):
+        buckets: Dict[Tuple[int, ...], int] = {}
+        lo, hi = band * ROWS, (band + 1) * ROWS
+        for i, sig in enumerate(sigs):
+            if not word_sets[i]:
+                continue
+            first = buckets.setdefault(sig[lo:hi], i)
+            if first == i or uf.find(first) == uf.find(i):
+                continue
+            if jaccard(word_sets[first], word_sets[i]) >= threshold:
+                uf.union(first, i)
+
+    # Map each word-set root back to the first subject that produced it
+    first_subject: Dict[int, int] = {}
+    clusters = []
+    for index, set_id in enumerate(owner):
+        clusters.append(first_subject.setdefault(uf.find(set_id), index))
+    return clusters
+
+
+def collapse_duplicates(commits: List[Dict], threshold: Optional[float] = DEFAULT_THRESHOLD) -> List[Dict]:
+    """One representative per cluster of near-duplicate commits, with a ``count``.
+
+    The representative is the cluster's first commit in input order (a
+    copy, so the caller's dicts are untouched). Only commits with the same
+    type and scope are compared, and breaking changes are never collapsed.
+    Order is preserved.
+    """
+    if not threshold or len(commits) < 2:
+        return list(commits)
+    groups: Dict[Tuple, List[int]] = {}
+    for i, commit in enumerate(commits):
+        if not commit.get('breaking'):
+            groups.setdefault((commit.get('type'), commit.get('scope')), []).append(i)
+
+    keep: Dict[int, int] = {}
+    for candidates in groups.values():
+        counts: Dict[int, int] = {}
+        for cluster in cluster_subjects([commits[i].get('subject', '') for i in candidates], threshold):
+            counts[cluster] = counts.get(cluster, 0) + 1
+        keep.update((candidates[position], count) for position, count in counts.items())
+
+    result = []
+    for i, commit in enumerate(commits):
+        if commit.get('breaking'):
+            result.append(commit)
+        elif i in keep:
+            result.append({**commit, 'count': keep[i]} if keep[i] > 1 else commit)
+    return result
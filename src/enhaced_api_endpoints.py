@@ -1,6 +1,5 @@
 """Enhanced API endpoints for realistic UI features."""
 import requests
-import subprocess
 import re
 import os
 from pathlib import Path
@@ -10,6 +9,7 @@ import json
 
 from src.utils import env, load_config
 from src.fallback_llm import get_fallback_models
+from src.version_index import TagIndex, get_tag_index
 
 
 def add_enhanced_endpoints(app):
@@ -181,6 +181,9 @@ def add_enhanced_endpoints(app):
         return jsonify({
             'versions': versions,
             'suggested_next': suggested_next,
+            'suggestions': TagIndex.from_tags(
+                [v['tag'] for v in versions if v['type'] != 'suggested']
+            ).suggestions(),
             'source': 'github' if github_token and repo else 'local'
         })
 
@@ -344,46 +347,29 @@ def get_github_versions(repo: str, token: str) -> tuple[List[Dict], Optional[str
     if token:
         headers['Authorization'] = f'token {token}'
     
-    versions = []
-    
     try:
-        # Get releases
+        # One tag listing gives the SemVer ordering; releases only add names and dates
+        index = get_tag_index(repo=repo, token=token)
+        
         releases_url = f'https://api.github.com/repos/{repo}/releases'
         response = requests.get(releases_url, headers=headers, params={'per_page': 20})
         response.raise_for_status()
+        releases = {release['tag_name']: release for release in response.json()}
         
-        releases = response.json()
-        
-        for release in releases[:10]:  # Last 10 releases
-            versions.append({
-                'tag': release['tag_name'],
-                'name': release['name'] or release['tag_name'],
-                'published_at': release['published_at'],
-                'type': 'release'
-            })
-        
-        # Also get tags for more options
-        tags_url = f'https://api.github.com/repos/{repo}/tags'
-        tags_response = requests.get(tags_url, headers=headers, params={'per_page': 20})
-        
-        if tags_response.status_code == 200:
-            tags = tags_response.json()
-            
-            # Add tags that aren't already in releases
-            existing_tags = {v['tag'] for v in versions}
-            
-            for tag in tags[:15]:  # More tags
-                if tag['name'] not in existing_tags:
-                    versions.append({
-                        'tag': tag['name'],
-                        'name': tag['name'],
-                        'type': 'tag'
-                    })
-        
-        # Suggest next version
-        suggested_next = suggest_next_version([v['tag'] for v in versions])
+        versions = []
+        for tag in index.tags()[:25]:
+            release = releases.get(tag)
+            if release:
+                versions.append({
+                    'tag': tag,
+                    'name': release['name'] or tag,
+                    'published_at': release['published_at'],
+                    'type': 'release'
+                })
+            else:
+                versions.append({'tag': tag, 'name': tag, 'type': 'tag'})
         
-        return versions, suggested_next
+        return versions, index.suggest_next()
         
     except Exception as e:
         print(f"GitHub API error: {e}")
@@ -392,74 +378,22 @@ def get_github_versions(repo: str, token: str) -> tuple[List[Dict], Optional[str
 
 def get_local_versions() -> tuple[List[Dict], Optional[str]]:
     """Get versions from local git tags."""
-    versions = []
-    
     try:
-        # Get git tags
-        print("🔍 Running git command for versions...")
-        result = subprocess.run(
-            ['git', 'tag', '--sort=-version:refname'],
-            capture_output=True,
-            text=True,
-            cwd='.'
-        )
+        print("🔍 Reading local tags for versions...")
+        index = get_tag_index(path='.')
         
-        if result.returncode == 0:
-            tags = result.stdout.strip().split('\n')
-            tags = [tag for tag in tags if tag.strip()]  # Remove empty lines
-            
-            for tag in tags[:10]:  # Last 10 tags
-                # Get tag date
-                date_result = subprocess.run(
-                    ['git', 'log', '-1', '--format=%ai', tag],
-                    capture_output=True,
-                    text=True,
-                    cwd='.'
-                )
-                
-                date = date_result.stdout.strip() if date_result.returncode == 0 else ''
-                
-                versions.append({
-                    'tag': tag,
-                    'name': tag,
-                    'created_at': date,
-                    'type': 'tag'
-                })
-        
-        # Suggest next version
-        suggested_next = suggest_next_version([v['tag'] for v in versions])
+        versions = [
+            {
+                'tag': entry['tag'],
+                'name': entry['tag'],
+                'created_at': entry.get('date', ''),
+                'type': 'tag'
+            }
+            for entry in index.entries[:10]  # Last 10 tags
+        ]
         
-        return versions, suggested_next
+        return versions, index.suggest_next()
         
     except Exception as e:
         print(f"Local git error: {e}")
         return [], "v1.0.0"
-
-
-def suggest_next_version(existing_versions: List[str]) -> str:
-    """Suggest the next version based on existing versions."""
-    if not existing_versions:
-        return "v1.0.0"
-    
-    # Parse semantic versions
-    version_numbers = []
-    
-    for version in existing_versions:
-        # Remove 'v' prefix if present
-        clean_version = version.lstrip('v')
-        
-        # Try to parse semantic version
-        match = re.match(r'^(\d+)\.(\d+)\.(\d+)', clean_version)
-        if match:
-            major, minor, patch = map(int, match.groups())
-            version_numbers.append((major, minor, patch))
-    
-    if not version_numbers:
-        return "v1.0.0"
-    
-    # Get latest version
-    latest = max(version_numbers)
-    major, minor, patch = latest
-    
-    # Suggest patch increment
-    return f"v{major}.{minor}.{patch + 1}"
\ No newline at end of file
@@ -2,9 +2,10 @@
 import argparse
 import asyncio
 import json
+import os
 from datetime import date, datetime, timedelta
 from pathlib import Path
-from typing import Dict, List, Optional, Any
+from typing import Any, Callable, Dict, List, Optional
 
 import sys
 from pathlib import Path
@@ -16,6 +17,17 @@ from src.utils import load_config, env
 from src.data_ingestion import ingest_all_data
 from src.llm_service import LLMService
 from src.publishing_service import auto_publish
+from src.changelog import get_changelog_index
+
+
+def release_output_path(version: str, audience: Optional[str] = None, output_file: Optional[str] = None) -> Path:
+    """Markdown file for a release; per-audience runs add the audience to the name."""
+    if output_file:
+        path = Path(output_file)
+        return path.with_name(f'{path.stem}_{audience}{path.suffix}') if audience else path
+    output_dir = Path('examples')
+    output_dir.mkdir(exist_ok=True)
+    return output_dir / (f'release_{version}_{audience}.md' if audience else f'release_{version}.md')
 
 
 async def generate_enhanced_release_notes(
@@ -36,7 +48,14 @@ async def generate_enhanced_release_notes(
     template: Optional[str] = None,
     custom_sections: Optional[List[str]] = None,
     publish_platforms: Optional[List[str]] = None,
-    output_file: Optional[str] = None
+    output_file: Optional[str] = None,
+    changelog_file: Optional[str] = None,
+    mode: Optional[str] = None,
+    themes: Optional[bool] = None,
+    cache: Optional[str] = None,
+    on_token: Optional[Callable[[str, str], Any]] = None,
+    audiences: Optional[List[str]] = None,
+    structured: Optional[bool] = None
 ) -> Dict[str, Any]:
     """
     Enhanced release notes generation with full configuration options.
@@ -60,6 +79,15 @@ async def generate_enhanced_release_notes(
         custom_sections: Custom sections for output
         publish_platforms: Platforms to publish to
         output_file: Custom output file path
+        changelog_file: Changelog to prepend the generated notes to
+        mode: Generation mode (single, map-reduce, auto); defaults to llm.mode or single
+        themes: Group changes into clustered themes in the prompt
+        cache: LLM response cache mode (use, bypass, refresh)
+        on_token: Called with (audience, piece) for each piece of the notes as the LLM streams them
+        audiences: Generate for each of these audiences from one ingestion, concurrently,
+            writing release_<version>_<audience>.md for each (overrides audience)
+        structured: Have the LLM answer with schema-checked JSON and render the markdown
+            and the Slack, email and Confluence messages from it
     
     Returns:
         Dictionary with generation results and metadata
@@ -67,7 +95,7 @@ async def generate_enhanced_release_notes(
     
     print(f'Enhanced Release Notes Generation for {version}')
     print(f'Repository: {repo}')
-    print(f'Audience: {audience}')
+    print(f'Audience: {", ".join(audiences) if audiences else audience}')
     print(f'Sources: commits={commit_source}, issues={issue_source}, releases={release_source}')
     
     try:
@@ -93,89 +121,128 @@ async def generate_enhanced_release_notes(
         print(f'  [OK] Issues: {len(ingestion_data["issues"])}')
         print(f'  [OK] Previous releases: {len(ingestion_data["previous_releases"])}')
         
-        # Step 2: Generate with LLM
-        print('\n[2/4] Generating release notes with LLM...')
-        
-        llm_service = LLMService()
-        llm_result = await llm_service.generate_release_notes(
-            version=version,
-            commits=ingestion_data['commits'],
-            issues=ingestion_data['issues'],
-            audience=audience,
-            previous_releases=ingestion_data['previous_releases'],
-            template=template,
-            custom_sections=custom_sections,
-            model=model,
-            temperature=temperature
-        )
-        
-        # Add AI model information to the generated content
-        model_name = llm_result["metadata"]["model"]
-        model_footer = f"\n\n---\n*Generated with AI model: {model_name}*\n"
-        llm_result['raw_output'] += model_footer
+        audience_list = audiences or [audience]
+        output_paths = {a: release_output_path(version, a if audiences else None, output_file) for a in audience_list}
         
-        print(f'  [OK] Generated with model: {llm_result["metadata"]["model"]}')
-        print(f'  [OK] Structured sections: {len(llm_result["structured"])}')
+        # Step 2: Generate with LLM, streaming the notes into the output files as they arrive
+        print(f'\n[2/4] Generating release notes with LLM ({", ".join(audience_list)})...')
         
-        # Step 3: Save to file
-        print('\n[3/4] Saving release notes...')
+        # Streamed next to the target and moved over it only on success, so a failed run keeps the old notes
+        partial_paths = {a: path.with_name(path.name + '.part') for a, path in output_paths.items()}
+        streams = {a: open(path, 'w', encoding='utf-8') for a, path in partial_paths.items()}
         
-        if output_file:
-            output_path = Path(output_file)
-        else:
-            output_dir = Path('examples')
-            output_dir.mkdir(exist_ok=True)
-            output_path = output_dir / f'release_{version}.md'
+        def write_piece(target: str, piece: str) -> None:
+            streams[target].write(piece)
+            streams[target].flush()
+            if on_token is not None:
+                on_token(target, piece)
         
-        output_path.write_text(llm_result['raw_output'], encoding='utf-8')
-        print(f'  [OK] Saved to: {output_path}')
+        llm_service = LLMService()
+        generated = False
+        try:
+            llm_results = await llm_service.generate_for_audiences(
+                version=version,
+                commits=ingestion_data['commits'],
+                issues=ingestion_data['issues'],
+                audiences=audience_list,
+                previous_releases=ingestion_data['previous_releases'],
+                template=template,
+                custom_sections=custom_sections,
+                model=model,
+                temperature=temperature,
+                mode=mode,
+                themes=themes,
+                cache=cache,
+                on_token=write_piece,
+                structured=structured
+            )
+            generated = True
+        finally:
+            for stream in streams.values():
+                stream.close()
+            if not generated:
+                for path in partial_paths.values():
+                    path.unlink(missing_ok=True)
         
-        # Step 4: Publish to platforms
-        publishing_results = {}
-        if publish_platforms:
-            print(f'\n[4/4] Publishing to platforms: {", ".join(publish_platforms)}...')
+        data_summary = {
+            'commits_count': len(ingestion_data['commits']),
+            'issues_count': len(ingestion_data['issues']),
+            'previous_releases_count': len(ingestion_data['previous_releases'])
+        }
+        results = {}
+        for target, llm_result in llm_results.items():
+            output_path = output_paths[target]
             
-            metadata = {
-                'repo': repo,
-                'audience': audience,
-                'model': llm_result['metadata']['model'],
-                'data_summary': {
-                    'commits_count': len(ingestion_data['commits']),
-                    'issues_count': len(ingestion_data['issues']),
-                    'previous_releases_count': len(ingestion_data['previous_releases'])
-                }
-            }
+            # Add AI model information to the generated content
+            model_name = llm_result["metadata"]["model"]
+            model_footer = f"\n\n---\n*Generated with AI model: {model_name}*\n"
+            llm_result['raw_output'] += model_footer
             
-            publishing_results = await auto_publish(
-                version=version,
-                file_path=str(output_path),
-                platforms=publish_platforms,
-                metadata=metadata
-            )
+            print(f'  [OK] {target}: generated with model: {llm_result["metadata"]["model"]}')
+            if llm_result['metadata'].get('map_reduce'):
+                print(f'  [OK] Map-reduce: {llm_result["metadata"]["map_reduce"]["map_calls"]} chunk summaries')
+            print(f'  [OK] Structured sections: {len(llm_result["structured"])}')
             
-            print(f'  [OK] Published to: {publishing_results["published_to"]}')
-            if publishing_results['failed_to']:
-                print(f'  [FAIL] Failed to publish to: {publishing_results["failed_to"]}')
-        else:
-            print('\n[4/4] Skipping publishing (no platforms specified)')
+            # Step 3: Save to file
+            print(f'\n[3/4] Saving release notes for {target}...')
+            
+            # The streamed file lacks only the footer
+            with open(partial_paths[target], 'a', encoding='utf-8') as stream:
+                stream.write(model_footer)
+            os.replace(partial_paths[target], output_path)
+            print(f'  [OK] Saved to: {output_path}')
+            
+            if changelog_file and target == audience_list[0]:
+                # One changelog entry per version: the first audience's notes
+                get_changelog_index(changelog_file).prepend(version, llm_result['raw_output'])
+                print(f'  [OK] Prepended to: {changelog_file}')
+            
+            # Step 4: Publish to platforms
+            publishing_results = {}
+            if publish_platforms:
+                print(f'\n[4/4] Publishing to platforms: {", ".join(publish_platforms)}...')
+                
+                metadata = {
+                    'repo': repo,
+                    'audience': target,
+                    'model': llm_result['metadata']['model'],
+                    'data_summary': data_summary,
+                    # Structured notes let each platform render its own format
+                    'notes': llm_result.get('notes')
+                }
+                
+                publishing_results = await auto_publish(
+                    version=version,
+                    file_path=str(output_path),
+                    platforms=publish_platforms,
+                    metadata=metadata
+                )
+                
+                print(f'  [OK] Published to: {publishing_results["published_to"]}')
+                if publishing_results['failed_to']:
+                    print(f'  [FAIL] Failed to publish to: {publishing_results["failed_to"]}')
+            else:
+                print('\n[4/4] Skipping publishing (no platforms specified)')
+            
+            results[target] = {
+                'output_file': str(output_path),
+                'raw_output': llm_result['raw_output'],
+                'structured_output': llm_result['structured'],
+                'notes': llm_result.get('notes'),
+                'metadata': {
+                    **llm_result['metadata'],
+                    **ingestion_data['metadata']
+                },
+                'publishing': publishing_results
+            }
         
-        # Return comprehensive results
+        # Return comprehensive results; the top level describes the first audience
         return {
             'status': 'success',
             'version': version,
-            'output_file': str(output_path),
-            'raw_output': llm_result['raw_output'],
-            'structured_output': llm_result['structured'],
-            'metadata': {
-                **llm_result['metadata'],
-                **ingestion_data['metadata']
-            },
-            'publishing': publishing_results,
-            'data_summary': {
-                'commits_count': len(ingestion_data['commits']),
-                'issues_count': len(ingestion_data['issues']),
-                'previous_releases_count': len(ingestion_data['previous_releases'])
-            }
+            **results[audience_list[0]],
+            'audiences': results if audiences else None,
+            'data_summary': data_summary
         }
         
     except Exception as e:
@@ -226,6 +293,9 @@ Examples:
                        choices=['users', 'developers', 'managers'], 
                        default='users',
                        help='Target audience for release notes')
+    parser.add_argument('--audiences', 
+                       help='Comma-separated audiences to generate concurrently from one ingestion '
+                            '(writes release_<version>_<audience>.md for each)')
     
     # Data source configuration
     parser.add_argument('--commit-source', 
@@ -265,10 +335,33 @@ Examples:
                        help='Custom template name or path')
     parser.add_argument('--custom-sections', 
                        help='Comma-separated custom sections to include')
+    parser.add_argument('--mode', 
+                       choices=['auto', 'single', 'map-reduce'],
+                       help='Single prompt, map-reduce over chunks, or auto '
+                            '(map-reduce when a single prompt would drop changes)')
+    parser.add_argument('--themes', 
+                       action='store_true',
+                       default=None,
+                       help='Cluster commits and issues into themes before prompting (needs numpy and scipy)')
+    parser.add_argument('--structured', 
+                       action='store_true',
+                       default=None,
+                       help='Ask the LLM for schema-checked JSON and render every output format from it')
+    cache_group = parser.add_mutually_exclusive_group()
+    cache_group.add_argument('--no-cache', 
+                       action='store_const', dest='cache', const='bypass',
+                       help='Always call the LLM; neither read nor store cached responses')
+    cache_group.add_argument('--invalidate-cache', 
+                       action='store_const', dest='cache', const='refresh',
+                       help='Call the LLM again and replace any cached responses for this run')
     
     # Output and publishing
     parser.add_argument('--output', 
                        help='Custom output file path')
+    parser.add_argument('--update-changelog', 
+                       nargs='?',
+                       const='CHANGELOG.md',
+                       help='Prepend the generated notes to a changelog (default: CHANGELOG.md)')
     parser.add_argument('--publish', 
                        nargs='+',
                        choices=['confluence', 'github', 'slack', 'email', 'webhook'],
@@ -287,12 +380,15 @@ Examples:
     # Convert comma-separated strings to lists
     labels = args.labels.split(',') if args.labels else None
     custom_sections = args.custom_sections.split(',') if args.custom_sections else None
+    audiences = [a.strip() for a in args.audiences.split(',') if a.strip()] if args.audiences else None
+    if audiences and not set(audiences) <= {'users', 'developers', 'managers'}:
+        parser.error('--audiences must be a comma-separated list of users, developers, managers')
     
     if args.dry_run:
         print("Dry run mode - showing configuration:")
         print(f"  Version: {args.version}")
         print(f"  Repository: {args.repo or 'from config'}")
-        print(f"  Audience: {args.audience}")
+        print(f"  Audience: {', '.join(audiences) if audiences else args.audience}")
         print(f"  Commit source: {args.commit_source}")
         print(f"  Issue source: {args.issue_source}")
         print(f"  Release source: {args.release_source}")
@@ -329,12 +425,22 @@ Examples:
         template=args.template,
         custom_sections=custom_sections,
         publish_platforms=args.publish,
-        output_file=args.output
+        output_file=args.output,
+        changelog_file=args.update_changelog,
+        mode=args.mode,
+        themes=args.themes,
+        cache=args.cache,
+        audiences=audiences,
+        structured=args.structured
     ))
     
     if result['status'] == 'success':
         print(f'\n[SUCCESS] Release notes generation completed successfully!')
-        print(f'Output file: {result["output_file"]}')
+        if result.get('audiences'):
+            for target, entry in result['audiences'].items():
+                print(f'Output file ({target}): {entry["output_file"]}')
+        else:
+            print(f'Output file: {result["output_file"]}')
         
         if result.get('publishing', {}).get('published_to'):
             print(f'Published to: {", ".join(result["publishing"]["published_to"])}')
@@ -5,6 +5,8 @@ import json
 import subprocess
 import requests
 
+from src.ollama_client import CONNECT_TIMEOUT, get_ollama_client
+
 
 def get_fallback_models() -> List[Dict]:
     """Get fallback LLM options when OpenRouter is not available."""
@@ -29,7 +31,8 @@ def get_fallback_models() -> List[Dict]:
 def check_ollama_available() -> bool:
     """Check if Ollama is running locally."""
     try:
-        response = requests.get('http://localhost:11434/api/tags', timeout=5)
+        client = get_ollama_client()
+        response = client.session.get(f'{client.base_url}/api/tags', timeout=CONNECT_TIMEOUT)
         return response.status_code == 200
     except:
         return False
@@ -38,7 +41,8 @@ def check_ollama_available() -> bool:
 def get_ollama_models() -> List[Dict]:
     """Get available Ollama models."""
     try:
-        response = requests.get('http://localhost:11434/api/tags', timeout=5)
+        client = get_ollama_client()
+        response = client.session.get(f'{client.base_url}/api/tags', timeout=CONNECT_TIMEOUT)
         if response.status_code == 200:
             data = response.json()
             models = []
@@ -107,20 +111,8 @@ def generate_with_ollama(model: str, prompt: str) -> str:
     """Generate with local Ollama model."""
     try:
         model_name = model.replace('ollama/', '')
-        
-        payload = {
-            'model': model_name,
-            'prompt': prompt,
-            'stream': False
-        }
-        
-        response = requests.post('http://localhost:11434/api/generate', 
-                               json=payload, timeout=60)
-        
-        if response.status_code == 200:
-            return response.json().get('response', 'Generation failed')
-        else:
-            return f"Ollama error: {response.status_code}"
-            
+        return get_ollama_client().generate(model_name, prompt).get('response', 'Generation failed')
+    except requests.HTTPError as e:
+        return f"Ollama error: {e.response.status_code}"
     except Exception as e:
-        return f"Ollama generation failed: {e}"
\ No newline at end of file
+        return f"Ollama generation failed: {e}"
@@ -2,6 +2,7 @@
 import argparse
 import json
 from datetime import date, datetime, timedelta
+from functools import lru_cache, partial
 from pathlib import Path
 import sys
 from pathlib import Path
@@ -10,73 +11,118 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from src.utils import load_config, env
-from scripts.extract_commits import extract_commits_local, extract_commits_github, extract_commits_between_tags
+from scripts.extract_commits import (
+    extract_commits_local, extract_commits_github, extract_commits_between_tags, load_commit_bodies
+)
 from scripts.fetch_issues import fetch_github_issues
 from scripts.fetch_releases import fetch_github_releases, get_previous_release_notes, fetch_changelog_from_repo
-from scripts.classify_change import classify_commit
+from scripts.classify_change import classify_commits
+from scripts.commit_model import get_model
 from src.publish_to_confluence import publish as publish_to_confluence
+from src.prompt_packer import context_window, count_tokens, label_names, output_limit, pack, score_commit, score_issue
+from src.prompt_serialization import allowed_formats, cheapest_format, columns, render_record, serialize
+from src.template_registry import get_template_registry
+from src.dedup import DEFAULT_THRESHOLD, collapse_duplicates
+from src.llm_clients import CONTINUE_INSTRUCTION, MAX_CONTINUATIONS, MIN_CONTINUATION_TOKENS, OPENROUTER_BASE_URL
 
 # LLM client placeholder - adapt to your provider
 import openai
 
-def build_prompt(version, commits, issues, audience, previous_releases=None):
-    from pathlib import Path
-    
-    # Find templates directory relative to project root
-    template_path = Path('templates/prompt.md')
-    if not template_path.exists():
-        # Look for templates in parent directories
-        current = Path(__file__).parent
-        while current != current.parent:
-            template_candidate = current / 'templates' / 'prompt.md'
-            if template_candidate.exists():
-                template_path = template_candidate
-                break
-            current = current.parent
-    
-    with open(template_path) as f:
-        tpl = f.read()
+# Output room the prompt packer keeps free in the context window (call_llm sizes its actual limit)
+MAX_OUTPUT_TOKENS = 1500
+
+def _issue_summary(issue):
+    """Fields of a GitHub issue payload that are worth prompt space."""
+    return {
+        'number': issue.get('number'),
+        'title': issue.get('title', ''),
+        'labels': label_names(issue),
+        'state': issue.get('state', ''),
+        'body': (issue.get('body') or '')[:500],
+        'url': issue.get('html_url') or issue.get('url', '')
+    }
+
+def build_prompt(version, commits, issues, audience, previous_releases=None, model='gpt-5', config=None,
+                 repo_path='.'):
+    # Compiled once per process; edits to templates/prompt.md are picked up by mtime
+    tpl = get_template_registry().prompt_template()
+    tpl.check_prompt()
+    formats = allowed_formats(tpl.formats, config)
     
     prev_releases_text = ''
     if previous_releases:
-        prev_releases_text = json.dumps(previous_releases[:3])  # Last 3 releases
+        prev_releases_text = serialize(previous_releases[:3], 'json')  # Last 3 releases
     
-    data = tpl.format(
+    fields = dict(
         version=version,
         date=str(date.today()),
-        commits=json.dumps(commits[:200]),
-        issues=json.dumps(issues[:200]),
+        commits='[]',
+        issues='[]',
         previous_releases=prev_releases_text or 'None',
         audience=audience
     )
-    return data
+    overhead = count_tokens(tpl.render(**fields))
+    budget = int(max(context_window(model, config) - MAX_OUTPUT_TOKENS - overhead, 0) * 0.95)
+    
+    # Raw commit dicts gain a body only once packing loads it, so they stay JSON when allowed
+    commit_fmt = 'json' if 'json' in formats else formats[0]
+    commit_fields = list(dict.fromkeys(columns(commits) + ['body']))
+    issue_summaries = [_issue_summary(issue) for issue in issues]
+    issue_fmt, _ = cheapest_format(issue_summaries, formats)
+    issue_fields = columns(issue_summaries)
+    
+    # Highest-value items first; bodies are only read for commits that get considered
+    commit_pack = pack(commits, int(budget * 0.65), lambda c: render_record(c, commit_fmt, commit_fields),
+                       score_commit, prepare=partial(load_commit_bodies, path=repo_path))
+    issue_pack = pack(issue_summaries, budget - commit_pack.tokens,
+                      lambda i: render_record(i, issue_fmt, issue_fields), score_issue)
+    print(f'  Packed {len(commit_pack.included)}/{len(commits)} commits and '
+          f'{len(issue_pack.included)}/{len(issues)} issues into {budget} tokens '
+          f'(issues as {issue_fmt})')
+    
+    fields['commits'] = serialize(commit_pack.included, commit_fmt, commit_fields)
+    fields['issues'] = serialize(issue_pack.included, issue_fmt, issue_fields)
+    # Stable instructions first so the provider can reuse its cached prefix across runs
+    prefix, suffix = tpl.split()
+    return '\n\n'.join(part for part in (prefix.render(**fields), suffix.render(**fields)) if part)
+
+@lru_cache(maxsize=None)
+def _openai_client(api_key, base_url=None):
+    # One client (and connection pool) per key; .env files were loaded when src.utils was imported
+    return openai.OpenAI(api_key=api_key, base_url=base_url)
 
 def call_llm(prompt, model='gpt-5', temperature=0.0):
     # Allow OpenRouter API key and endpoint
-    import os
-    import openai
-    from src.utils import reload_env
-    
-    # Reload environment variables to ensure we have latest API keys
-    reload_env()
-    
     api_key = env('OPENROUTER_API_KEY') or env('OPENAI_API_KEY')
     
     if not api_key:
         raise ValueError("Neither OPENROUTER_API_KEY nor OPENAI_API_KEY is set in .env.local")
     
     # If using OpenRouter, must point base_url to their endpoint
-    if env('OPENROUTER_API_KEY'):
-        client = openai.OpenAI(api_key=api_key, base_url="https://openrouter.ai/api/v1")
-    else:
-        client = openai.OpenAI(api_key=api_key)
-    resp = client.chat.completions.create(
-        model=model,
-        messages=[{'role': 'user', 'content': prompt}],
-        temperature=temperature,
-        max_tokens=1500
-    )
-    return resp.choices[0].message.content
+    base_url = OPENROUTER_BASE_URL if env('OPENROUTER_API_KEY') else None
+    client = _openai_client(api_key, base_url)
+    messages = [{'role': 'user', 'content': prompt}]
+    text = ''
+    for attempt in range(MAX_CONTINUATIONS + 1):
+        # Whatever the window leaves after the prompt (and the answer so far), up to the model's limit
+        max_tokens = output_limit(model, count_tokens(prompt) + count_tokens(text))
+        if attempt and max_tokens < MIN_CONTINUATION_TOKENS:
+            print('  Warning: response cut off and the context window has no room to continue it')
+            break
+        resp = client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens
+        )
+        choice = resp.choices[0]
+        text += choice.message.content or ''
+        if choice.finish_reason != 'length' or not choice.message.content or attempt == MAX_CONTINUATIONS:
+            break
+        print(f'  Response cut off at the length limit; continuing ({attempt + 1}/{MAX_CONTINUATIONS})')
+        messages = [{'role': 'user', 'content': prompt}, {'role': 'assistant', 'content': text},
+                    {'role': 'user', 'content': CONTINUE_INSTRUCTION}]
+    return text
 
 def assemble_sections(llm_output: str) -> str:
     # If the LLM already returns markdown, use it directly. Optionally post-process.
@@ -90,6 +136,8 @@ if __name__ == '__main__':
     p = argparse.ArgumentParser(description='Generate release notes from git commits and GitHub issues')
     p.add_argument('--version', required=True, help='Release version (e.g., v1.2.0)')
     p.add_argument('--repo', default=None, help='GitHub repository in format owner/repo')
+    p.add_argument('--repo-path', default=None,
+                   help='Local checkout to read commits from (default: repo_path in config.yaml)')
     p.add_argument('--audience', choices=['users', 'developers', 'managers'], default='users', help='Target audience')
     p.add_argument('--from-tag', default=None, help='Previous tag to compare from (for commit range)')
     p.add_argument('--since', default=None, help='Date since (ISO format or relative like "30 days ago")')
@@ -102,6 +150,7 @@ if __name__ == '__main__':
 
     cfg = load_config()
     repo = args.repo or cfg.get('repo')
+    repo_path = args.repo_path or cfg.get('repo_path', '.')
     
     # Reload env again to ensure we have latest values
     reload_env()
@@ -130,7 +179,7 @@ if __name__ == '__main__':
             commits = extract_commits_github(repo, github_token, since=args.since)
         print(f'  Found {len(commits)} commits from GitHub')
     else:
-        commits = extract_commits_local('.', since=args.since)
+        commits = extract_commits_local(repo_path, since=args.since)
         print(f'  Found {len(commits)} commits from local repository')
     
     if not commits:
@@ -159,12 +208,16 @@ if __name__ == '__main__':
     
     # Classify commits
     print('\n[4/5] Classifying commits...')
-    for c in commits:
-        c['type'] = classify_commit(c['subject'])
+    classify_commits(commits, model=get_model(cfg.get('classifier', {}).get('model_path')))
+    representatives = collapse_duplicates(commits, cfg['llm'].get('dedup_threshold', DEFAULT_THRESHOLD))
+    if len(representatives) < len(commits):
+        print(f'  Collapsed {len(commits)} commits into {len(representatives)} after near-duplicate grouping')
+    commits = representatives
 
     # Build prompt and call LLM
     print('\n[5/5] Generating release notes with LLM...')
-    prompt = build_prompt(args.version, commits, issues, args.audience, previous_releases)
+    prompt = build_prompt(args.version, commits, issues, args.audience, previous_releases,
+                          model=cfg['llm']['model'], config=cfg, repo_path=repo_path)
     llm_out = call_llm(prompt, model=cfg['llm']['model'], temperature=cfg['llm'].get('temperature',0.0))
 
     # Assemble and write
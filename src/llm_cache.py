@@ -0,0 +1,180 @@
+"""Content-addressed cache of LLM responses.
+
+Responses are keyed by a SHA-256 of (provider, model, temperature,
+max_tokens, prompt). An in-memory LRU sits in front of a disk store under
+``cache_dir('llm')`` with one JSON file per response; when the store grows
+past its size limit the least recently used files are removed. Identical
+requests (a re-run for the same version, a retry after a publishing
+failure) are then answered without calling the provider.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from src.utils import cache_dir
+
+DEFAULT_MEMORY_ENTRIES = 128
+DEFAULT_MAX_MB = 64
+# Eviction trims the store to this share of the limit so it does not run on every write
+EVICT_TO = 0.9
+# use: read and write; bypass: neither; refresh: ignore stored entries and overwrite them
+CACHE_MODES = ('use', 'bypass', 'refresh')
+
+
+def cache_key(provider: str, model: str, temperature: float, max_tokens: int, prefix: str, suffix: str,
+              response_format: str = '') -> str:
+    """Hex digest identifying one provider request; ``response_format`` names a required output schema."""
+    digest = hashlib.sha256()
+    fields = [provider, model, round(float(temperature), 4), max_tokens]
+    header = json.dumps(fields + [response_format] if response_format else fields)
+    for part in (header, prefix, suffix):
+        data = part.encode('utf-8')
+        # Length-prefixed so (prefix, suffix) boundaries cannot collide
+        digest.update(len(data).to_bytes(8, 'big'))
+        digest.update(data)
+    return digest.hexdigest()
+
+
+class ResponseCache:
+    """Memory LRU over a size-bounded directory of cached responses."""
+
+    def __init__(self, directory: Optional[Path] = None, memory_entries: int = DEFAULT_MEMORY_ENTRIES,
+                 max_bytes: int = DEFAULT_MAX_MB * 1024 * 1024):
+        self.directory = Path(directory) if directory else cache_dir('llm')
+        self.memory_entries = memory_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._memory: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self._disk_bytes: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f'{key}.json'
+
+    def _remember(self, key: str, entry: Dict[str, Any]) -> None:
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Cached entry (``text``, ``finish_reason``, ``usage``) or None."""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return entry
+            path = self._path(key)
+            try:
+                entry = json.loads(path.read_text(encoding='utf-8'))
+                # mtime doubles as last-use time for disk eviction
+                os.utime(path)
+            except (OSError, ValueError):
+                self.misses += 1
+                return None
+            self._remember(key, entry)
+            self.hits += 1
+            return entry
+
+    def put(self, key: str, entry: Dict[str, Any]) -> None:
+        entry = {**entry, 'created': entry.get('created') or time.time()}
+        data = json.dumps(entry).encode('utf-8')
+        with self._lock:
+            self._remember(key, entry)
+            path = self._path(key)
+            try:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                previous = path.stat().st_size if path.exists() else 0
+                tmp = path.with_suffix(f'.{os.getpid()}.tmp')
+                tmp.write_bytes(data)
+                os.replace(tmp, path)
+            except OSError as e:
+                print(f"Warning: could not write LLM cache entry: {e}")
+                return
+            if self._disk_bytes is None:
+                self._disk_bytes = self._scan_size()
+            else:
+                self._disk_bytes += len(data) - previous
+            if self._disk_bytes > self.max_bytes:
+                self._evict()
+
+    def _files(self):
+        if not self.directory.is_dir():
+            return
+        for sub in os.scandir(self.directory):
+            if sub.is_dir():
+                with os.scandir(sub.path) as entries:
+                    for entry in entries:
+                        if entry.name.endswith('.json'):
+                            yield entry
+
+    def _scan_size(self) -> int:
+        return sum(entry.stat().st_size for entry in self._files())
+
+    def _evict(self) -> None:
+        files = sorted(((e.stat().st_mtime_ns, e.stat().st_size, e.path) for e in self._files()))
+        total = sum(size for _, size, _ in files)
+        target = self.max_bytes * EVICT_TO
+        for _, size, path in files:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+        self._disk_bytes = total
+
+    def invalidate(self, key: Optional[str] = None) -> int:
+        """Drop one entry, or everything when ``key`` is None; returns the number of files removed."""
+        with self._lock:
+            if key is not None:
+                self._memory.pop(key, None)
+                paths = [self._path(key)]
+            else:
+                self._memory.clear()
+                paths = [Path(e.path) for e in self._files()]
+            removed = 0
+            for path in paths:
+                try:
+                    path.unlink()
+                    removed += 1
+                except OSError:
+                    pass
+            self._disk_bytes = None
+            return removed
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            files = list(self._files())
+            return {
+                'directory': str(self.directory),
+                'entries': len(files),
+                'bytes': sum(e.stat().st_size for e in files),
+                'max_bytes': self.max_bytes,
+                'memory_entries': len(self._memory),
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+
+_cache: Optional[ResponseCache] = None
+
+
+def get_response_cache(settings: Optional[Dict] = None) -> ResponseCache:
+    """Process-wide cache, sized from ``llm.cache`` settings on first use."""
+    global _cache
+    if _cache is None:
+        settings = settings if isinstance(settings, dict) else {}
+        _cache = ResponseCache(
+            memory_entries=settings.get('memory_entries', DEFAULT_MEMORY_ENTRIES),
+            max_bytes=int(settings.get('max_mb', DEFAULT_MAX_MB) * 1024 * 1024),
+        )
+    return _cache
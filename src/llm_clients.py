@@ -0,0 +1,114 @@
+"""Long-lived async SDK clients shared across LLM calls.
+
+One client is created lazily per (provider, API key, event loop) and kept,
+so its HTTP connection pool (keep-alive) is reused by every later call on
+that loop. Clients are bound to the loop they were created on; entries for
+loops that have been closed (e.g. after ``asyncio.run`` returns) are
+dropped on the next lookup.
+
+Code that runs coroutines many times per process (the API server's
+request handlers) should use ``run_async`` instead of ``asyncio.run``: it
+submits them to one background loop, so every request reuses the same
+clients, and those are closed when the process exits.
+"""
+import asyncio
+import atexit
+import threading
+from typing import Any, Awaitable, Dict, Optional, Tuple, TypeVar
+
+import openai
+
+OPENROUTER_BASE_URL = 'https://openrouter.ai/api/v1'
+# Seconds before a provider request is abandoned; retries are left to src.resilience
+REQUEST_TIMEOUT = 120.0
+# Finish reasons of a response cut off by its completion limit (OpenAI/Ollama, Anthropic)
+TRUNCATED_REASONS = ('length', 'max_tokens')
+# Follow-up requests for a cut-off response before it is returned as is (llm.max_continuations)
+MAX_CONTINUATIONS = 3
+# Least completion room worth a follow-up request; below it the answer is returned cut off
+MIN_CONTINUATION_TOKENS = 256
+# Sent after the cut-off answer where the provider cannot continue an assistant message itself
+CONTINUE_INSTRUCTION = (
+    'Your answer was cut off by the length limit. Continue it exactly where it stopped, '
+    'without repeating any of it and without any preamble.'
+)
+
+# Seconds run_async's exit hook waits for the clients of the background loop to close
+SHUTDOWN_TIMEOUT = 5.0
+
+T = TypeVar('T')
+
+_clients: Dict[Tuple[str, str, asyncio.AbstractEventLoop], Any] = {}
+_lock = threading.Lock()
+_background: Optional[asyncio.AbstractEventLoop] = None
+
+
+def _create(provider: str, api_key: str):
+    if provider == 'openai':
+        return openai.AsyncOpenAI(api_key=api_key, timeout=REQUEST_TIMEOUT, max_retries=0)
+    if provider == 'openrouter':
+        return openai.AsyncOpenAI(api_key=api_key, base_url=OPENROUTER_BASE_URL,
+                                  timeout=REQUEST_TIMEOUT, max_retries=0)
+    if provider == 'anthropic':
+        try:
+            import anthropic
+        except ImportError:
+            raise ValueError("anthropic package not installed. Run: pip install anthropic")
+        return anthropic.AsyncAnthropic(api_key=api_key, timeout=REQUEST_TIMEOUT, max_retries=0)
+    raise ValueError(f"No async client for provider: {provider}")
+
+
+def get_async_client(provider: str, api_key: str):
+    """Shared async client for ``provider`` and ``api_key`` on the running event loop."""
+    loop = asyncio.get_running_loop()
+    key = (provider, api_key, loop)
+    with _lock:
+        for stale in [k for k in _clients if k[2].is_closed()]:
+            del _clients[stale]
+        client = _clients.get(key)
+        if client is None:
+            client = _clients[key] = _create(provider, api_key)
+        return client
+
+
+async def close_clients() -> int:
+    """Close the clients of the running loop (e.g. at shutdown); returns how many were closed."""
+    loop = asyncio.get_running_loop()
+    with _lock:
+        clients = [_clients.pop(k) for k in [k for k in _clients if k[2] is loop]]
+    for client in clients:
+        await client.close()
+    return len(clients)
+
+
+def _background_loop() -> asyncio.AbstractEventLoop:
+    global _background
+    with _lock:
+        if _background is None:
+            _background = asyncio.new_event_loop()
+            threading.Thread(target=_background.run_forever, name='llm-loop', daemon=True).start()
+            atexit.register(_stop_background, _background)
+        return _background
+
+
+def _stop_background(loop: asyncio.AbstractEventLoop) -> None:
+    try:
+        asyncio.run_coroutine_threadsafe(close_clients(), loop).result(SHUTDOWN_TIMEOUT)
+    except Exception as e:
+        print(f"Warning: LLM clients were not closed cleanly: {e}")
+    loop.call_soon_threadsafe(loop.stop)
+
+
+def run_async(coro: Awaitable[T], timeout: Optional[float] = None) -> T:
+    """Run ``coro`` on the shared background loop and wait for its result.
+
+    A drop-in for ``asyncio.run`` in threads that are not running a loop;
+    it must not be called from the background loop itself. The coroutine
+    is cancelled if waiting for it times out or is interrupted.
+    """
+    future = asyncio.run_coroutine_threadsafe(coro, _background_loop())
+    try:
+        return future.result(timeout)
+    except BaseException:
+        future.cancel()
+        raise
@@ -1,12 +1,106 @@
 """Enhanced LLM integration service with multiple providers and prompt customization."""
 import json
-from typing import Dict, List, Optional, Any, Union
+import asyncio
+import contextlib
+import threading
+from contextvars import ContextVar
+from functools import partial
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Callable, Dict, List, NamedTuple, Optional, Union
 from pathlib import Path
 from datetime import datetime
-import openai
 import requests
 from src.utils import env, load_config
-from src.fallback_llm import generate_with_template, generate_with_ollama
+from src.fallback_llm import generate_with_template
+from scripts.extract_commits import load_commit_bodies, load_commit_paths
+from src.data_ingestion import RELEASE_CONTEXT_CHARS
+from src.prompt_packer import (
+    DEFAULT_OUTPUT_TOKENS, context_window, count_tokens, describe_commit, describe_issue,
+    label_names, output_limit, pack, score_commit, score_issue
+)
+from src.prompt_serialization import (
+    allowed_formats, cheapest_format, columns, format_overhead, render_record, serialize
+)
+from src.template_registry import compile_template, get_template_registry
+from src.map_reduce import batch_texts, partition_changes
+from src.dedup import DEFAULT_THRESHOLD, collapse_duplicates
+from src.themes import DEFAULT_MAX_THEMES, cluster_themes, describe_themes, theme_heading, theme_lookup
+from src.llm_cache import CACHE_MODES, cache_key, get_response_cache
+from src.llm_clients import (
+    CONTINUE_INSTRUCTION, MAX_CONTINUATIONS, MIN_CONTINUATION_TOKENS, TRUNCATED_REASONS, get_async_client
+)
+from src.resilience import DEFAULT_SETTINGS, backoff_delays, get_breaker, is_retryable, retry_after
+from src.rate_limit import get_admission_controller, next_flow_id
+from src.ollama_client import StreamHandle, get_ollama_client
+from src.release_schema import (
+    JSON_INSTRUCTIONS, RELEASE_NOTES_SCHEMA, SCHEMA_NAME, notes_from_markdown, parse_notes, section_key,
+)
+from src.renderers import markdown_items, render_markdown
+from src.batch_llm import BATCH_API_KEYS, ENDED, FAILED, get_batch_client, save_manifest
+
+# Share of the packing budget offered to commits first; issues get the rest
+COMMIT_BUDGET_SHARE = 0.65
+# Headroom for tokenizer differences and JSON list punctuation
+PACKING_MARGIN = 0.05
+# Map-reduce defaults (llm.map_concurrency, llm.map_template, llm.reduce_template)
+MAP_CONCURRENCY = 4
+MAP_TEMPLATE = 'map_summary'
+REDUCE_TEMPLATE = 'reduce_notes'
+GENERATION_MODES = ('auto', 'single', 'map-reduce')
+# Seconds between status checks of a submitted batch (llm.batch.poll_interval)
+BATCH_POLL_SECONDS = 60.0
+# Seconds without a first token before the next model of the fallback chain is started (llm.hedge_after_seconds)
+HEDGE_AFTER_SECONDS = 20.0
+# Shortest prompt prefix each provider caches; shorter prefixes are always billed in full
+CACHE_MIN_PREFIX_TOKENS = {'openai': 1024, 'openrouter': 1024, 'anthropic': 1024}
+_DONE = object()
+
+
+class PromptParts(NamedTuple):
+    """A prompt split into a stable, cacheable prefix and the per-release suffix.
+    
+    ``partial`` is the answer so far when asking for the rest of a response
+    that was cut off by its completion limit.
+    """
+    prefix: str
+    suffix: str
+    partial: str = ''
+
+    @property
+    def text(self) -> str:
+        return '\n\n'.join(part for part in (self.prefix, self.suffix) if part)
+
+
+@dataclass
+class LLMResponse:
+    text: str
+    finish_reason: Optional[str] = None
+    # input_tokens (including cached), cached_tokens, output_tokens as reported by the provider
+    usage: Dict[str, int] = field(default_factory=dict)
+
+
+# Per-call usage of the generation running in the current task (see generate_release_notes)
+_usage_log: ContextVar[Optional[List[Dict]]] = ContextVar('llm_usage_log', default=None)
+# Response cache mode of the running generation (one of CACHE_MODES); None means llm.cache settings
+_cache_mode: ContextVar[Optional[str]] = ContextVar('llm_cache_mode', default=None)
+# Schema the running generation's final call must answer with (structured mode), else None
+_output_schema: ContextVar[Optional[Dict]] = ContextVar('llm_output_schema', default=None)
+# Fair-queueing flow of the running generation (see src.rate_limit)
+_flow: ContextVar[str] = ContextVar('llm_flow', default='default')
+
+
+def summarize_usage(calls: List[Dict]) -> Dict[str, Any]:
+    """Totals of cached versus uncached input tokens over provider calls."""
+    input_tokens = sum(c.get('input_tokens', 0) for c in calls)
+    cached = sum(c.get('cached_tokens', 0) for c in calls)
+    return {
+        'calls': calls,
+        'input_tokens': input_tokens,
+        'cached_tokens': cached,
+        'uncached_tokens': input_tokens - cached,
+        'output_tokens': sum(c.get('output_tokens', 0) for c in calls),
+        'cached_responses': sum(1 for c in calls if c.get('cached_response')),
+    }
 
 
 class LLMService:
@@ -15,14 +109,25 @@ class LLMService:
     def __init__(self, config: Optional[Dict] = None):
         self.config = config or load_config()
         self.llm_config = self.config.get('llm', {})
+        # Local checkout the commits come from; bodies and changed paths are read from it
+        self.repo_path = self.config.get('repo_path', '.')
         self.providers = {
             'openai': self._call_openai,
             'openrouter': self._call_openrouter,
             'anthropic': self._call_anthropic,
             'local': self._call_local_llm,
-            'ollama': self._call_ollama,
+            'ollama': self._call_local_llm,
             'template': self._call_template
         }
+        # Providers that can stream; the rest answer stream_llm in one piece
+        self.stream_providers = {
+            'openai': self._stream_openai,
+            'openrouter': self._stream_openrouter,
+            'anthropic': self._stream_anthropic,
+            'local': self._stream_local_llm,
+            'ollama': self._stream_local_llm
+        }
+        self.last_pack_report: Dict[str, Any] = {}
     
     def detect_provider(self, model: str) -> str:
         """Detect provider based on model name."""
@@ -49,42 +154,470 @@ class LLMService:
         template: Optional[str] = None,
         custom_sections: Optional[List[str]] = None,
         model: Optional[str] = None,
-        temperature: Optional[float] = None
+        temperature: Optional[float] = None,
+        mode: Optional[str] = None,
+        themes: Optional[bool] = None,
+        cache: Optional[str] = None,
+        on_token: Optional[Callable[[str], Any]] = None,
+        structured: Optional[bool] = None
     ) -> Dict[str, Any]:
-        """Generate structured release notes using LLM."""
+        """Generate structured release notes using LLM.
+        
+        ``mode`` is ``single`` (one packed prompt), ``map-reduce`` (summarize
+        token-bounded chunks concurrently, then write the notes from the
+        summaries) or ``auto`` (map-reduce only when a single prompt would
+        have to drop commits or issues). Defaults to ``llm.mode`` or ``single``.
+        Near-duplicate commits are collapsed first (``llm.dedup_threshold``,
+        default 0.8, 0 disables). With ``themes`` (default ``llm.themes``) commits and
+        issues are clustered into labelled themes and presented grouped.
+        Prompts are sent as a stable prefix plus variable suffix so providers
+        can cache the prefix; ``metadata['usage']`` reports cached versus
+        uncached input tokens for every provider call. ``cache`` is one of
+        ``use`` (default), ``bypass`` or ``refresh`` for the response cache.
+        With ``on_token``, the final completion is streamed and each piece is
+        passed to it as it arrives. Every call is hedged across
+        ``llm.fallback_models`` (see ``hedged_stream``); ``metadata['fallback']``
+        names the model that answered the final call. With ``structured``
+        (default ``llm.structured_output``) the final call answers with JSON
+        matching ``RELEASE_NOTES_SCHEMA`` (provider JSON/tool modes where
+        available); the result's ``notes`` holds it and ``raw_output`` is
+        rendered from it, and ``on_token`` receives that rendering once.
+        """
         
-        # Build the prompt
-        prompt = self.build_prompt(
+        prepared = self._prepare_changes(commits, issues, themes)
+        return await self._generate(
+            version, prepared, issues, audience, previous_releases, template, custom_sections,
+            model, temperature, mode, cache, on_token, structured
+        )
+    
+    async def generate_for_audiences(
+        self,
+        version: str,
+        commits: List[Dict],
+        issues: List[Dict],
+        audiences: List[str],
+        previous_releases: Optional[List[Dict]] = None,
+        template: Optional[str] = None,
+        custom_sections: Optional[List[str]] = None,
+        model: Optional[str] = None,
+        temperature: Optional[float] = None,
+        mode: Optional[str] = None,
+        themes: Optional[bool] = None,
+        cache: Optional[str] = None,
+        on_token: Optional[Callable[[str, str], Any]] = None,
+        structured: Optional[bool] = None
+    ) -> Dict[str, Dict[str, Any]]:
+        """Generate notes for several audiences concurrently from one set of changes.
+        
+        Duplicate collapsing and theme clustering run once; each audience
+        then gets its own packed prompt and all prompts are sent at once.
+        If one audience fails, the others are cancelled (and have stopped
+        calling ``on_token``) before the error is raised. Returns
+        ``generate_release_notes`` results keyed by audience; ``on_token``
+        is called with ``(audience, piece)``.
+        """
+        prepared = self._prepare_changes(commits, issues, themes)
+        tasks = [
+            asyncio.create_task(self._generate(
+                version, prepared, issues, audience, previous_releases, template, custom_sections,
+                model, temperature, mode, cache,
+                (lambda piece, audience=audience: on_token(audience, piece)) if on_token else None,
+                structured
+            ))
+            for audience in audiences
+        ]
+        try:
+            results = await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        return dict(zip(audiences, results))
+    
+    def prepare_batch_job(
+        self,
+        version: str,
+        commits: List[Dict],
+        issues: List[Dict],
+        audience: str = 'users',
+        previous_releases: Optional[List[Dict]] = None,
+        template: Optional[str] = None,
+        custom_sections: Optional[List[str]] = None,
+        model: Optional[str] = None,
+        themes: Optional[bool] = None
+    ) -> Dict[str, Any]:
+        """Packed single prompt for one version, to be sent with ``submit_batch``.
+        
+        Batches hold independent requests, so map-reduce is not available:
+        changes that do not fit the context window are dropped and reported
+        in the job's ``packing``.
+        """
+        model = model or self.llm_config.get('model', 'gpt-4')
+        prepared = self._prepare_changes(commits, issues, themes)
+        prompt = self._build_prompt_parts(
             version=version,
-            commits=commits,
+            commits=prepared['commits'],
             issues=issues,
             audience=audience,
             previous_releases=previous_releases,
             template=template,
-            custom_sections=custom_sections
+            custom_sections=custom_sections,
+            model=model,
+            themes=prepared['themes']
+        )
+        packing = self.last_pack_report
+        if packing['commits']['dropped'] or packing['issues']['dropped']:
+            print(f"Warning: {version} does not fit one prompt; batch mode drops "
+                  f"{packing['commits']['dropped']} commits and {packing['issues']['dropped']} issues")
+        return {
+            'custom_id': f'{version}:{audience}',
+            'version': version,
+            'audience': audience,
+            'prefix': prompt.prefix,
+            'suffix': prompt.suffix,
+            'packing': packing,
+        }
+    
+    def _batch_client(self, provider: str):
+        """Batch client with the provider's key; ``llm.batch.base_urls`` can point it elsewhere."""
+        key_name = BATCH_API_KEYS.get(provider)
+        base_url = ((self.llm_config.get('batch') or {}).get('base_urls') or {}).get(provider)
+        return get_batch_client(provider, self._api_key(key_name) if key_name else '', base_url)
+    
+    async def submit_batch(
+        self, jobs: List[Dict[str, Any]], model: Optional[str] = None, temperature: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """Send ``prepare_batch_job`` prompts to the provider's batch API.
+        
+        Returns the manifest (batch id, model and jobs without their
+        prompts), which is also saved so ``collect_batch`` can pick the
+        batch up from another process.
+        """
+        model = model or self.llm_config.get('model', 'gpt-4')
+        temperature = temperature if temperature is not None else self.llm_config.get('temperature', 0.0)
+        provider = self.detect_provider(model)
+        client = self._batch_client(provider)
+        cache = self._response_cache(provider, temperature)
+        batch_requests, entries = [], []
+        for job in jobs:
+            parts = PromptParts(job['prefix'], job['suffix'])
+            max_tokens = self._max_tokens(model, parts)
+            if provider == 'anthropic':
+                body = self._anthropic_request(parts, model, temperature)
+            else:
+                body = {'model': model, 'messages': self._chat_messages(parts), 'temperature': temperature,
+                        'max_tokens': max_tokens}
+            batch_requests.append({'custom_id': job['custom_id'], 'body': body})
+            entries.append({
+                'custom_id': job['custom_id'],
+                'version': job['version'],
+                'audience': job['audience'],
+                'prompt_tokens': count_tokens(parts.text),
+                'packing': job.get('packing'),
+                # Results are stored under the key a synchronous call would use
+                'cache_key': cache_key(provider, model, temperature, max_tokens, parts.prefix, parts.suffix)
+                if cache is not None else None,
+            })
+        batch_id = await asyncio.to_thread(
+            client.submit, batch_requests, f'release notes for {len(jobs)} versions'
         )
+        manifest = {'batch_id': batch_id, 'provider': provider, 'model': model, 'temperature': temperature,
+                    'submitted': datetime.now().isoformat(), 'jobs': entries}
+        save_manifest(manifest)
+        return manifest
+    
+    async def collect_batch(
+        self, manifest: Dict[str, Any], poll_interval: Optional[float] = None, timeout: Optional[float] = None
+    ) -> Dict[str, Dict[str, Any]]:
+        """Wait for a submitted batch and return ``generate_release_notes``-style results by custom_id.
         
-        # Call LLM
+        Polls every ``poll_interval`` seconds (``llm.batch.poll_interval``)
+        until the batch ends, raising ValueError if it fails or ``timeout``
+        passes. Requests that failed get ``{'error': ...}``. Successful
+        responses that were not cut off are also stored in the response
+        cache, so a later synchronous run for the same prompt does not call
+        the provider.
+        """
+        provider, model, temperature = manifest['provider'], manifest['model'], manifest['temperature']
+        if poll_interval is None:
+            poll_interval = (self.llm_config.get('batch') or {}).get('poll_interval', BATCH_POLL_SECONDS)
+        client = self._batch_client(provider)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout if timeout is not None else None
+        while True:
+            status = await asyncio.to_thread(client.status, manifest['batch_id'])
+            if status['state'] == FAILED:
+                raise ValueError(f"Batch {manifest['batch_id']} {status['provider_status']}")
+            if status['state'] == ENDED:
+                break
+            if deadline is not None and loop.time() + poll_interval > deadline:
+                raise ValueError(
+                    f"Batch {manifest['batch_id']} still {status['provider_status']} "
+                    f"({status['completed']}/{status['total']} done); collect it later"
+                )
+            await asyncio.sleep(poll_interval)
+        
+        responses = await asyncio.to_thread(client.results, status)
+        cache = self._response_cache(provider, temperature)
+        results = {}
+        for job in manifest['jobs']:
+            response = responses.get(job['custom_id']) or {'error': 'missing from batch results'}
+            if 'error' in response:
+                results[job['custom_id']] = {'error': response['error'], 'version': job['version']}
+                continue
+            if response['finish_reason'] in TRUNCATED_REASONS:
+                # Batches cannot be continued; a synchronous run would complete this one
+                print(f"Warning: batch response for {job['custom_id']} was cut off at its completion limit")
+            elif cache is not None and job.get('cache_key') and response['text']:
+                cache.put(job['cache_key'], response)
+            call = {'provider': provider, 'model': model, 'cached_response': False, **response['usage']}
+            results[job['custom_id']] = {
+                'raw_output': response['text'],
+                'structured': self.parse_llm_output(response['text']),
+                'metadata': {
+                    'model': model,
+                    'temperature': temperature,
+                    'audience': job['audience'],
+                    'mode': 'batch',
+                    'batch_id': manifest['batch_id'],
+                    'finish_reason': response['finish_reason'],
+                    'prompt_tokens': job['prompt_tokens'],
+                    'usage': summarize_usage([call]),
+                    'packing': job.get('packing'),
+                    'version': job['version']
+                }
+            }
+        return results
+    
+    def _prepare_changes(self, commits: List[Dict], issues: List[Dict], themes: Optional[bool]) -> Dict[str, Any]:
+        """Audience-independent preparation: duplicate collapsing and optional themes."""
+        # Collapse near-duplicate commits ("fix lint", "Fix lint (#123)") into one with a count
+        commit_count = len(commits)
+        commits = collapse_duplicates(commits, self.llm_config.get('dedup_threshold', DEFAULT_THRESHOLD))
+        
+        theme_list = None
+        if themes if themes is not None else self.llm_config.get('themes', False):
+            theme_list = self._cluster_themes(commits, issues)
+        return {'commits': commits, 'commit_count': commit_count, 'themes': theme_list}
+    
+    async def _generate(
+        self,
+        version: str,
+        prepared: Dict[str, Any],
+        issues: List[Dict],
+        audience: str,
+        previous_releases: Optional[List[Dict]],
+        template: Optional[str],
+        custom_sections: Optional[List[str]],
+        model: Optional[str],
+        temperature: Optional[float],
+        mode: Optional[str],
+        cache: Optional[str],
+        on_token: Optional[Callable[[str], Any]],
+        structured: Optional[bool] = None
+    ) -> Dict[str, Any]:
+        """One audience's generation from ``_prepare_changes`` output."""
         model = model or self.llm_config.get('model', 'gpt-4')
         temperature = temperature if temperature is not None else self.llm_config.get('temperature', 0.0)
+        mode = mode or self.llm_config.get('mode', 'single')
+        structured = structured if structured is not None else self.llm_config.get('structured_output', False)
+        if mode not in GENERATION_MODES:
+            raise ValueError(f"Unknown generation mode '{mode}'; expected one of {list(GENERATION_MODES)}")
+        if cache is not None and cache not in CACHE_MODES:
+            raise ValueError(f"Unknown cache mode '{cache}'; expected one of {list(CACHE_MODES)}")
+        commits, theme_list = prepared['commits'], prepared['themes']
+        
+        # Build the prompt, packed to fit the model's context window
+        prompt = self._build_prompt_parts(
+            version=version,
+            commits=commits,
+            issues=issues,
+            audience=audience,
+            previous_releases=previous_releases,
+            template=template,
+            custom_sections=custom_sections,
+            model=model,
+            themes=theme_list
+        )
+        packing = self.last_pack_report
+        map_reduce = None
+        
+        # Call the LLM, recording provider usage for this generation (map calls included)
+        calls: List[Dict] = []
+        outcome: Dict[str, Any] = {}
+        token = _usage_log.set(calls)
+        cache_token = _cache_mode.set(cache)
+        flow_token = _flow.set(next_flow_id())
+        try:
+            dropped = packing['commits']['dropped'] + packing['issues']['dropped']
+            if mode == 'auto' and dropped:
+                print(f"  {dropped} changes do not fit one prompt; switching to map-reduce (extra LLM calls)")
+            if mode == 'map-reduce' or (mode == 'auto' and dropped):
+                prompt, map_reduce = await self._map_changes(
+                    version, commits, issues, audience, previous_releases, custom_sections, model, temperature,
+                    theme_list
+                )
+            if structured:
+                # The schema goes in the prefix, so it is cached along with the instructions
+                prompt = PromptParts('\n\n'.join(p for p in (prompt.prefix, JSON_INSTRUCTIONS) if p), prompt.suffix)
+            schema_token = _output_schema.set(RELEASE_NOTES_SCHEMA if structured else None)
+            try:
+                pieces = []
+                async for piece in self.hedged_stream(prompt, model, temperature, outcome):
+                    pieces.append(piece)
+                    if on_token is not None and not structured:
+                        on_token(piece)
+            finally:
+                _output_schema.reset(schema_token)
+            raw_output = ''.join(pieces)
+        finally:
+            _flow.reset(flow_token)
+            _cache_mode.reset(cache_token)
+            _usage_log.reset(token)
         
-        raw_output = await self.call_llm(prompt, model, temperature)
+        prefix_tokens = count_tokens(prompt.prefix)
+        cache_minimum = CACHE_MIN_PREFIX_TOKENS.get(self.detect_provider(model))
+        if cache_minimum and prefix_tokens < cache_minimum:
+            print(f"Warning: prompt prefix is {prefix_tokens} tokens; {model} only caches prefixes "
+                  f"of {cache_minimum}+ tokens")
         
         # Parse and structure the output
-        structured_output = self.parse_llm_output(raw_output)
+        notes = None
+        if structured:
+            notes = self.parse_notes(raw_output)
+            raw_output = render_markdown(notes, version)
+            if on_token is not None:
+                on_token(raw_output)
+            # Same shape as parse_llm_output, for callers that read sections by key
+            structured_output = {section_key(s['heading']): markdown_items(s) for s in notes['sections']}
+        else:
+            structured_output = self.parse_llm_output(raw_output)
         
         return {
             'raw_output': raw_output,
             'structured': structured_output,
+            'notes': notes,
             'metadata': {
                 'model': model,
                 'temperature': temperature,
                 'audience': audience,
-                'prompt_length': len(prompt),
+                'mode': 'map-reduce' if map_reduce else 'single',
+                'prompt_length': len(prompt.text),
+                'prompt_tokens': count_tokens(prompt.text),
+                'prefix_tokens': prefix_tokens,
+                'prefix_cacheable': prefix_tokens >= cache_minimum if cache_minimum else None,
+                'usage': summarize_usage(calls),
+                'fallback': outcome,
+                'packing': packing,
+                'map_reduce': map_reduce,
+                'dedup': {'commits': prepared['commit_count'], 'representatives': len(commits)},
+                'themes': describe_themes(theme_list) if theme_list else None,
                 'version': version
             }
         }
     
+    async def _map_changes(
+        self,
+        version: str,
+        commits: List[Dict],
+        issues: List[Dict],
+        audience: str,
+        previous_releases: Optional[List[Dict]],
+        custom_sections: Optional[List[str]],
+        model: str,
+        temperature: float,
+        themes=None
+    ):
+        """Map phase of map-reduce generation; returns the reduce prompt and a report.
+        
+        Every commit and issue is covered: the change set is split into
+        chunks that each fit one map prompt, the chunks are summarized
+        concurrently (at most ``llm.map_concurrency`` calls in flight), and
+        the summaries are combined into the reduce prompt. If the summaries
+        themselves do not fit, they are summarized again in batches first.
+        With ``themes``, chunks follow the themes instead of scopes/labels.
+        """
+        registry = get_template_registry()
+        map_template = registry.get(self.llm_config.get('map_template', MAP_TEMPLATE))
+        reduce_template = registry.get(self.llm_config.get('reduce_template', REDUCE_TEMPLATE))
+        if map_template is None or reduce_template is None:
+            raise ValueError("Map-reduce generation needs the map_summary and reduce_notes templates")
+        map_template.check_prompt()
+        reduce_template.check_prompt()
+        formats = allowed_formats(map_template.formats, self.config)
+        
+        if audience == 'developers':
+            load_commit_bodies(commits, self.repo_path)
+        commit_fmt, commit_fields, _ = self._choose_format(
+            [self._commit_record(c, audience) for c in self._commit_sample(commits)], formats)
+        issue_fmt, issue_fields, _ = self._choose_format(
+            [self._issue_record(i, audience) for i in issues[:50]], formats)
+        
+        map_data = self._template_fields(version, audience, None, None, formats)
+        map_data['component'] = ''
+        budget = self._data_budget(map_template, map_data, model)
+        budget -= format_overhead(commit_fmt, commit_fields) + format_overhead(issue_fmt, issue_fields)
+        chunks = partition_changes(
+            commits, issues, max(budget, 1),
+            lambda c: count_tokens(render_record(self._commit_record(c, audience), commit_fmt, commit_fields)),
+            lambda i: count_tokens(render_record(self._issue_record(i, audience), issue_fmt, issue_fields)),
+            component=(lambda item, labels=theme_lookup(themes): labels.get(id(item), 'other')) if themes else None
+        )
+        
+        semaphore = asyncio.Semaphore(self.llm_config.get('map_concurrency', MAP_CONCURRENCY))
+        
+        async def summarize(component: str, commits_text: str, issues_text: str) -> str:
+            prompt = self._render_parts(map_template, {
+                **map_data, 'component': component, 'commits': commits_text, 'issues': issues_text
+            })
+            async with semaphore:
+                return ''.join([piece async for piece in self.hedged_stream(prompt, model, temperature)])
+        
+        summaries = await asyncio.gather(*[
+            summarize(
+                chunk.label,
+                serialize([self._commit_record(c, audience) for c in chunk.commits], commit_fmt, commit_fields)
+                if chunk.commits else 'None',
+                serialize([self._issue_record(i, audience) for i in chunk.issues], issue_fmt, issue_fields)
+                if chunk.issues else 'None'
+            )
+            for chunk in chunks
+        ])
+        parts = [
+            f"### {chunk.label} ({len(chunk.commits)} commits, {len(chunk.issues)} issues)\n{summary.strip()}"
+            for chunk, summary in zip(chunks, summaries)
+        ]
+        
+        reduce_data = self._template_fields(version, audience, previous_releases, custom_sections, formats)
+        reduce_data['summaries'] = ''
+        reduce_budget = self._data_budget(reduce_template, reduce_data, model)
+        rounds = 0
+        while len(parts) > 1 and count_tokens('\n\n'.join(parts)) > reduce_budget:
+            # Summaries still too large for one prompt: combine them in batches
+            rounds += 1
+            batches = batch_texts(parts, max(budget, 1), count_tokens)
+            if len(batches) == len(parts):
+                break
+            combined = await asyncio.gather(*[
+                summarize(f'combined part {n + 1} of {len(batches)}', '\n\n'.join(batch), 'None')
+                for n, batch in enumerate(batches)
+            ])
+            parts = [f"### Part {n + 1}\n{text.strip()}" for n, text in enumerate(combined)]
+        
+        reduce_data['summaries'] = '\n\n' + '\n\n'.join(parts)
+        report = {
+            'chunks': [
+                {'components': chunk.components, 'commits': len(chunk.commits),
+                 'issues': len(chunk.issues), 'tokens': chunk.tokens}
+                for chunk in chunks
+            ],
+            'map_calls': len(chunks),
+            'combine_rounds': rounds,
+            'chunk_budget': budget
+        }
+        return self._render_parts(reduce_template, reduce_data), report
+    
     def build_prompt(
         self,
         version: str,
@@ -93,108 +626,267 @@ class LLMService:
         audience: str = 'users',
         previous_releases: Optional[List[Dict]] = None,
         template: Optional[str] = None,
-        custom_sections: Optional[List[str]] = None
+        custom_sections: Optional[List[str]] = None,
+        model: Optional[str] = None,
+        themes=None
     ) -> str:
-        """Build customized prompt based on audience and template."""
+        """Build customized prompt based on audience and template.
+        
+        Returns the prompt as one text, stable prefix first; see
+        ``_build_prompt_parts`` for the arguments.
+        """
+        return self._build_prompt_parts(
+            version, commits, issues, audience, previous_releases, template, custom_sections, model, themes
+        ).text
+    
+    def _build_prompt_parts(
+        self,
+        version: str,
+        commits: List[Dict],
+        issues: List[Dict],
+        audience: str = 'users',
+        previous_releases: Optional[List[Dict]] = None,
+        template: Optional[str] = None,
+        custom_sections: Optional[List[str]] = None,
+        model: Optional[str] = None,
+        themes=None
+    ) -> PromptParts:
+        """Build the prompt as a cacheable prefix and a per-release suffix.
+        
+        Commits and issues are packed by value into whatever part of the
+        model's context window is left after the template and the reserved
+        output budget; what was dropped is recorded in ``last_pack_report``.
+        When ``themes`` (from ``cluster_themes``) are given, the packed items
+        are presented grouped under a heading per theme.
+        Raises ValueError if the template has placeholders that cannot be filled.
+        """
         
-        # Load base template
+        # Compiled templates come from the registry; anything else is direct template content
+        registry = get_template_registry()
         if template:
-            template_path = Path(f'templates/{template}')
-            if template_path.exists():
-                base_template = template_path.read_text(encoding='utf-8')
-            else:
-                base_template = template  # Treat as direct template content
+            base_template = registry.get(template) or compile_template(template)
         else:
-            # Load audience-specific template
-            audience_template = Path(f'templates/prompt_{audience}.md')
-            if audience_template.exists():
-                base_template = audience_template.read_text(encoding='utf-8')
-            else:
-                # Fallback to default
-                base_template = Path('templates/prompt.md').read_text(encoding='utf-8')
+            base_template = registry.prompt_template(audience)
+        base_template.check_prompt()
+        
+        # Serialization formats the template accepts; the cheapest is used per section
+        formats = allowed_formats(base_template.formats, self.config)
         
         # Prepare data for template
+        template_data = self._template_fields(version, audience, previous_releases, custom_sections, formats)
+        
+        # Everything except commits and issues is fixed overhead
+        budget = self._data_budget(base_template, template_data, model)
+        
+        if themes:
+            # Each theme repeats a heading (and a tabular header) in both sections
+            budget -= sum(
+                2 * count_tokens(theme_heading(t, t.label, len(t.commits), len(t.issues))) for t in themes
+            ) + 2 * len(themes) * format_overhead('tsv', ['subject', 'type', 'author', 'count'])
+            budget = max(budget, 0)
+        
+        commit_pack, issue_pack, chosen = self._pack_prompt_data(commits, issues, audience, budget, formats)
+        self.last_pack_report = {
+            'context_window': context_window(model or self.llm_config.get('model', 'gpt-4'), self.config),
+            'reserved_output': self.llm_config.get('max_tokens', DEFAULT_OUTPUT_TOKENS),
+            'budget': budget,
+            'commits': commit_pack.report(describe_commit),
+            'issues': issue_pack.report(describe_issue),
+            'formats': chosen
+        }
+        template_data['commits'] = self._format_commits_for_prompt(
+            commit_pack.included, audience, chosen['commits']['format'], themes)
+        template_data['issues'] = self._format_issues_for_prompt(
+            issue_pack.included, audience, chosen['issues']['format'], themes)
+        return self._render_parts(base_template, template_data)
+    
+    def _render_parts(self, compiled, template_data: Dict[str, str]) -> PromptParts:
+        """Render a template split into its stable prefix and variable suffix."""
+        prefix, suffix = compiled.split()
+        return PromptParts(prefix.render(**template_data), suffix.render(**template_data))
+    
+    def _template_fields(
+        self,
+        version: str,
+        audience: str,
+        previous_releases: Optional[List[Dict]],
+        custom_sections: Optional[List[str]],
+        formats: List[str]
+    ) -> Dict[str, str]:
+        """Template values shared by every prompt; commits and issues start empty."""
         template_data = {
             'version': version,
             'date': str(datetime.now().date()),
-            'commits': self._format_commits_for_prompt(commits, audience),
-            'issues': self._format_issues_for_prompt(issues, audience),
-            'previous_releases': self._format_previous_releases(previous_releases) if previous_releases else 'None',
+            'commits': '',
+            'issues': '',
+            'previous_releases': (
+                self._format_previous_releases(previous_releases, formats) if previous_releases else 'None'
+            ),
             'audience': audience,
             'custom_sections': ', '.join(custom_sections) if custom_sections else ''
         }
         
         # Add audience-specific instructions
-        audience_instructions = self._get_audience_instructions(audience)
-        if audience_instructions:
-            template_data['audience_instructions'] = audience_instructions
+        template_data['audience_instructions'] = self._get_audience_instructions(audience)
         
         # Add section customization
         if custom_sections:
             template_data['sections_instruction'] = f"Include these specific sections: {', '.join(custom_sections)}"
         else:
             template_data['sections_instruction'] = self._get_default_sections(audience)
+        return template_data
+    
+    def _data_budget(self, compiled, template_data: Dict[str, str], model: Optional[str]) -> int:
+        """Tokens left for data once the rendered template and reserved output are accounted for."""
+        overhead = count_tokens(compiled.render(**template_data))
+        window = context_window(model or self.llm_config.get('model', 'gpt-4'), self.config)
+        reserved = self.llm_config.get('max_tokens', DEFAULT_OUTPUT_TOKENS)
+        return max(int((window - reserved - overhead) * (1 - PACKING_MARGIN)), 0)
+    
+    def _pack_prompt_data(
+        self,
+        commits: List[Dict],
+        issues: List[Dict],
+        audience: str,
+        budget: int,
+        formats: List[str]
+    ):
+        """Split ``budget`` tokens between commits and issues, highest value first.
         
-        # Format template
-        try:
-            return base_template.format(**template_data)
-        except KeyError as e:
-            # Handle missing template variables gracefully
-            print(f"Warning: Template variable {e} not found, using fallback")
-            return self._build_fallback_prompt(version, commits, issues, audience, previous_releases)
-    
-    def _format_commits_for_prompt(self, commits: List[Dict], audience: str) -> str:
-        """Format commits for inclusion in prompt based on audience."""
-        if not commits:
-            return "No commits provided"
+        Each section is serialized in the cheapest of ``formats`` (judged on
+        a sample of its records); the choice and per-format token counts are
+        returned alongside the packs.
+        """
+        # Bodies are only rendered for developers, and only loaded for candidates
+        prepare = partial(load_commit_bodies, path=self.repo_path) if audience == 'developers' else None
+        if prepare and commits:
+            prepare(commits[:50])
+        
+        commit_fmt, commit_fields, commit_report = self._choose_format(
+            [self._commit_record(c, audience) for c in self._commit_sample(commits)], formats)
+        issue_fmt, issue_fields, issue_report = self._choose_format(
+            [self._issue_record(i, audience) for i in issues[:50]], formats)
+        
+        def render_commit(commit):
+            return render_record(self._commit_record(commit, audience), commit_fmt, commit_fields)
         
+        def render_issue(issue):
+            return render_record(self._issue_record(issue, audience), issue_fmt, issue_fields)
+        
+        budget -= format_overhead(commit_fmt, commit_fields) + format_overhead(issue_fmt, issue_fields)
+        budget = max(budget, 0)
+        commit_pack = pack(commits, int(budget * COMMIT_BUDGET_SHARE), render_commit, score_commit, prepare)
+        issue_pack = pack(issues, budget - commit_pack.tokens, render_issue, score_issue)
+        if commit_pack.dropped and issue_pack.tokens < budget - commit_pack.budget:
+            # Issues left part of their share unused; give it back to commits
+            commit_pack = pack(commits, budget - issue_pack.tokens, render_commit, score_commit, prepare)
+        
+        chosen = {
+            'commits': {'format': commit_fmt, 'sample_tokens': commit_report},
+            'issues': {'format': issue_fmt, 'sample_tokens': issue_report}
+        }
+        return commit_pack, issue_pack, chosen
+    
+    def _commit_sample(self, commits: List[Dict], size: int = 50) -> List[Dict]:
+        """Leading commits, plus a collapsed one if needed so tabular headers include ``count``."""
+        sample = commits[:size]
+        if not any(c.get('count', 1) > 1 for c in sample):
+            sample = sample + [c for c in commits[size:] if c.get('count', 1) > 1][:1]
+        return sample
+    
+    def _choose_format(self, sample: List[Dict], formats: List[str]):
+        """Cheapest format for a sample of records, with its columns and token report."""
+        fmt, report = cheapest_format(sample, formats)
+        return fmt, columns(sample), report
+    
+    def _commit_record(self, commit: Dict, audience: str) -> Dict:
+        """Prompt representation of one commit for the given audience."""
         if audience == 'developers':
             # Include more technical details
-            formatted = []
-            for commit in commits[:50]:  # Limit for prompt size
-                formatted.append({
-                    'hash': commit.get('hash', ''),
-                    'author': commit.get('author', ''),
-                    'subject': commit.get('subject', ''),
-                    'body': commit.get('body', '')[:200],  # Truncate body
-                    'type': commit.get('type', 'other'),
-                    'url': commit.get('url', '')
-                })
+            record = {
+                'hash': commit.get('hash', ''),
+                'author': commit.get('author', ''),
+                'subject': commit.get('subject', ''),
+                'body': (commit.get('body') or '')[:200],  # Truncate body
+                'type': commit.get('type', 'other'),
+                'url': commit.get('url', '')
+            }
         else:
             # Simplified for users/managers
-            formatted = []
-            for commit in commits[:30]:
-                formatted.append({
-                    'subject': commit.get('subject', ''),
-                    'type': commit.get('type', 'other'),
-                    'author': commit.get('author', '')
-                })
-        
-        return json.dumps(formatted, indent=2)
-    
-    def _format_issues_for_prompt(self, issues: List[Dict], audience: str) -> str:
-        """Format issues for inclusion in prompt based on audience."""
+            record = {
+                'subject': commit.get('subject', ''),
+                'type': commit.get('type', 'other'),
+                'author': commit.get('author', '')
+            }
+        if commit.get('count', 1) > 1:
+            # Representative of a collapsed group of near-duplicate commits
+            record['count'] = commit['count']
+        return record
+    
+    def _issue_record(self, issue: Dict, audience: str) -> Dict:
+        """Prompt representation of one issue for the given audience."""
+        item = {
+            'title': issue.get('title', ''),
+            'number': issue.get('number', ''),
+            'labels': label_names(issue),
+            'state': issue.get('state', '')
+        }
+        
+        if audience == 'developers':
+            item['body'] = (issue.get('body') or '')[:300]  # Truncate
+            item['url'] = issue.get('url', '')
+        
+        return item
+    
+    def _format_commits_for_prompt(
+        self, commits: List[Dict], audience: str, fmt: str = 'json-pretty', themes=None
+    ) -> str:
+        """Format already-packed commits for inclusion in prompt based on audience."""
+        if not commits:
+            return "No commits provided"
+        if themes:
+            return self._format_by_theme(commits, lambda c: self._commit_record(c, audience), fmt, themes, True)
+        
+        return serialize([self._commit_record(commit, audience) for commit in commits], fmt)
+    
+    def _format_issues_for_prompt(
+        self, issues: List[Dict], audience: str, fmt: str = 'json-pretty', themes=None
+    ) -> str:
+        """Format already-packed issues for inclusion in prompt based on audience."""
         if not issues:
             return "No issues provided"
+        if themes:
+            return self._format_by_theme(issues, lambda i: self._issue_record(i, audience), fmt, themes, False)
         
-        formatted = []
-        for issue in issues[:30]:  # Limit for prompt size
-            item = {
-                'title': issue.get('title', ''),
-                'number': issue.get('number', ''),
-                'labels': issue.get('labels', []),
-                'state': issue.get('state', '')
-            }
-            
-            if audience == 'developers':
-                item['body'] = issue.get('body', '')[:300]  # Truncate
-                item['url'] = issue.get('url', '')
-            
-            formatted.append(item)
+        return serialize([self._issue_record(issue, audience) for issue in issues], fmt)
+    
+    def _format_by_theme(self, items: List[Dict], record, fmt: str, themes, commits: bool) -> str:
+        """Serialize ``items`` as one block per theme, largest themes first."""
+        labels = theme_lookup(themes)
+        by_label = {theme.label: theme for theme in themes}
+        groups: Dict[str, List[Dict]] = {theme.label: [] for theme in themes}
+        for item in items:
+            groups.setdefault(labels.get(id(item), 'other'), []).append(item)
         
-        return json.dumps(formatted, indent=2)
+        blocks = []
+        for label, members in groups.items():
+            if members:
+                heading = theme_heading(
+                    by_label.get(label), label, len(members) if commits else 0, 0 if commits else len(members)
+                )
+                blocks.append(heading + '\n' + serialize([record(item) for item in members], fmt))
+        return '\n\n' + '\n\n'.join(blocks)
     
-    def _format_previous_releases(self, releases: List[Dict]) -> str:
+    def _cluster_themes(self, commits: List[Dict], issues: List[Dict]):
+        """Theme clusters for the prompt, or None when numpy/scipy are unavailable."""
+        load_commit_paths(commits, self.repo_path)
+        try:
+            return cluster_themes(commits, issues, self.llm_config.get('max_themes', DEFAULT_MAX_THEMES))
+        except ValueError as e:
+            print(f"Warning: theme clustering skipped: {e}")
+            return None
+    
+    def _format_previous_releases(self, releases: List[Dict], formats: Optional[List[str]] = None) -> str:
         """Format previous releases for context."""
         if not releases:
             return "None"
@@ -204,10 +896,11 @@ class LLMService:
             formatted.append({
                 'version': release.get('version', ''),
                 'name': release.get('name', ''),
-                'summary': release.get('body', '')[:500]  # First 500 chars
+                'summary': (release.get('body') or '')[:RELEASE_CONTEXT_CHARS]
             })
         
-        return json.dumps(formatted, indent=2)
+        fmt, _ = cheapest_format(formatted, formats or ['json-pretty'])
+        return serialize(formatted, fmt)
     
     def _get_audience_instructions(self, audience: str) -> str:
         """Get audience-specific instructions."""
@@ -236,133 +929,608 @@ Emphasize outcomes and benefits rather than technical implementation.
         else:  # users
             return "Use sections: Highlights, New Features, Improvements, Bug Fixes, Known Issues"
     
-    def _build_fallback_prompt(
-        self,
-        version: str,
-        commits: List[Dict],
-        issues: List[Dict],
-        audience: str,
-        previous_releases: Optional[List[Dict]]
-    ) -> str:
-        """Build a simple fallback prompt if template formatting fails."""
-        from datetime import datetime
+    async def call_llm(self, prompt: Union[str, PromptParts], model: str, temperature: float = 0.0) -> str:
+        """Call the appropriate LLM provider."""
+        return (await self.complete(prompt, model, temperature)).text
+    
+    async def complete(self, prompt: Union[str, PromptParts], model: str, temperature: float = 0.0) -> LLMResponse:
+        """Call the provider for ``model`` and return its text with token usage.
         
-        return f"""You are an assistant that writes professional release notes.
-
-Version: {version}
-Date: {datetime.now().date()}
-Audience: {audience}
-
-Commits:
-{json.dumps(commits[:20], indent=2)}
-
-Issues:
-{json.dumps(issues[:20], indent=2)}
-
-Previous Releases:
-{json.dumps(previous_releases[:3] if previous_releases else [], indent=2)}
-
-Generate professional release notes in markdown format with appropriate sections.
-"""
+        A plain string is sent as the variable part with no cacheable prefix.
+        The usage of every call is also appended to the running generation's
+        usage log, if any. Identical deterministic requests are answered from
+        the response cache (see ``_response_cache``) unless the generation's
+        cache mode is ``bypass``; ``refresh`` calls the provider and
+        overwrites the stored response. A response cut off by its completion
+        limit is completed by ``_continue``.
+        """
+        provider, parts = self._resolve(prompt, model)
+        cache, key, entry = self._cached_response(provider, model, temperature, parts)
+        if entry is not None:
+            response = LLMResponse(entry['text'], entry.get('finish_reason'))
+        else:
+            async for response in self._guarded(
+                provider, model, parts, lambda: self._once(self.providers[provider], parts, model, temperature)
+            ):
+                pass
+            async for _ in self._continue(provider, model, temperature, parts, response):
+                pass
+        self._record(provider, model, cache, key, entry, response)
+        return response
     
-    async def call_llm(self, prompt: str, model: str, temperature: float = 0.0) -> str:
-        """Call the appropriate LLM provider."""
+    async def stream_llm(
+        self, prompt: Union[str, PromptParts], model: str, temperature: float = 0.0
+    ) -> AsyncIterator[str]:
+        """Yield the completion for ``prompt`` piece by piece as the provider produces it.
+        
+        Shares the response cache and usage log with ``complete``: a cached
+        response, like the output of a provider without streaming support,
+        arrives as a single piece.
+        """
+        provider, parts = self._resolve(prompt, model)
+        cache, key, entry = self._cached_response(provider, model, temperature, parts)
+        # Schema-constrained answers are only used whole, so they are not streamed
+        stream = self.stream_providers.get(provider) if _output_schema.get() is None else None
+        if entry is not None:
+            response = LLMResponse(entry['text'], entry.get('finish_reason'))
+            yield response.text
+        elif stream is None:
+            async for response in self._guarded(
+                provider, model, parts, lambda: self._once(self.providers[provider], parts, model, temperature)
+            ):
+                yield response.text
+        else:
+            response = LLMResponse('')
+            pieces = []
+            async for piece in self._guarded(
+                provider, model, parts, lambda: stream(parts, model, temperature, response), response
+            ):
+                pieces.append(piece)
+                yield piece
+            response.text = ''.join(pieces)
+        if entry is None:
+            async for piece in self._continue(provider, model, temperature, parts, response, stream):
+                yield piece
+        self._record(provider, model, cache, key, entry, response)
+    
+    async def _once(self, call, *args) -> AsyncIterator[LLMResponse]:
+        yield await call(*args)
+    
+    async def _continue(
+        self, provider: str, model: str, temperature: float, parts: PromptParts, response: LLMResponse,
+        stream: Optional[Callable] = None
+    ) -> AsyncIterator[str]:
+        """Pieces of follow-up requests while ``response`` was cut off by its completion limit.
+        
+        Each request resends the prompt with the answer so far (see
+        ``PromptParts.partial``) and gets a limit sized for the longer input,
+        so its text appends to the cut-off answer. ``response`` gets the
+        joined text, the last finish reason and the summed usage. Gives up
+        after ``llm.max_continuations`` requests, or once the context window
+        has less than ``MIN_CONTINUATION_TOKENS`` left for the rest.
+        """
+        limit = self.llm_config.get('max_continuations', MAX_CONTINUATIONS)
+        for n in range(1, limit + 1):
+            if response.finish_reason not in TRUNCATED_REASONS or not response.text:
+                return
+            if provider == 'anthropic' and _output_schema.get() is not None:
+                # A cut-off tool call has no text to extend
+                print(f"Warning: {model} structured answer was cut off and cannot be continued")
+                return
+            follow = parts._replace(partial=response.text)
+            if self._max_tokens(model, follow) < MIN_CONTINUATION_TOKENS:
+                print(f"Warning: {model} response was cut off and the context window has no room to continue it")
+                return
+            print(f"Warning: {model} response was cut off at its completion limit; continuing ({n}/{limit})")
+            part = LLMResponse('')
+            if stream is None:
+                async for part in self._guarded(
+                    provider, model, follow, lambda: self._once(self.providers[provider], follow, model, temperature)
+                ):
+                    pass
+                if part.text:
+                    yield part.text
+            else:
+                pieces = []
+                async for piece in self._guarded(
+                    provider, model, follow, lambda: stream(follow, model, temperature, part), part
+                ):
+                    pieces.append(piece)
+                    yield piece
+                part.text = ''.join(pieces)
+            response.text += part.text or ''
+            response.finish_reason = part.finish_reason
+            response.usage = {k: response.usage.get(k, 0) + part.usage.get(k, 0)
+                              for k in {*response.usage, *part.usage}}
+            if not part.text:
+                break
+        if response.finish_reason in TRUNCATED_REASONS:
+            print(f"Warning: {model} response still cut off after {limit} continuations")
+    
+    async def _guarded(
+        self, provider: str, model: str, parts: PromptParts, open_stream: Callable[[], AsyncIterator],
+        response: Optional[LLMResponse] = None
+    ) -> AsyncIterator:
+        """Items of ``open_stream()`` through admission control and the provider's circuit breaker.
+        
+        Each attempt first waits for a slot from ``src.rate_limit``
+        (``llm.rate_limits``), reserving the estimated input tokens plus the
+        expected output (the completion limit, at most ``llm.max_tokens``);
+        the reservation is reconciled with the usage the provider reports,
+        taken from ``response`` or else from the last item. Retryable errors (429/5xx, connection errors) count against
+        the breaker and, when raised before the first item, are retried
+        after a jittered exponential backoff (``llm.resilience``:
+        ``retries``, ``backoff_base``, ``backoff_cap``). An open breaker
+        raises CircuitOpenError.
+        """
+        if provider == 'template':
+            async for item in open_stream():
+                yield item
+            return
+        settings = {**DEFAULT_SETTINGS, **(self.llm_config.get('resilience') or {})}
+        breaker = get_breaker(provider, settings)
+        admission = get_admission_controller(self.llm_config.get('rate_limits'))
+        input_tokens = count_tokens(parts.text) + count_tokens(parts.partial)
+        # Completion limits can be far above typical answers; usage reconciles the difference
+        expected_output = min(self._max_tokens(model, parts), self.llm_config.get('max_tokens', DEFAULT_OUTPUT_TOKENS))
+        delays = backoff_delays(settings['retries'], settings['backoff_base'], settings['backoff_cap'])
+        loop = asyncio.get_running_loop()
+        while True:
+            breaker.check()
+            try:
+                ticket = await admission.acquire(provider, model, input_tokens + expected_output, _flow.get())
+            except BaseException:
+                # Timed out or cancelled while queued: no call was made, so a half-open probe is freed
+                breaker.abandon()
+                raise
+            started, produced, item = loop.time(), False, None
+            try:
+                async for item in open_stream():
+                    produced = True
+                    yield item
+            except (asyncio.CancelledError, GeneratorExit):
+                # Cut-off streams count their input; unanswered calls give the reservation back
+                admission.release(ticket, input_tokens if produced else None)
+                breaker.abandon()
+                raise
+            except Exception as e:
+                admission.release(ticket, input_tokens if produced else None)
+                if not is_retryable(e):
+                    # Bad requests and missing keys say nothing about the provider's health
+                    breaker.abandon()
+                    raise
+                breaker.record_failure(loop.time() - started, e)
+                delay = next(delays, None) if not produced else None
+                if delay is None:
+                    raise
+                delay = max(delay, min(retry_after(e) or 0, settings['backoff_cap']))
+                print(f"Warning: {provider} call failed ({e}); retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                continue
+            usage = (response if response is not None else item).usage if produced else {}
+            admission.release(ticket, usage.get('input_tokens', input_tokens) + usage.get('output_tokens', 0))
+            breaker.record_success(loop.time() - started)
+            return
+    
+    def model_chain(self, model: str) -> List[str]:
+        """``model`` followed by the configured ``llm.fallback_models`` (e.g. ollama/..., template-basic)."""
+        chain = [model]
+        for fallback in self.llm_config.get('fallback_models') or []:
+            if fallback not in chain:
+                chain.append(fallback)
+        return chain
+    
+    async def hedged_stream(
+        self, prompt: Union[str, PromptParts], model: str, temperature: float = 0.0,
+        outcome: Optional[Dict[str, Any]] = None
+    ) -> AsyncIterator[str]:
+        """Stream ``prompt`` from the first model of ``model_chain`` to answer.
+        
+        If no running model has produced its first piece within
+        ``llm.hedge_after_seconds`` of the latest start, or all running
+        models failed, the next model of the chain is started alongside. The
+        first model to produce a piece wins; the others are cancelled. A
+        failure after the winner started streaming is raised. ``outcome``
+        receives the winning model, the models tried and their errors.
+        """
+        chain = self.model_chain(model)
+        hedge_after = self.llm_config.get('hedge_after_seconds', HEDGE_AFTER_SECONDS)
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        tasks: Dict[str, asyncio.Task] = {}
+        errors: List[str] = []
+        
+        async def attempt(candidate: str) -> None:
+            try:
+                async with contextlib.aclosing(self.stream_llm(prompt, candidate, temperature)) as stream:
+                    async for piece in stream:
+                        await queue.put((candidate, piece))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                await queue.put((candidate, e))
+                return
+            await queue.put((candidate, _DONE))
+        
+        def start_next() -> float:
+            candidate = chain[len(tasks)]
+            tasks[candidate] = asyncio.create_task(attempt(candidate))
+            return loop.time() + hedge_after
+        
+        winner = None
+        try:
+            hedge_at = start_next()
+            while winner is None:
+                if len(errors) == len(tasks):
+                    if len(tasks) == len(chain):
+                        raise ValueError(f"All models failed: {'; '.join(errors)}")
+                    hedge_at = start_next()
+                timeout = max(hedge_at - loop.time(), 0) if len(tasks) < len(chain) else None
+                try:
+                    candidate, item = await asyncio.wait_for(queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    print(f"Warning: no response from {', '.join(tasks)} after {hedge_after}s; "
+                          f"also trying {chain[len(tasks)]}")
+                    hedge_at = start_next()
+                    continue
+                if item is _DONE:
+                    item = ValueError('empty response')
+                if isinstance(item, Exception):
+                    errors.append(f'{candidate}: {item}')
+                    print(f"Warning: {candidate} failed: {item}")
+                    continue
+                winner = candidate
+                for other, task in tasks.items():
+                    if other != winner:
+                        task.cancel()
+                yield item
+            while True:
+                candidate, item = await queue.get()
+                if candidate != winner:
+                    continue
+                if item is _DONE:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            for task in tasks.values():
+                task.cancel()
+            if outcome is not None:
+                outcome.update({'model': winner, 'tried': list(tasks), 'errors': errors})
+    
+    def _resolve(self, prompt: Union[str, PromptParts], model: str):
         provider = self.detect_provider(model)
         
         if provider not in self.providers:
             raise ValueError(f"Unsupported provider: {provider}")
         
-        return await self.providers[provider](prompt, model, temperature)
+        return provider, prompt if isinstance(prompt, PromptParts) else PromptParts('', prompt)
     
-    async def _call_openai(self, prompt: str, model: str, temperature: float) -> str:
-        """Call OpenAI API."""
-        api_key = env('OPENAI_API_KEY')
-        if not api_key:
-            raise ValueError("OPENAI_API_KEY not configured")
+    def _cached_response(self, provider: str, model: str, temperature: float, parts: PromptParts):
+        """(cache, key, stored entry) for this request; key is None when it must not be cached."""
+        cache, mode, key = self._response_cache(provider, temperature), _cache_mode.get(), None
+        if cache is not None and mode != 'bypass':
+            key = cache_key(provider, model, temperature, self._max_tokens(model, parts), parts.prefix, parts.suffix,
+                            SCHEMA_NAME if _output_schema.get() else '')
+        return cache, key, cache.get(key) if key and mode != 'refresh' else None
+    
+    def _record(self, provider: str, model: str, cache, key: Optional[str], entry, response: LLMResponse) -> None:
+        """Store a fresh response in the cache and log its usage for the running generation."""
+        if entry is None and key and response.text:
+            cache.put(key, {'text': response.text, 'finish_reason': response.finish_reason,
+                            'usage': response.usage})
+        calls = _usage_log.get()
+        if calls is not None:
+            calls.append({'provider': provider, 'model': model, 'cached_response': entry is not None,
+                          **response.usage})
+    
+    def _response_cache(self, provider: str, temperature: float):
+        """The response cache if ``llm.cache`` allows caching this call, else None.
         
-        client = openai.OpenAI(api_key=api_key)
+        ``llm.cache`` is ``false`` or a mapping with ``enabled``,
+        ``memory_entries``, ``max_mb`` and ``max_temperature`` (default 0.0:
+        only deterministic calls are cached). Template output is never cached.
+        """
+        settings = self.llm_config.get('cache', {})
+        if not isinstance(settings, dict):
+            settings = {'enabled': bool(settings)}
+        if (provider == 'template' or not settings.get('enabled', True)
+                or temperature > settings.get('max_temperature', 0.0)):
+            return None
+        return get_response_cache(settings)
+    
+    def _max_tokens(self, model: str, parts: PromptParts) -> int:
+        """Completion limit for ``parts``: the rest of the context window, up to the model's output limit."""
+        return output_limit(model, count_tokens(parts.text) + count_tokens(parts.partial), self.config)
+    
+    def _chat_messages(self, parts: PromptParts, cache_marker: bool = False) -> List[Dict]:
+        """Prefix as the system message, suffix as the user message.
         
-        response = client.chat.completions.create(
+        OpenAI caches long common prefixes automatically; ``cache_marker``
+        adds the explicit breakpoint that Anthropic models behind OpenRouter need.
+        A continuation adds the answer so far and asks for the rest.
+        """
+        messages = [{'role': 'user', 'content': parts.suffix}]
+        if parts.prefix:
+            system: Any = parts.prefix
+            if cache_marker:
+                system = [{'type': 'text', 'text': parts.prefix, 'cache_control': {'type': 'ephemeral'}}]
+            messages.insert(0, {'role': 'system', 'content': system})
+        if parts.partial:
+            messages += [{'role': 'assistant', 'content': parts.partial},
+                         {'role': 'user', 'content': CONTINUE_INSTRUCTION}]
+        return messages
+    
+    def _chat_format(self, parts: PromptParts) -> Dict[str, Any]:
+        """``response_format`` holding a structured-mode answer to the schema, if one is required."""
+        schema = _output_schema.get()
+        # The rest of a cut-off answer is not a document of its own
+        if schema is None or parts.partial:
+            return {}
+        return {'response_format': {'type': 'json_schema',
+                                    'json_schema': {'name': SCHEMA_NAME, 'strict': True, 'schema': schema}}}
+    
+    def _chat_usage(self, usage) -> Dict[str, int]:
+        details = getattr(usage, 'prompt_tokens_details', None)
+        return {
+            'input_tokens': getattr(usage, 'prompt_tokens', 0) or 0,
+            'cached_tokens': getattr(details, 'cached_tokens', 0) or 0,
+            'output_tokens': getattr(usage, 'completion_tokens', 0) or 0,
+        }
+    
+    def _chat_response(self, response) -> LLMResponse:
+        choice = response.choices[0]
+        return LLMResponse(
+            text=choice.message.content,
+            finish_reason=choice.finish_reason,
+            usage=self._chat_usage(getattr(response, 'usage', None))
+        )
+    
+    async def _stream_chat(self, client, messages: List[Dict], model: str, temperature: float, max_tokens: int,
+                           response: LLMResponse) -> AsyncIterator[str]:
+        """Streamed chat completion; the final chunk carries the usage."""
+        stream = await client.chat.completions.create(
             model=model,
-            messages=[{'role': 'user', 'content': prompt}],
+            messages=messages,
             temperature=temperature,
-            max_tokens=2000
+            max_tokens=max_tokens,
+            stream=True,
+            stream_options={'include_usage': True}
         )
-        
-        return response.choices[0].message.content
+        async for chunk in stream:
+            if getattr(chunk, 'usage', None):
+                response.usage = self._chat_usage(chunk.usage)
+            if not chunk.choices:
+                continue
+            choice = chunk.choices[0]
+            if choice.finish_reason:
+                response.finish_reason = choice.finish_reason
+            if choice.delta.content:
+                yield choice.delta.content
     
-    async def _call_openrouter(self, prompt: str, model: str, temperature: float) -> str:
-        """Call OpenRouter API."""
-        api_key = env('OPENROUTER_API_KEY')
+    def _api_key(self, name: str) -> str:
+        api_key = env(name)
         if not api_key:
-            raise ValueError("OPENROUTER_API_KEY not configured")
+            raise ValueError(f"{name} not configured")
+        return api_key
+    
+    async def _call_openai(self, parts: PromptParts, model: str, temperature: float) -> LLMResponse:
+        """Call OpenAI API."""
+        client = get_async_client('openai', self._api_key('OPENAI_API_KEY'))
         
-        client = openai.OpenAI(
-            api_key=api_key,
-            base_url="https://openrouter.ai/api/v1"
+        response = await client.chat.completions.create(
+            model=model,
+            messages=self._chat_messages(parts),
+            temperature=temperature,
+            max_tokens=self._max_tokens(model, parts),
+            **self._chat_format(parts)
         )
         
-        response = client.chat.completions.create(
+        return self._chat_response(response)
+    
+    async def _stream_openai(self, parts: PromptParts, model: str, temperature: float,
+                             response: LLMResponse) -> AsyncIterator[str]:
+        client = get_async_client('openai', self._api_key('OPENAI_API_KEY'))
+        async for piece in self._stream_chat(client, self._chat_messages(parts), model, temperature,
+                                             self._max_tokens(model, parts), response):
+            yield piece
+    
+    async def _call_openrouter(self, parts: PromptParts, model: str, temperature: float) -> LLMResponse:
+        """Call OpenRouter API."""
+        client = get_async_client('openrouter', self._api_key('OPENROUTER_API_KEY'))
+        
+        response = await client.chat.completions.create(
             model=model,
-            messages=[{'role': 'user', 'content': prompt}],
+            messages=self._chat_messages(parts, cache_marker=model.startswith('anthropic/')),
             temperature=temperature,
-            max_tokens=2000
+            max_tokens=self._max_tokens(model, parts),
+            **self._chat_format(parts)
         )
         
-        return response.choices[0].message.content
+        return self._chat_response(response)
     
-    async def _call_anthropic(self, prompt: str, model: str, temperature: float) -> str:
-        """Call Anthropic API."""
-        api_key = env('ANTHROPIC_API_KEY')
-        if not api_key:
-            raise ValueError("ANTHROPIC_API_KEY not configured")
-        
-        try:
-            import anthropic
-            client = anthropic.Anthropic(api_key=api_key)
-            
-            response = client.messages.create(
-                model=model,
-                max_tokens=2000,
-                temperature=temperature,
-                messages=[{"role": "user", "content": prompt}]
-            )
-            
-            return response.content[0].text
-            
-        except ImportError:
-            raise ValueError("anthropic package not installed. Run: pip install anthropic")
+    async def _stream_openrouter(self, parts: PromptParts, model: str, temperature: float,
+                                 response: LLMResponse) -> AsyncIterator[str]:
+        client = get_async_client('openrouter', self._api_key('OPENROUTER_API_KEY'))
+        messages = self._chat_messages(parts, cache_marker=model.startswith('anthropic/'))
+        async for piece in self._stream_chat(client, messages, model, temperature,
+                                             self._max_tokens(model, parts), response):
+            yield piece
     
-    async def _call_local_llm(self, prompt: str, model: str, temperature: float) -> str:
-        """Call local LLM (e.g., Ollama)."""
-        base_url = env('LOCAL_LLM_BASE_URL', 'http://localhost:11434')
+    def _anthropic_request(self, parts: PromptParts, model: str, temperature: float) -> Dict[str, Any]:
+        """Message request with the prefix as a cached system block.
         
-        payload = {
+        A continuation sends the answer so far as a trailing assistant
+        message, which the model extends.
+        """
+        request = {
             'model': model,
-            'prompt': prompt,
-            'stream': False,
-            'options': {
-                'temperature': temperature
-            }
+            'max_tokens': self._max_tokens(model, parts),
+            'temperature': temperature,
+            'messages': [{"role": "user", "content": parts.suffix}],
+        }
+        if parts.partial:
+            # Prefilled assistant content must not end in whitespace
+            request['messages'].append({'role': 'assistant', 'content': parts.partial.rstrip()})
+        if parts.prefix:
+            request['system'] = [
+                {'type': 'text', 'text': parts.prefix, 'cache_control': {'type': 'ephemeral'}}
+            ]
+        schema = _output_schema.get()
+        if schema is not None and not parts.partial:
+            # Anthropic has no JSON mode; a forced tool call returns input matching the schema
+            request['tools'] = [{'name': SCHEMA_NAME, 'description': 'Record the release notes',
+                                 'input_schema': schema}]
+            request['tool_choice'] = {'type': 'tool', 'name': SCHEMA_NAME}
+        return request
+    
+    def _anthropic_usage(self, usage) -> Dict[str, int]:
+        cached = getattr(usage, 'cache_read_input_tokens', 0) or 0
+        written = getattr(usage, 'cache_creation_input_tokens', 0) or 0
+        return {
+            'input_tokens': usage.input_tokens + cached + written,
+            'cached_tokens': cached,
+            'output_tokens': usage.output_tokens,
         }
+    
+    async def _call_anthropic(self, parts: PromptParts, model: str, temperature: float) -> LLMResponse:
+        """Call Anthropic API; the prefix is sent as a cached system block."""
+        client = get_async_client('anthropic', self._api_key('ANTHROPIC_API_KEY'))
+        response = await client.messages.create(**self._anthropic_request(parts, model, temperature))
+        tool_input = next((block.input for block in response.content if block.type == 'tool_use'), None)
+        return LLMResponse(
+            text=json.dumps(tool_input) if tool_input is not None else response.content[0].text,
+            finish_reason=response.stop_reason,
+            usage=self._anthropic_usage(response.usage)
+        )
+    
+    async def _stream_anthropic(self, parts: PromptParts, model: str, temperature: float,
+                                response: LLMResponse) -> AsyncIterator[str]:
+        client = get_async_client('anthropic', self._api_key('ANTHROPIC_API_KEY'))
+        async with client.messages.stream(**self._anthropic_request(parts, model, temperature)) as stream:
+            async for text in stream.text_stream:
+                yield text
+            message = await stream.get_final_message()
+        response.finish_reason = message.stop_reason
+        response.usage = self._anthropic_usage(message.usage)
+    
+    def _ollama_client(self):
+        """Pooled client for the local server (``LOCAL_LLM_BASE_URL``); ``llm.ollama.keep_alive`` sets residency."""
+        return get_ollama_client(keep_alive=(self.llm_config.get('ollama') or {}).get('keep_alive'))
+    
+    def _local_model_name(self, model: str) -> str:
+        return model[len('ollama/'):] if model.startswith('ollama/') else model
+    
+    def _local_prompt(self, parts: PromptParts) -> str:
+        if not parts.partial:
+            return parts.text
+        # /api/generate has no assistant turn to extend, so the answer so far is quoted
+        return f'{parts.text}\n\nYour answer so far:\n{parts.partial}\n\n{CONTINUE_INSTRUCTION}'
+    
+    def _generate_response(self, data: Dict) -> LLMResponse:
+        return LLMResponse(
+            text=data.get('response', ''),
+            finish_reason=data.get('done_reason'),
+            usage={
+                'input_tokens': data.get('prompt_eval_count', 0),
+                'cached_tokens': 0,
+                'output_tokens': data.get('eval_count', 0),
+            }
+        )
+    
+    async def _call_local_llm(self, parts: PromptParts, model: str, temperature: float) -> LLMResponse:
+        """Call a local Ollama-style server (``local`` and ``ollama/`` models).
+        
+        Read as a stream, so a cancelled call (e.g. a hedging loser) lets go
+        of its thread and connection straight away.
+        """
+        response = LLMResponse('')
+        response.text = ''.join([piece async for piece in self._stream_local_llm(parts, model, temperature, response)])
+        return response
+    
+    async def _stream_local_llm(self, parts: PromptParts, model: str, temperature: float,
+                                response: LLMResponse) -> AsyncIterator[str]:
+        """Stream a local ``/api/generate`` call (one JSON object per line).
+        
+        ``requests`` blocks, so the lines are read on a daemon thread and
+        handed to the loop; leaving early cancels the handle, which shuts
+        the connection down and ends the thread.
+        """
+        handle = StreamHandle()
+        lines = self._ollama_client().stream(
+            self._local_model_name(model), self._local_prompt(parts), temperature,
+            None if parts.partial else _output_schema.get(), self._max_tokens(model, parts), handle
+        )
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        
+        def read() -> None:
+            try:
+                for data in lines:
+                    loop.call_soon_threadsafe(queue.put_nowait, data)
+                item: Any = _DONE
+            except Exception as e:
+                item = e
+            with contextlib.suppress(RuntimeError):  # the loop may be gone after a cancellation
+                loop.call_soon_threadsafe(queue.put_nowait, item)
         
+        threading.Thread(target=read, name='ollama-stream', daemon=True).start()
+        finished = False
         try:
-            response = requests.post(f'{base_url}/api/generate', json=payload)
-            response.raise_for_status()
-            return response.json().get('response', '')
-            
-        except requests.RequestException as e:
-            raise ValueError(f"Error calling local LLM: {e}")
-    
-    async def _call_ollama(self, prompt: str, model: str, temperature: float) -> str:
-        """Call local Ollama model."""
-        return generate_with_ollama(model, prompt)
-    
-    async def _call_template(self, prompt: str, model: str, temperature: float) -> str:
+            while True:
+                data = await queue.get()
+                if data is _DONE:
+                    finished = True
+                    break
+                if isinstance(data, requests.RequestException):
+                    raise ValueError(f"Error calling local LLM: {data}") from data
+                if isinstance(data, Exception):
+                    raise data
+                if data.get('response'):
+                    yield data['response']
+                if data.get('done'):
+                    final = self._generate_response(data)
+                    response.finish_reason, response.usage = final.finish_reason, final.usage
+        finally:
+            if not finished:
+                handle.cancel()
+    
+    def warm_up_local_models(self) -> List[str]:
+        """Load the local models of the configured model chain in the background; returns their names.
+        
+        Disabled with ``llm.ollama.warm_up: false``.
+        """
+        if not (self.llm_config.get('ollama') or {}).get('warm_up', True):
+            return []
+        models = [
+            self._local_model_name(m) for m in self.model_chain(self.llm_config.get('model', 'gpt-4'))
+            if self.detect_provider(m) in ('local', 'ollama')
+        ]
+        if models:
+            self._ollama_client().warm_in_background(models)
+        return models
+    
+    async def _call_template(self, parts: PromptParts, model: str, temperature: float) -> LLMResponse:
         """Generate using template-based method."""
         # Extract data from prompt for template generation
         # This is a simplified approach - in practice, you'd parse the prompt better
-        return "# Release Notes\n\nGenerated using template-based approach.\n\nPlease configure an AI model for better results."
+        return LLMResponse(
+            "# Release Notes\n\nGenerated using template-based approach.\n\n"
+            "Please configure an AI model for better results."
+        )
+    
+    def parse_notes(self, output: str) -> Dict[str, Any]:
+        """Schema-checked notes from a structured-mode answer.
+        
+        Models without a JSON mode (e.g. the template provider) may still
+        answer in markdown; that is read as well as it can be, with a warning.
+        """
+        try:
+            return parse_notes(output)
+        except ValueError as e:
+            print(f"Warning: structured output was not valid ({e}); reading it as markdown")
+            return notes_from_markdown(output)
     
     def parse_llm_output(self, output: str) -> Dict[str, Any]:
         """Parse LLM output into structured sections."""
@@ -403,6 +1571,7 @@ def create_audience_template(audience: str, content: str) -> bool:
         template_path = Path(f'templates/prompt_{audience}.md')
         template_path.parent.mkdir(exist_ok=True)
         template_path.write_text(content, encoding='utf-8')
+        get_template_registry().reload()
         return True
     except Exception as e:
         print(f"Error creating template: {e}")
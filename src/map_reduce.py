@@ -0,0 +1,98 @@
+"""Partitioning of large change sets for map-reduce release note generation.
+
+Commits are grouped by component (conventional-commit scope, else change
+type) and issues by their first label. Each group is split into chunks that
+fit a token budget, and small chunks are then packed together (first-fit
+decreasing) so the number of map calls stays low.
+"""
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence
+
+from src.prompt_packer import label_names
+
+
+class Chunk(NamedTuple):
+    components: List[str]
+    commits: List[Dict]
+    issues: List[Dict]
+    tokens: int
+
+    @property
+    def label(self) -> str:
+        return ', '.join(self.components)
+
+
+def commit_component(commit: Dict) -> str:
+    """Component a commit belongs to: its scope, else its change type."""
+    scope = (commit.get('scope') or '').strip().lower()
+    return scope or commit.get('type') or 'other'
+
+
+def issue_component(issue: Dict) -> str:
+    """Component an issue belongs to: its first label, else ``issues``."""
+    labels = label_names(issue)
+    return labels[0].lower() if labels else 'issues'
+
+
+def _merge(a: Chunk, b: Chunk) -> Chunk:
+    return Chunk(a.components + b.components, a.commits + b.commits, a.issues + b.issues, a.tokens + b.tokens)
+
+
+def partition_changes(
+    commits: Sequence[Dict],
+    issues: Sequence[Dict],
+    budget: int,
+    commit_cost: Callable[[Dict], int],
+    issue_cost: Callable[[Dict], int],
+    component: Optional[Callable[[Dict], str]] = None,
+) -> List[Chunk]:
+    """Split commits and issues into chunks of at most ``budget`` tokens.
+
+    Every item lands in exactly one chunk; an item bigger than the budget
+    gets a chunk of its own. Items keep their input order within a chunk.
+    ``component`` overrides the grouping key for both commits and issues.
+    """
+    groups: Dict[str, List] = {}
+    for commit in commits:
+        key = component(commit) if component else commit_component(commit)
+        groups.setdefault(key, []).append((True, commit, commit_cost(commit)))
+    for issue in issues:
+        key = component(issue) if component else issue_component(issue)
+        groups.setdefault(key, []).append((False, issue, issue_cost(issue)))
+
+    pieces: List[Chunk] = []
+    for name, members in groups.items():
+        current = Chunk([name], [], [], 0)
+        for is_commit, item, cost in members:
+            if current.tokens and current.tokens + cost > budget:
+                pieces.append(current)
+                current = Chunk([name], [], [], 0)
+            target = current.commits if is_commit else current.issues
+            target.append(item)
+            current = current._replace(tokens=current.tokens + cost)
+        if current.tokens or current.commits or current.issues:
+            pieces.append(current)
+
+    chunks: List[Chunk] = []
+    for piece in sorted(pieces, key=lambda p: p.tokens, reverse=True):
+        for i, chunk in enumerate(chunks):
+            if chunk.tokens + piece.tokens <= budget:
+                chunks[i] = _merge(chunk, piece)
+                break
+        else:
+            chunks.append(piece)
+    return chunks
+
+
+def batch_texts(texts: Sequence[str], budget: int, cost: Callable[[str], int]) -> List[List[str]]:
+    """Consecutive groups of ``texts`` whose total cost stays within ``budget``."""
+    batches: List[List[str]] = []
+    used = 0
+    for text in texts:
+        size = cost(text)
+        if batches and used + size <= budget:
+            batches[-1].append(text)
+            used += size
+        else:
+            batches.append([text])
+            used = size
+    return batches
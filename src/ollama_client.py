@@ -0,0 +1,207 @@
+"""Pooled client for Ollama-style local model servers.
+
+One ``requests.Session`` per server keeps its connections alive across
+calls. Requests carry ``keep_alive`` so the model stays loaded between
+generations instead of being evicted after Ollama's five-minute default.
+Loading a model can take minutes, so calls to a model that is not known
+to be loaded get ``LOAD_TIMEOUT`` instead of ``REQUEST_TIMEOUT``, and
+``warm`` loads a model ahead of the first request (e.g. at server start).
+The load state of every model used through the client is kept for
+``status``. A stream read on another thread can be abandoned through a
+``StreamHandle``.
+"""
+import json
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from src.llm_clients import REQUEST_TIMEOUT
+from src.utils import env
+
+DEFAULT_BASE_URL = 'http://localhost:11434'
+KEEP_ALIVE = '30m'
+CONNECT_TIMEOUT = 5.0
+# Seconds to wait for a model that may still have to be loaded into memory
+LOAD_TIMEOUT = 600.0
+POOL_SIZE = 8
+COLD, LOADING, READY, FAILED = 'cold', 'loading', 'ready', 'failed'
+
+
+def local_base_url() -> str:
+    return env('LOCAL_LLM_BASE_URL', DEFAULT_BASE_URL).rstrip('/')
+
+
+class StreamHandle:
+    """Lets another thread abandon a ``stream`` that may be blocked reading."""
+
+    def __init__(self):
+        self.cancelled = threading.Event()
+        self.response: Optional[requests.Response] = None
+
+    def cancel(self) -> None:
+        self.cancelled.set()
+        response = self.response
+        if response is not None:
+            # Shutting the socket down wakes a blocked read at once (urllib3 >= 2.3)
+            response.raw.shutdown()
+
+
+class OllamaClient:
+    """``/api/generate`` calls over one pooled session, with model load tracking."""
+
+    def __init__(self, base_url: Optional[str] = None, keep_alive: Any = KEEP_ALIVE):
+        self.base_url = (base_url or local_base_url()).rstrip('/')
+        self.keep_alive = keep_alive
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._models: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def _timeout(self, model: str):
+        ready = self._models.get(model, {}).get('state') == READY
+        return (CONNECT_TIMEOUT, REQUEST_TIMEOUT if ready else LOAD_TIMEOUT)
+
+    def _mark(self, model: str, state: str, **fields: Any) -> None:
+        with self._lock:
+            entry = self._models.setdefault(model, {'state': COLD})
+            entry.update(state=state, updated=time.time(), **fields)
+
+    def _done(self, model: str, data: Dict[str, Any]) -> None:
+        # load_duration (ns) is what this request spent loading the model
+        self._mark(model, READY, error=None, load_seconds=round(data.get('load_duration', 0) / 1e9, 2))
+
+    def payload(self, model: str, prompt: str, temperature: float, stream: bool,
+                output_format: Optional[Dict] = None, num_predict: Optional[int] = None) -> Dict[str, Any]:
+        # Ollama reuses the KV cache of the previous request when the prompt starts the same
+        payload = {
+            'model': model,
+            'prompt': prompt,
+            'stream': stream,
+            'keep_alive': self.keep_alive,
+            'options': {
+                'temperature': temperature
+            }
+        }
+        if num_predict is not None:
+            # Completion limit; a cut-off response ends with done_reason 'length'
+            payload['options']['num_predict'] = num_predict
+        if output_format is not None:
+            # A JSON schema here constrains decoding to matching output
+            payload['format'] = output_format
+        return payload
+
+    def generate(self, model: str, prompt: str, temperature: float = 0.0,
+                 output_format: Optional[Dict] = None, num_predict: Optional[int] = None) -> Dict[str, Any]:
+        """Final ``/api/generate`` object of a non-streamed call."""
+        try:
+            response = self.session.post(f'{self.base_url}/api/generate',
+                                         json=self.payload(model, prompt, temperature, False, output_format,
+                                                           num_predict),
+                                         timeout=self._timeout(model))
+            response.raise_for_status()
+        except requests.RequestException as e:
+            self._mark(model, FAILED, error=str(e)[:200])
+            raise
+        data = response.json()
+        self._done(model, data)
+        return data
+
+    def stream(self, model: str, prompt: str, temperature: float = 0.0, output_format: Optional[Dict] = None,
+               num_predict: Optional[int] = None,
+               handle: Optional[StreamHandle] = None) -> Iterator[Dict[str, Any]]:
+        """``/api/generate`` objects as the server streams them, one per line.
+
+        Ends quietly once ``handle`` is cancelled, closing the connection.
+        """
+        handle = handle or StreamHandle()
+        try:
+            with self.session.post(f'{self.base_url}/api/generate',
+                                   json=self.payload(model, prompt, temperature, True, output_format, num_predict),
+                                   stream=True, timeout=self._timeout(model)) as r:
+                handle.response = r
+                if handle.cancelled.is_set():
+                    return
+                r.raise_for_status()
+                for line in r.iter_lines():
+                    if handle.cancelled.is_set():
+                        return
+                    if not line:
+                        continue
+                    data = json.loads(line)
+                    if data.get('done'):
+                        self._done(model, data)
+                    yield data
+        except requests.RequestException as e:
+            if handle.cancelled.is_set():
+                return
+            self._mark(model, FAILED, error=str(e)[:200])
+            raise
+
+    def warm(self, model: str) -> Dict[str, Any]:
+        """Load ``model`` without generating (a prompt-less request) and keep it resident."""
+        self._mark(model, LOADING)
+        started = time.monotonic()
+        try:
+            response = self.session.post(f'{self.base_url}/api/generate',
+                                         json={'model': model, 'keep_alive': self.keep_alive},
+                                         timeout=(CONNECT_TIMEOUT, LOAD_TIMEOUT))
+            response.raise_for_status()
+        except requests.RequestException as e:
+            self._mark(model, FAILED, error=str(e)[:200])
+            return self._models[model]
+        self._mark(model, READY, error=None, load_seconds=round(time.monotonic() - started, 2))
+        return self._models[model]
+
+    def warm_in_background(self, models: List[str]) -> threading.Thread:
+        def run():
+            for model in models:
+                state = self.warm(model)
+                if state['state'] == FAILED:
+                    print(f"Warning: could not load local model {model}: {state['error']}")
+
+        thread = threading.Thread(target=run, name='ollama-warm-up', daemon=True)
+        thread.start()
+        return thread
+
+    def loaded_models(self) -> List[Dict[str, Any]]:
+        """Models the server has in memory (``/api/ps``)."""
+        response = self.session.get(f'{self.base_url}/api/ps', timeout=(CONNECT_TIMEOUT, 10))
+        response.raise_for_status()
+        return [
+            {'name': m.get('name'), 'size_vram': m.get('size_vram'), 'expires_at': m.get('expires_at')}
+            for m in response.json().get('models', [])
+        ]
+
+    def status(self) -> Dict[str, Any]:
+        try:
+            loaded, reachable, error = self.loaded_models(), True, None
+        except (requests.RequestException, ValueError) as e:
+            loaded, reachable, error = [], False, str(e)[:200]
+        with self._lock:
+            models = {name: dict(entry) for name, entry in self._models.items()}
+        return {
+            'base_url': self.base_url,
+            'reachable': reachable,
+            'error': error,
+            'keep_alive': self.keep_alive,
+            'models': models,
+            'loaded': loaded,
+        }
+
+
+_clients: Dict[str, OllamaClient] = {}
+_clients_lock = threading.Lock()
+
+
+def get_ollama_client(base_url: Optional[str] = None, keep_alive: Any = None) -> OllamaClient:
+    """Process-wide client for ``base_url`` (default ``LOCAL_LLM_BASE_URL``), created on first use."""
+    base_url = (base_url or local_base_url()).rstrip('/')
+    with _clients_lock:
+        if base_url not in _clients:
+            _clients[base_url] = OllamaClient(base_url, keep_alive if keep_alive is not None else KEEP_ALIVE)
+        return _clients[base_url]
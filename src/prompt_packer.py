@@ -0,0 +1,248 @@
+"""Token-budget-aware packing of commits and issues into a prompt."""
+import json
+import math
+import re
+import textwrap
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence
+
+
+# Context windows by model prefix; the longest matching prefix wins.
+# ``llm.context_window`` in config.yaml overrides these.
+MODEL_CONTEXT_WINDOWS = {
+    'gpt-4o': 128000,
+    'gpt-4-turbo': 128000,
+    'gpt-4.1': 1000000,
+    'gpt-4': 8192,
+    'gpt-3.5-turbo': 16385,
+    'gpt-5': 400000,
+    'o1-': 128000,
+    'claude-': 200000,
+    'anthropic/': 200000,
+    'openai/gpt-4o': 128000,
+    'google/gemini': 1000000,
+    'meta-llama/llama-3': 8192,
+    'mistralai/mixtral': 32768,
+    'minimax/': 200000,
+    'ollama/': 8192,
+}
+DEFAULT_CONTEXT_WINDOW = 8192
+DEFAULT_OUTPUT_TOKENS = 2000
+# Most tokens a model will generate in one response, by model prefix.
+# ``llm.max_output_tokens`` in config.yaml overrides these.
+MODEL_OUTPUT_LIMITS = {
+    'gpt-4o': 16384,
+    'gpt-4-turbo': 4096,
+    'gpt-4.1': 32768,
+    'gpt-4': 8192,
+    'gpt-3.5-turbo': 4096,
+    'gpt-5': 128000,
+    'o1-': 32768,
+    'claude-': 8192,
+    'anthropic/': 8192,
+    'openai/gpt-4o': 16384,
+    'google/gemini': 8192,
+    'minimax/': 8192,
+    'ollama/': 4096,
+}
+DEFAULT_OUTPUT_LIMIT = 4096
+# Headroom on the input count for tokenizers other than cl100k and chat formatting; the
+# packer leaves the same 5% of the data budget free, so packed prompts keep their reserved output
+OUTPUT_SIZING_MARGIN = 0.05
+
+TYPE_WEIGHTS = {
+    'feature': 5.0,
+    'bug': 4.0,
+    'refactor': 2.0,
+    'docs': 1.0,
+    'unknown': 1.0,
+    'other': 1.0,
+    'chore': 0.5,
+}
+LABEL_WEIGHTS = {
+    'breaking': 5.0,
+    'security': 5.0,
+    'feature': 3.0,
+    'enhancement': 3.0,
+    'bug': 3.0,
+    'regression': 3.0,
+    'performance': 2.0,
+    'documentation': 0.5,
+    'duplicate': -3.0,
+    'wontfix': -3.0,
+    'invalid': -3.0,
+}
+ISSUE_REF_RE = re.compile(r'(?:^|[\s(])#(\d+)\b')
+CACHEABLE_TEXT_CHARS = 4096
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    try:
+        import tiktoken
+        return tiktoken.get_encoding('cl100k_base')
+    except Exception:
+        return None
+
+
+def _count(text: str) -> int:
+    encoding = _encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return math.ceil(len(text) / 4)
+
+
+_count_cached = lru_cache(maxsize=65536)(_count)
+
+
+def count_tokens(text: str) -> int:
+    """Token count using tiktoken when installed, else a ~4 chars/token estimate.
+
+    Counts for item-sized strings are memoised; whole prompts are not kept alive.
+    """
+    if not text:
+        return 0
+    if len(text) > CACHEABLE_TEXT_CHARS:
+        return _count(text)
+    return _count_cached(text)
+
+
+def context_window(model: str, config: Optional[Dict] = None) -> int:
+    """Context window for ``model``; ``llm.context_window`` in config wins."""
+    configured = (config or {}).get('llm', {}).get('context_window')
+    if configured:
+        return int(configured)
+    matches = [prefix for prefix in MODEL_CONTEXT_WINDOWS if model.startswith(prefix)]
+    if not matches:
+        return DEFAULT_CONTEXT_WINDOW
+    return MODEL_CONTEXT_WINDOWS[max(matches, key=len)]
+
+
+def output_limit(model: str, input_tokens: int, config: Optional[Dict] = None) -> int:
+    """Completion limit for a prompt of ``input_tokens``: what is left of the
+    context window, capped by the model's output limit (``llm.max_output_tokens``
+    wins). 0 when the prompt leaves no room at all.
+    """
+    llm = (config or {}).get('llm', {})
+    if llm.get('max_output_tokens'):
+        cap = int(llm['max_output_tokens'])
+    else:
+        matches = [prefix for prefix in MODEL_OUTPUT_LIMITS if model.startswith(prefix)]
+        cap = MODEL_OUTPUT_LIMITS[max(matches, key=len)] if matches else DEFAULT_OUTPUT_LIMIT
+    room = context_window(model, config) - math.ceil(input_tokens * (1 + OUTPUT_SIZING_MARGIN))
+    return max(min(cap, room), 0)
+
+
+def label_names(item: Dict) -> List[str]:
+    """Label names from GitHub label objects or plain strings."""
+    return [
+        label.get('name', '') if isinstance(label, dict) else str(label)
+        for label in item.get('labels') or []
+    ]
+
+
+def score_commit(commit: Dict) -> float:
+    """Value of a commit for the prompt: type, breaking flag, diffstat and linked issues."""
+    score = TYPE_WEIGHTS.get(commit.get('type', 'unknown'), 1.0)
+    if commit.get('breaking'):
+        score += 5.0
+    stats = commit.get('stats') or {}
+    changes = stats.get('total') or (stats.get('additions', 0) + stats.get('deletions', 0))
+    if changes:
+        score += math.log1p(changes) / 2
+    refs = ISSUE_REF_RE.findall(f"{commit.get('subject', '')} {commit.get('body') or ''}")
+    score += 1.5 * min(len(set(refs)), 3)
+    return score
+
+
+def score_issue(issue: Dict) -> float:
+    """Value of an issue for the prompt: labels, linked PR and discussion size."""
+    score = 2.0
+    for name in map(str.lower, label_names(issue)):
+        score += LABEL_WEIGHTS.get(name, 0.0)
+        if 'breaking' in name and name != 'breaking':
+            score += LABEL_WEIGHTS['breaking']
+    if issue.get('pull_request'):
+        score += 1.0
+    comments = issue.get('comments')
+    if isinstance(comments, int) and comments:
+        score += math.log1p(comments) / 2
+    return score
+
+
+class PackResult(NamedTuple):
+    included: List[Any]
+    dropped: List[Any]
+    tokens: int
+    budget: int
+
+    def report(self, describe: Callable[[Any], str] = str, limit: int = 20) -> Dict[str, Any]:
+        return {
+            'included': len(self.included),
+            'dropped': len(self.dropped),
+            'tokens': self.tokens,
+            'budget': self.budget,
+            'dropped_items': [describe(item) for item in self.dropped[:limit]],
+        }
+
+
+def pack(
+    items: Sequence[Any],
+    budget: int,
+    render: Callable[[Any], str],
+    score: Callable[[Any], float],
+    prepare: Optional[Callable[[List[Any]], Any]] = None,
+    batch_size: int = 64,
+) -> PackResult:
+    """Greedily fill ``budget`` tokens with the highest-scoring items.
+
+    Items that do not fit are skipped so smaller ones can still use the
+    remaining space. ``prepare`` is called on each batch of candidates right
+    before they are rendered (e.g. to load commit bodies only for items that
+    are actually considered), and the batch is then re-ranked, so what
+    ``prepare`` adds counts towards the order within that batch; it cannot
+    move an item ahead of an earlier batch. Included items keep their input
+    order.
+    """
+    scores = [score(item) for item in items]
+    ranked = sorted(range(len(items)), key=scores.__getitem__, reverse=True)
+    chosen = set()
+    used = 0
+    smallest = None
+    for start in range(0, len(ranked), batch_size):
+        # Stop once not even the cheapest item seen so far would fit
+        if used >= budget or (smallest is not None and budget - used < smallest):
+            break
+        batch = ranked[start:start + batch_size]
+        if prepare is not None:
+            prepare([items[i] for i in batch])
+            for i in batch:
+                scores[i] = score(items[i])
+            batch.sort(key=scores.__getitem__, reverse=True)
+        for i in batch:
+            cost = count_tokens(render(items[i]))
+            smallest = cost if smallest is None else min(smallest, cost)
+            if used + cost <= budget:
+                chosen.add(i)
+                used += cost
+    included = [item for i, item in enumerate(items) if i in chosen]
+    dropped = [items[i] for i in sorted(ranked, key=scores.__getitem__, reverse=True) if i not in chosen]
+    return PackResult(included, dropped, used, budget)
+
+
+def render_json(record: Dict) -> str:
+    """One record rendered exactly as it appears inside ``json.dumps(records, indent=2)``."""
+    return textwrap.indent(json.dumps(record, indent=2), '  ')
+
+
+def join_json(rendered: Sequence[str]) -> str:
+    """Join ``render_json`` outputs into the indented JSON list they came from."""
+    return '[\n' + ',\n'.join(rendered) + '\n]' if rendered else '[]'
+
+
+def describe_commit(commit: Dict) -> str:
+    return f"{commit.get('hash', '')[:7]} {commit.get('subject', '')}".strip()
+
+
+def describe_issue(issue: Dict) -> str:
+    return f"#{issue.get('number', '')} {issue.get('title', '')}".strip()
@@ -0,0 +1,141 @@
+"""Token-efficient serialization of prompt payloads (commits, issues, releases).
+
+Formats:
+  json-pretty  the original ``json.dumps(records, indent=2)``
+  json         compact JSON, no whitespace between tokens
+  tsv          one header line naming the columns, then one tab-separated row per record
+  tsv-legend   ``tsv`` with repeated authors replaced by short aliases and a legend line
+
+A template can restrict the formats it understands with a first line such as
+``<!-- formats: json, tsv -->``; otherwise ``llm.prompt_formats`` in
+config.yaml or ``DEFAULT_FORMATS`` applies and the cheapest one is used.
+"""
+import json
+import re
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from src.prompt_packer import count_tokens, join_json, render_json
+
+FORMATS = ('json-pretty', 'json', 'tsv', 'tsv-legend')
+DEFAULT_FORMATS = ('json', 'tsv', 'tsv-legend')
+LEGEND_FIELD = 'author'
+# Records serialized when comparing formats; enough to be representative
+SAMPLE_SIZE = 50
+
+FORMATS_HINT_RE = re.compile(r'\A<!--\s*formats:\s*(?P<formats>[^>]*?)\s*-->[ \t]*\r?\n?')
+
+
+def template_formats(template: str) -> Tuple[Optional[List[str]], str]:
+    """Split an optional ``<!-- formats: ... -->`` first line off a template.
+
+    Returns the declared formats (None when there is no hint) and the
+    template text without the hint.
+    """
+    match = FORMATS_HINT_RE.match(template)
+    if not match:
+        return None, template
+    declared = [name.strip() for name in match.group('formats').split(',') if name.strip()]
+    unknown = [name for name in declared if name not in FORMATS]
+    if unknown:
+        raise ValueError(f"Unknown prompt format(s) {unknown}; expected one of {list(FORMATS)}")
+    return declared, template[match.end():]
+
+
+def allowed_formats(declared: Optional[Sequence[str]] = None, config: Optional[Dict] = None) -> List[str]:
+    """Formats a prompt may use: the template's hint, then config, then the defaults."""
+    if declared:
+        return list(declared)
+    configured = (config or {}).get('llm', {}).get('prompt_formats')
+    return list(configured or DEFAULT_FORMATS)
+
+
+def columns(records: Sequence[Dict]) -> List[str]:
+    """Union of record keys in order of first appearance."""
+    fields: Dict[str, None] = {}
+    for record in records:
+        fields.update(dict.fromkeys(record))
+    return list(fields)
+
+
+def _cell(value: Any) -> str:
+    if value is None:
+        return ''
+    if isinstance(value, (list, tuple)):
+        value = ','.join(str(v) for v in value)
+    elif isinstance(value, dict):
+        value = json.dumps(value, separators=(',', ':'), ensure_ascii=False)
+    return str(value).replace('\\', '\\\\').replace('\t', ' ').replace('\r', '').replace('\n', '\\n')
+
+
+def render_record(record: Dict, fmt: str, fields: Optional[Sequence[str]] = None) -> str:
+    """One record rendered exactly as it appears in ``serialize(..., fmt)``.
+
+    For ``tsv-legend`` the full author is kept, which is an upper bound on the
+    aliased row plus its share of the legend; that is what packing needs.
+    """
+    if fmt == 'json-pretty':
+        return render_json(record)
+    if fmt == 'json':
+        return json.dumps(record, separators=(',', ':'), ensure_ascii=False)
+    if fmt in ('tsv', 'tsv-legend'):
+        return '\t'.join(_cell(record.get(field)) for field in (fields or list(record)))
+    raise ValueError(f"Unknown prompt format '{fmt}'; expected one of {list(FORMATS)}")
+
+
+def format_overhead(fmt: str, fields: Sequence[str]) -> int:
+    """Tokens a format spends regardless of how many records it holds."""
+    if fmt in ('tsv', 'tsv-legend'):
+        return count_tokens('\t'.join(fields)) + 1
+    return 1
+
+
+def _author_legend(records: Sequence[Dict], field: str) -> Tuple[List[Dict], Dict[str, str]]:
+    aliases: Dict[str, str] = {}
+    aliased = []
+    for record in records:
+        author = record.get(field)
+        if author:
+            if author not in aliases:
+                aliases[author] = f'A{len(aliases) + 1}'
+            record = {**record, field: aliases[author]}
+        aliased.append(record)
+    return aliased, aliases
+
+
+def serialize(records: Sequence[Dict], fmt: str = 'json', fields: Optional[Sequence[str]] = None) -> str:
+    """Serialize a list of flat records in one of ``FORMATS``."""
+    if fmt == 'json-pretty':
+        return join_json([render_json(record) for record in records])
+    if fmt == 'json':
+        return '[' + ','.join(render_record(record, fmt) for record in records) + ']'
+    if fmt not in ('tsv', 'tsv-legend'):
+        raise ValueError(f"Unknown prompt format '{fmt}'; expected one of {list(FORMATS)}")
+
+    fields = list(fields or columns(records))
+    lines = []
+    if fmt == 'tsv-legend' and LEGEND_FIELD in fields:
+        records, aliases = _author_legend(records, LEGEND_FIELD)
+        if aliases:
+            lines.append(f'{LEGEND_FIELD}s: ' + '; '.join(f'{alias}={name}' for name, alias in aliases.items()))
+    lines.append('\t'.join(fields))
+    lines.extend(render_record(record, 'tsv', fields) for record in records)
+    return '\n'.join(lines)
+
+
+def token_report(records: Sequence[Dict], formats: Sequence[str] = FORMATS) -> Dict[str, int]:
+    """Prompt tokens each format needs for ``records``."""
+    fields = columns(records)
+    return {fmt: count_tokens(serialize(records, fmt, fields)) for fmt in formats}
+
+
+def cheapest_format(
+    records: Sequence[Dict],
+    allowed: Sequence[str] = DEFAULT_FORMATS,
+    sample_size: int = SAMPLE_SIZE,
+) -> Tuple[str, Dict[str, int]]:
+    """Cheapest allowed format for ``records``, judged on a leading sample.
+
+    Returns the format name and the per-format token counts of the sample.
+    """
+    report = token_report(list(records[:sample_size]), allowed)
+    return min(allowed, key=lambda fmt: (report[fmt], list(allowed).index(fmt))), report
@@ -110,8 +110,8 @@ def find_existing_page(space: str, title: str) -> Optional[str]:
     
     return None
 
-def publish(version: str, md_path: str, update_existing: bool = True):
-    """Publish or update release notes in Confluence."""
+def publish(version: str, md_path: str, update_existing: bool = True, storage: Optional[str] = None):
+    """Publish or update release notes in Confluence; ``storage`` replaces the converted markdown body."""
     BASE, USER, TOKEN = get_confluence_config()
     
     if not BASE or not USER or not TOKEN:
@@ -135,6 +135,8 @@ def publish(version: str, md_path: str, update_existing: bool = True):
         current_version = r.json().get('version', {}).get('number', 1)
         
         payload = md_to_storage_format(md, title)
+        if storage is not None:
+            payload['body']['storage']['value'] = storage
         payload['version'] = {'number': current_version + 1}
         payload['id'] = existing_id
         
@@ -150,6 +152,8 @@ def publish(version: str, md_path: str, update_existing: bool = True):
     else:
         # Create new page
         payload = md_to_storage_format(md, title)
+        if storage is not None:
+            payload['body']['storage']['value'] = storage
         
         # Set parent if configured
         if PARENT_ID:
@@ -7,6 +7,7 @@ from pathlib import Path
 from datetime import datetime
 
 from src.utils import env, load_config
+from src.renderers import render_confluence, render_email, render_slack
 try:
     from src.confluence_fix import publish_to_confluence_fixed as publish_to_confluence
 except ImportError:
@@ -65,8 +66,12 @@ class PublishingService:
         metadata: Optional[Dict] = None
     ) -> Dict[str, Any]:
         """Publish to Confluence."""
+        notes = (metadata or {}).get('notes')
         try:
-            result = publish_to_confluence(version, file_path, update_existing=False)
+            result = publish_to_confluence(
+                version, file_path, update_existing=False,
+                storage=render_confluence(notes, version) if notes else None
+            )
             if result:
                 # Get the full URL - fix the URL construction
                 base_url = os.getenv('CONFLUENCE_BASE', 'https://yourcompany.atlassian.net')
@@ -155,44 +160,48 @@ class PublishingService:
         if not webhook_url:
             raise ValueError("SLACK_WEBHOOK_URL not configured")
         
-        # Extract highlights from content for Slack message
-        highlights = self._extract_highlights(content)
         repo = metadata.get('repo') if metadata else self.config.get('repo', 'Unknown')
+        notes = (metadata or {}).get('notes')
         
-        # Create Slack message
-        slack_message = {
-            "text": f"🚀 New Release: {version}",
-            "blocks": [
-                {
-                    "type": "header",
-                    "text": {
-                        "type": "plain_text",
-                        "text": f"🚀 {repo} - Release {version}"
-                    }
-                },
-                {
-                    "type": "section",
-                    "text": {
-                        "type": "mrkdwn",
-                        "text": f"*Highlights:*\n{highlights}"
-                    }
-                },
-                {
-                    "type": "actions",
-                    "elements": [
-                        {
-                            "type": "button",
-                            "text": {
-                                "type": "plain_text",
-                                "text": "View Full Release Notes"
-                            },
-                            "url": f"https://github.com/{repo}/releases/tag/{version}",
-                            "action_id": "view_release"
+        if notes:
+            # Structured notes render to a full message
+            slack_message = render_slack(notes, version, repo)
+        else:
+            # Extract highlights from content for Slack message
+            highlights = self._extract_highlights(content)
+            slack_message = {
+                "text": f"🚀 New Release: {version}",
+                "blocks": [
+                    {
+                        "type": "header",
+                        "text": {
+                            "type": "plain_text",
+                            "text": f"🚀 {repo} - Release {version}"
                         }
-                    ]
-                }
-            ]
-        }
+                    },
+                    {
+                        "type": "section",
+                        "text": {
+                            "type": "mrkdwn",
+                            "text": f"*Highlights:*\n{highlights}"
+                        }
+                    },
+                    {
+                        "type": "actions",
+                        "elements": [
+                            {
+                                "type": "button",
+                                "text": {
+                                    "type": "plain_text",
+                                    "text": "View Full Release Notes"
+                                },
+                                "url": f"https://github.com/{repo}/releases/tag/{version}",
+                                "action_id": "view_release"
+                            }
+                        ]
+                    }
+                ]
+            }
         
         response = requests.post(webhook_url, json=slack_message)
         response.raise_for_status()
@@ -224,18 +233,24 @@ class PublishingService:
         if not all([smtp_host, smtp_user, smtp_password]) or not recipients:
             raise ValueError("Email configuration incomplete")
         
+        notes = (metadata or {}).get('notes')
+        email = render_email(notes, version) if notes else {
+            'subject': f'Release Notes - {version}',
+            'text': content,
+            'html': self._markdown_to_html(content),
+        }
+        
         # Create email
         msg = MIMEMultipart('alternative')
-        msg['Subject'] = f'Release Notes - {version}'
+        msg['Subject'] = email['subject']
         msg['From'] = smtp_user
         msg['To'] = ', '.join(recipients)
         
         # Create HTML version
-        html_content = self._markdown_to_html(content)
-        html_part = MIMEText(html_content, 'html')
+        html_part = MIMEText(email['html'], 'html')
         
         # Create plain text version
-        text_part = MIMEText(content, 'plain')
+        text_part = MIMEText(email['text'], 'plain')
         
         msg.attach(text_part)
         msg.attach(html_part)
@@ -0,0 +1,239 @@
+"""Admission control for LLM calls: concurrency and tokens-per-minute caps.
+
+Every call needs a slot from the limiter of its provider and, if
+configured, of its model. A limiter caps requests in flight and keeps a
+token bucket refilled at ``tokens_per_minute``. A call reserves its
+estimated tokens (prompt plus the completion limit) up front; when the
+response reports actual usage the difference is returned to, or taken
+from, the bucket.
+
+Calls that do not fit wait in a queue per flow (one flow per generation),
+served round-robin (least recently served first) so one large map-reduce run cannot starve a small
+request. A waiter that has been passed over for ``max_skip_seconds`` stops
+others from overtaking it. Waiters give up with RateLimitTimeout at their
+deadline. The controller is shared by all threads and event loops of the
+process.
+"""
+import asyncio
+import itertools
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+# Defaults for the llm.rate_limits settings
+DEFAULT_CONCURRENCY = 8
+QUEUE_TIMEOUT = 300.0
+MAX_SKIP_SECONDS = 10.0
+# Served-turn history kept for flows with nothing queued
+MAX_FLOW_HISTORY = 1024
+# Waiters re-check at least this often, since buckets refill without any event
+POLL_SECONDS = 0.5
+
+
+class RateLimitTimeout(ValueError):
+    """Raised when a call waited past its deadline for provider capacity."""
+
+
+class Limiter:
+    """Concurrency cap and token bucket for one provider or model."""
+
+    def __init__(self, name: str, concurrency: Optional[int] = None,
+                 tokens_per_minute: Optional[int] = None, clock=time.monotonic):
+        self.name = name
+        self.concurrency = concurrency
+        self.capacity = tokens_per_minute
+        self.clock = clock
+        self.in_flight = 0
+        self.tokens = float(tokens_per_minute or 0)
+        self.updated = clock()
+
+    def _refill(self) -> None:
+        now = self.clock()
+        if self.capacity:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.capacity / 60)
+        self.updated = now
+
+    def fits(self, tokens: int) -> bool:
+        self._refill()
+        if self.concurrency is not None and self.in_flight >= self.concurrency:
+            return False
+        # A request larger than the whole bucket goes through once the bucket is full
+        return not self.capacity or self.tokens >= min(tokens, self.capacity)
+
+    def take(self, tokens: int) -> None:
+        self.in_flight += 1
+        if self.capacity:
+            self.tokens -= tokens
+
+    def release(self, refund: float) -> None:
+        self._refill()
+        self.in_flight -= 1
+        if self.capacity:
+            self.tokens = min(self.capacity, self.tokens + refund)
+
+    def snapshot(self) -> Dict[str, Any]:
+        self._refill()
+        return {
+            'in_flight': self.in_flight,
+            'concurrency': self.concurrency,
+            'tokens_per_minute': self.capacity,
+            'tokens_available': round(self.tokens) if self.capacity else None,
+        }
+
+
+class Ticket:
+    """A granted admission; hand it back to ``AdmissionController.release``."""
+
+    def __init__(self, limiters: List[Limiter], tokens: int):
+        self.limiters = limiters
+        self.tokens = tokens
+
+
+class _Waiter:
+    def __init__(self, limiters: List[Limiter], tokens: int, flow: str, loop, clock):
+        self.limiters = limiters
+        self.tokens = tokens
+        self.flow = flow
+        self.loop = loop
+        self.future = loop.create_future()
+        self.enqueued = clock()
+        self.granted = False
+        self.abandoned = False
+
+
+class AdmissionController:
+    """Fair, deadline-bounded queue in front of per-provider and per-model limiters.
+
+    ``settings`` is ``llm.rate_limits``: ``providers`` and ``models``
+    map names to ``{concurrency, tokens_per_minute}``, plus
+    ``default_concurrency``, ``queue_timeout`` and ``max_skip_seconds``.
+    """
+
+    def __init__(self, settings: Optional[Dict] = None, clock=time.monotonic):
+        settings = settings or {}
+        self.settings = settings
+        self.clock = clock
+        self.queue_timeout = settings.get('queue_timeout', QUEUE_TIMEOUT)
+        self.max_skip = settings.get('max_skip_seconds', MAX_SKIP_SECONDS)
+        self._limiters: Dict[str, Limiter] = {}
+        self._flows: Dict[str, deque] = {}
+        # Turn at which each flow was last served; never-served flows go first
+        self._served: Dict[str, int] = {}
+        self._turns = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def limiters_for(self, provider: str, model: str) -> List[Limiter]:
+        found = []
+        for kind, name, default_concurrency in (
+            ('providers', provider, self.settings.get('default_concurrency', DEFAULT_CONCURRENCY)),
+            ('models', model, None),
+        ):
+            key = f'{kind}:{name}'
+            if key not in self._limiters:
+                limits = (self.settings.get(kind) or {}).get(name) or {}
+                if not limits and default_concurrency is None:
+                    continue
+                self._limiters[key] = Limiter(
+                    name, limits.get('concurrency', default_concurrency), limits.get('tokens_per_minute'), self.clock
+                )
+            found.append(self._limiters[key])
+        return found
+
+    async def acquire(self, provider: str, model: str, tokens: int, flow: str = 'default',
+                      timeout: Optional[float] = None) -> Ticket:
+        """Wait for room for a call of about ``tokens`` tokens; raises RateLimitTimeout at the deadline."""
+        loop = asyncio.get_running_loop()
+        deadline = self.clock() + (self.queue_timeout if timeout is None else timeout)
+        with self._lock:
+            waiter = _Waiter(self.limiters_for(provider, model), tokens, flow, loop, self.clock)
+            self._flows.setdefault(flow, deque()).append(waiter)
+            self._dispatch()
+        try:
+            while not waiter.future.done():
+                remaining = deadline - self.clock()
+                if remaining <= 0:
+                    raise RateLimitTimeout(
+                        f"Waited {self.queue_timeout if timeout is None else timeout:.0f}s for "
+                        f"{provider} capacity ({model}); try again later"
+                    )
+                try:
+                    await asyncio.wait_for(asyncio.shield(waiter.future), min(remaining, POLL_SECONDS))
+                except asyncio.TimeoutError:
+                    with self._lock:
+                        self._dispatch()
+        except BaseException:
+            with self._lock:
+                waiter.abandoned = True
+                if waiter.granted:
+                    # Granted while we were giving up: hand the slot straight back
+                    for limiter in waiter.limiters:
+                        limiter.release(waiter.tokens)
+                    self._dispatch()
+            raise
+        return Ticket(waiter.limiters, tokens)
+
+    def release(self, ticket: Ticket, actual_tokens: Optional[int] = None) -> None:
+        """Free the ticket's slots, reconciling its reservation with the tokens actually used."""
+        refund = ticket.tokens - actual_tokens if actual_tokens is not None else ticket.tokens
+        with self._lock:
+            for limiter in ticket.limiters:
+                limiter.release(refund)
+            self._dispatch()
+
+    def _dispatch(self) -> None:
+        # Caller holds the lock. Grant to the least recently served flows first until no head fits.
+        now = self.clock()
+        progress = True
+        while progress:
+            progress = False
+            for flow in sorted(self._flows, key=lambda f: self._served.get(f, 0)):
+                queue = self._flows[flow]
+                while queue and queue[0].abandoned:
+                    queue.popleft()
+                if not queue:
+                    del self._flows[flow]
+                    continue
+                head = queue[0]
+                if all(limiter.fits(head.tokens) for limiter in head.limiters):
+                    queue.popleft()
+                    for limiter in head.limiters:
+                        limiter.take(head.tokens)
+                    head.granted = True
+                    head.loop.call_soon_threadsafe(_grant, head.future)
+                    self._served[flow] = next(self._turns)
+                    if len(self._served) > MAX_FLOW_HISTORY:
+                        self._served = {f: turn for f, turn in self._served.items() if f in self._flows}
+                    progress = True
+                    break
+                if now - head.enqueued >= self.max_skip:
+                    # Long-waiting head: nobody behind it in the round may overtake it
+                    return
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'limiters': {key: limiter.snapshot() for key, limiter in self._limiters.items()},
+                'waiting': {flow: len(queue) for flow, queue in self._flows.items()},
+            }
+
+
+def _grant(future) -> None:
+    if not future.done():
+        future.set_result(True)
+
+
+_controller: Optional[AdmissionController] = None
+_flow_ids = itertools.count(1)
+
+
+def next_flow_id() -> str:
+    return f'generation-{next(_flow_ids)}'
+
+
+def get_admission_controller(settings: Optional[Dict] = None) -> AdmissionController:
+    """Process-wide controller, configured from ``llm.rate_limits`` on first use."""
+    global _controller
+    if _controller is None:
+        _controller = AdmissionController(settings if isinstance(settings, dict) else None)
+    return _controller
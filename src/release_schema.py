@@ -0,0 +1,127 @@
+"""JSON schema for structured release notes and helpers to read it back.
+
+In structured mode the model answers with one JSON object: a title, a
+short summary and ordered sections, each a list of items with the commit
+SHAs or issue numbers they come from. Providers that support it are held
+to the schema (OpenAI/OpenRouter ``json_schema`` response format,
+Anthropic tool input, Ollama ``format``). Every output format is then
+rendered from the object (see ``src.renderers``) rather than by
+re-parsing markdown.
+"""
+import json
+import re
+from typing import Any, Dict, List
+
+SCHEMA_NAME = 'release_notes'
+
+# Strict-mode compatible: every property required, no additional properties
+RELEASE_NOTES_SCHEMA: Dict[str, Any] = {
+    'type': 'object',
+    'properties': {
+        'title': {'type': 'string'},
+        'summary': {'type': 'string'},
+        'sections': {
+            'type': 'array',
+            'items': {
+                'type': 'object',
+                'properties': {
+                    'heading': {'type': 'string'},
+                    'items': {
+                        'type': 'array',
+                        'items': {
+                            'type': 'object',
+                            'properties': {
+                                'text': {'type': 'string'},
+                                'refs': {'type': 'array', 'items': {'type': 'string'}},
+                            },
+                            'required': ['text', 'refs'],
+                            'additionalProperties': False,
+                        },
+                    },
+                },
+                'required': ['heading', 'items'],
+                'additionalProperties': False,
+            },
+        },
+    },
+    'required': ['title', 'summary', 'sections'],
+    'additionalProperties': False,
+}
+
+# Appended to the prompt prefix (so it is cached with the instructions)
+JSON_INSTRUCTIONS = (
+    'Respond with a single JSON object and nothing else, matching this schema:\n'
+    + json.dumps(RELEASE_NOTES_SCHEMA)
+    + '\nUse the sections requested above as "sections", in that order, leaving out empty ones. '
+    'Each item is one bullet point; "refs" lists the commit SHAs (short form) and issue numbers '
+    '(e.g. "#123") it is based on, or is empty.'
+)
+
+_FENCE = re.compile(r'^\s*```(?:json)?\s*(.*?)\s*```\s*$', re.DOTALL)
+_BULLET = re.compile(r'^\s*[-*+]\s+(.*)$')
+_REFS = re.compile(r'\s*\(((?:#\d+|[0-9a-f]{7,40})(?:,\s*(?:#\d+|[0-9a-f]{7,40}))*)\)\s*$')
+
+
+def validate_notes(data: Any) -> Dict[str, Any]:
+    """Check ``data`` against the schema; raises ValueError naming the first problem."""
+    if not isinstance(data, dict):
+        raise ValueError('release notes must be a JSON object')
+    for key in ('title', 'summary'):
+        if not isinstance(data.get(key), str):
+            raise ValueError(f"'{key}' must be a string")
+    if not isinstance(data.get('sections'), list):
+        raise ValueError("'sections' must be a list")
+    for i, section in enumerate(data['sections']):
+        if not isinstance(section, dict) or not isinstance(section.get('heading'), str):
+            raise ValueError(f'sections[{i}] needs a string heading')
+        if not isinstance(section.get('items'), list):
+            raise ValueError(f'sections[{i}].items must be a list')
+        for j, item in enumerate(section['items']):
+            if not isinstance(item, dict) or not isinstance(item.get('text'), str):
+                raise ValueError(f'sections[{i}].items[{j}] needs a string text')
+            refs = item.setdefault('refs', [])
+            if not isinstance(refs, list) or not all(isinstance(r, str) for r in refs):
+                raise ValueError(f'sections[{i}].items[{j}].refs must be a list of strings')
+    return data
+
+
+def parse_notes(text: str) -> Dict[str, Any]:
+    """Validated notes from a model's JSON answer (a surrounding code fence is tolerated)."""
+    fenced = _FENCE.match(text)
+    try:
+        data = json.loads(fenced.group(1) if fenced else text)
+    except json.JSONDecodeError as e:
+        raise ValueError(f'model output is not valid JSON: {e}')
+    return validate_notes(data)
+
+
+def notes_from_markdown(text: str) -> Dict[str, Any]:
+    """Best-effort notes from markdown, for models that ignored the JSON instructions."""
+    notes: Dict[str, Any] = {'title': '', 'summary': '', 'sections': []}
+    summary: List[str] = []
+    for line in text.splitlines():
+        stripped = line.strip()
+        if stripped.startswith('#'):
+            heading = stripped.lstrip('#').strip()
+            if stripped.startswith('# ') and not notes['title'] and not notes['sections']:
+                notes['title'] = heading
+            else:
+                notes['sections'].append({'heading': heading, 'items': []})
+            continue
+        bullet = _BULLET.match(line)
+        if bullet and notes['sections']:
+            item = bullet.group(1).strip()
+            refs = _REFS.search(item)
+            notes['sections'][-1]['items'].append({
+                'text': item[:refs.start()] if refs else item,
+                'refs': [r.strip() for r in refs.group(1).split(',')] if refs else [],
+            })
+        elif stripped and not notes['sections'] and not stripped.startswith('---'):
+            summary.append(stripped)
+    notes['summary'] = ' '.join(summary)
+    return notes
+
+
+def section_key(heading: str) -> str:
+    """Dict key for a heading, as ``LLMService.parse_llm_output`` makes them."""
+    return heading.strip().lower().replace(' ', '_')
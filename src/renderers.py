@@ -0,0 +1,112 @@
+"""Output formats rendered from structured release notes (see ``src.release_schema``).
+
+Each renderer takes the validated notes plus the version and repository
+and returns the format its destination expects: markdown text, Confluence
+storage XHTML, a Slack Block Kit message or an email (subject, text,
+HTML). Nothing here re-reads markdown.
+"""
+from html import escape
+from typing import Any, Callable, Dict, List
+
+# Slack limits: 50 blocks per message, 3000 characters per text, 150 per header
+SLACK_MAX_BLOCKS = 50
+SLACK_MAX_TEXT = 3000
+SLACK_MAX_HEADER = 150
+
+
+def _refs(item: Dict[str, Any]) -> str:
+    return f" ({', '.join(item['refs'])})" if item.get('refs') else ''
+
+
+def _title(notes: Dict[str, Any], version: str) -> str:
+    return notes.get('title') or (f'Release {version}' if version else 'Release Notes')
+
+
+def markdown_items(section: Dict[str, Any]) -> str:
+    """Bullet list of one section's items."""
+    return '\n'.join(f"- {item['text']}{_refs(item)}" for item in section['items'])
+
+
+def render_markdown(notes: Dict[str, Any], version: str = '', repo: str = '') -> str:
+    lines = [f'# {_title(notes, version)}', '']
+    if notes.get('summary'):
+        lines += [notes['summary'], '']
+    for section in notes['sections']:
+        lines += [f"## {section['heading']}", markdown_items(section), '']
+    return '\n'.join(lines).rstrip() + '\n'
+
+
+def render_confluence(notes: Dict[str, Any], version: str = '', repo: str = '') -> str:
+    """Confluence storage format body (the page title is set separately)."""
+    parts = []
+    if notes.get('summary'):
+        parts.append(f"<p>{escape(notes['summary'])}</p>")
+    for section in notes['sections']:
+        parts.append(f"<h2>{escape(section['heading'])}</h2>")
+        items = ''.join(
+            f"<li>{escape(item['text'])}"
+            + (f" ({', '.join(f'<code>{escape(r)}</code>' for r in item['refs'])})" if item.get('refs') else '')
+            + '</li>'
+            for item in section['items']
+        )
+        if items:
+            parts.append(f'<ul>{items}</ul>')
+    return '\n'.join(parts)
+
+
+def _slack_escape(text: str) -> str:
+    return text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+
+
+def render_slack(notes: Dict[str, Any], version: str = '', repo: str = '') -> Dict[str, Any]:
+    """Block Kit message: header, summary, one block per section and a link to the release."""
+    header = f"🚀 {repo} - {_title(notes, version)}" if repo else f"🚀 {_title(notes, version)}"
+    blocks: List[Dict[str, Any]] = [
+        {'type': 'header', 'text': {'type': 'plain_text', 'text': header[:SLACK_MAX_HEADER]}}
+    ]
+    if notes.get('summary'):
+        blocks.append({'type': 'section', 'text': {
+            'type': 'mrkdwn', 'text': _slack_escape(notes['summary'])[:SLACK_MAX_TEXT]}})
+    for section in notes['sections']:
+        if len(blocks) >= SLACK_MAX_BLOCKS - 1:
+            break
+        if not section['items']:
+            continue
+        text = f"*{_slack_escape(section['heading'])}*\n" + '\n'.join(
+            f"• {_slack_escape(item['text'])}{_refs(item)}" for item in section['items']
+        )
+        if len(text) > SLACK_MAX_TEXT:
+            text = text[:SLACK_MAX_TEXT - 1] + '…'
+        blocks.append({'type': 'section', 'text': {'type': 'mrkdwn', 'text': text}})
+    if repo and version:
+        blocks.append({'type': 'actions', 'elements': [{
+            'type': 'button',
+            'text': {'type': 'plain_text', 'text': 'View Full Release Notes'},
+            'url': f'https://github.com/{repo}/releases/tag/{version}',
+            'action_id': 'view_release',
+        }]})
+    return {'text': f'🚀 New Release: {version or _title(notes, version)}', 'blocks': blocks}
+
+
+def render_email(notes: Dict[str, Any], version: str = '', repo: str = '') -> Dict[str, str]:
+    """Subject with plain-text and HTML bodies."""
+    html = f"<html><body><h1>{escape(_title(notes, version))}</h1>\n{render_confluence(notes)}</body></html>"
+    return {
+        'subject': f'Release Notes - {version}' if version else _title(notes, version),
+        'text': render_markdown(notes, version, repo),
+        'html': html,
+    }
+
+
+RENDERERS: Dict[str, Callable[..., Any]] = {
+    'markdown': render_markdown,
+    'confluence': render_confluence,
+    'slack': render_slack,
+    'email': render_email,
+}
+
+
+def render(notes: Dict[str, Any], fmt: str, version: str = '', repo: str = '') -> Any:
+    if fmt not in RENDERERS:
+        raise ValueError(f"Unknown output format '{fmt}'; expected one of {sorted(RENDERERS)}")
+    return RENDERERS[fmt](notes, version, repo)
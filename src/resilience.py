@@ -0,0 +1,199 @@
+"""Per-provider circuit breakers and retry backoff for LLM calls.
+
+Each provider gets a breaker that keeps the outcome and latency of its
+recent calls. When enough of them failed, the breaker opens and calls are
+refused at once instead of waiting for another timeout. After
+``open_seconds`` it lets a single probe through (half-open): success
+closes it, failure opens it again for twice as long (up to
+``MAX_OPEN_SECONDS``). Retryable errors (HTTP 429/5xx, connection errors,
+timeouts) are retried with full-jitter exponential backoff.
+"""
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Iterator, Optional
+
+import requests
+
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half-open'
+
+# Defaults for the llm.resilience settings
+DEFAULT_SETTINGS = {
+    'retries': 2,
+    'backoff_base': 0.5,
+    'backoff_cap': 8.0,
+    'failure_rate': 0.5,
+    'window': 20,
+    'min_calls': 4,
+    'open_seconds': 30.0,
+}
+MAX_OPEN_SECONDS = 300.0
+RETRYABLE_STATUS = frozenset({408, 409, 429, 500, 502, 503, 504, 529})
+# SDK exception names (openai, anthropic) for network-level failures
+RETRYABLE_ERRORS = frozenset({'APIConnectionError', 'APITimeoutError'})
+
+
+class CircuitOpenError(ValueError):
+    """Raised instead of calling a provider whose breaker is open."""
+
+
+def status_code(exc: BaseException) -> Optional[int]:
+    """HTTP status of an SDK or requests error, if it has one."""
+    code = getattr(exc, 'status_code', None)
+    if code is None:
+        code = getattr(getattr(exc, 'response', None), 'status_code', None)
+    return code if isinstance(code, int) else None
+
+
+def _causes(exc: Optional[BaseException]) -> Iterator[BaseException]:
+    """``exc`` and the errors it was raised from (``raise ... from e``)."""
+    while exc is not None:
+        yield exc
+        exc = exc.__cause__
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """Whether ``exc``, or the error it wraps, is a transient provider failure."""
+    for error in _causes(exc):
+        code = status_code(error)
+        if code is not None:
+            return code in RETRYABLE_STATUS
+        if (isinstance(error, (requests.ConnectionError, requests.Timeout, asyncio.TimeoutError))
+                or type(error).__name__ in RETRYABLE_ERRORS):
+            return True
+    return False
+
+
+def retry_after(exc: BaseException) -> Optional[float]:
+    """Seconds from a numeric Retry-After header on the error's (or its cause's) response."""
+    for error in _causes(exc):
+        headers = getattr(getattr(error, 'response', None), 'headers', None) or {}
+        try:
+            return float(headers.get('retry-after'))
+        except (TypeError, ValueError):
+            continue
+    return None
+
+
+def backoff_delays(retries: int, base: float, cap: float, rng: random.Random = random) -> Iterator[float]:
+    """Full-jitter exponential backoff: uniform(0, min(cap, base * 2**attempt))."""
+    for attempt in range(retries):
+        yield rng.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def _percentile(values, q: float) -> Optional[float]:
+    return round(values[min(int(q * len(values)), len(values) - 1)], 3) if values else None
+
+
+class CircuitBreaker:
+    """Error-rate breaker over a sliding window of recent calls."""
+
+    def __init__(self, name: str, settings: Optional[Dict] = None, clock=time.monotonic):
+        settings = {**DEFAULT_SETTINGS, **(settings or {})}
+        self.name = name
+        self.failure_rate = settings['failure_rate']
+        self.min_calls = settings['min_calls']
+        self.base_open_seconds = settings['open_seconds']
+        self.open_seconds = self.base_open_seconds
+        self.clock = clock
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.last_error: Optional[str] = None
+        self._calls: deque = deque(maxlen=settings['window'])
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def _refresh(self) -> None:
+        if self.state == OPEN and self.clock() - self.opened_at >= self.open_seconds:
+            self.state = HALF_OPEN
+            self._probing = False
+
+    def allow(self) -> bool:
+        """Whether a call may go through now; in half-open state only one probe at a time."""
+        with self._lock:
+            self._refresh()
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def check(self) -> None:
+        """Raise CircuitOpenError unless a call may go through."""
+        if not self.allow():
+            wait = max(self.opened_at + self.open_seconds - self.clock(), 0)
+            raise CircuitOpenError(
+                f"{self.name} circuit is open after repeated failures ({self.last_error}); retry in {wait:.0f}s"
+            )
+
+    def record_success(self, latency: float) -> None:
+        with self._lock:
+            self._calls.append((True, latency))
+            if self.state == HALF_OPEN:
+                self.state = CLOSED
+                self.open_seconds = self.base_open_seconds
+                self._calls.clear()
+                self._calls.append((True, latency))
+            self._probing = False
+
+    def abandon(self) -> None:
+        """A call that was let through ended without an outcome (cancelled)."""
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self, latency: float, error: BaseException) -> None:
+        with self._lock:
+            self._calls.append((False, latency))
+            self.last_error = f'{type(error).__name__}: {error}'[:200]
+            if self.state == HALF_OPEN:
+                self._open(min(self.open_seconds * 2, MAX_OPEN_SECONDS))
+            elif self.state == CLOSED and len(self._calls) >= self.min_calls and self.error_rate >= self.failure_rate:
+                self._open(self.base_open_seconds)
+            self._probing = False
+
+    def _open(self, seconds: float) -> None:
+        self.state = OPEN
+        self.opened_at = self.clock()
+        self.open_seconds = seconds
+
+    @property
+    def error_rate(self) -> float:
+        return sum(1 for ok, _ in self._calls if not ok) / len(self._calls) if self._calls else 0.0
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            self._refresh()
+            latencies = sorted(latency for _, latency in self._calls)
+            return {
+                'state': self.state,
+                'available': self.state != OPEN,
+                'calls': len(self._calls),
+                'error_rate': round(self.error_rate, 3),
+                'latency_p50': _percentile(latencies, 0.5),
+                'latency_p95': _percentile(latencies, 0.95),
+                'retry_in': round(max(self.opened_at + self.open_seconds - self.clock(), 0), 1)
+                if self.state == OPEN else 0,
+                'last_error': self.last_error,
+            }
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(provider: str, settings: Optional[Dict] = None) -> CircuitBreaker:
+    """Process-wide breaker for ``provider``, configured from ``llm.resilience`` on first use."""
+    with _breakers_lock:
+        if provider not in _breakers:
+            _breakers[provider] = CircuitBreaker(provider, settings)
+        return _breakers[provider]
+
+
+def breaker_states() -> Dict[str, Dict[str, Any]]:
+    """Snapshot of every provider breaker created so far."""
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {breaker.name: breaker.snapshot() for breaker in breakers}
@@ -0,0 +1,279 @@
+"""Compiled prompt templates loaded once and reloaded when their files change.
+
+Templates in ``templates/*.md`` are parsed with ``string.Formatter`` when
+they are loaded, so unknown or malformed placeholders are reported at
+startup instead of at generation time. Rendering reuses the parsed
+segments. The directory is re-checked (by mtime) at most once per
+``check_interval`` seconds, so edited, added or removed files are picked
+up without a restart.
+"""
+import os
+import re
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from string import Formatter
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.prompt_serialization import template_formats
+
+# Placeholders LLMService.build_prompt fills in
+PROMPT_FIELDS = frozenset({
+    'version', 'date', 'commits', 'issues', 'previous_releases', 'audience',
+    'custom_sections', 'audience_instructions', 'sections_instruction',
+    # map-reduce templates
+    'component', 'summaries',
+})
+# A prompt template without these would silently leave the data out
+REQUIRED_PROMPT_FIELDS = ('commits',)
+# Placeholders whose values change between generations; lines using them go after the cacheable prefix
+VARIABLE_FIELDS = frozenset({'version', 'date', 'commits', 'issues', 'component', 'summaries'})
+PARAGRAPH_RE = re.compile(r'\n[ \t]*\n(?:[ \t]*\n)*')
+
+CONVERSIONS = {'r': repr, 's': str, 'a': ascii}
+
+
+class CompiledTemplate:
+    """A template parsed once into literal text and placeholder segments."""
+
+    def __init__(self, name: str, source: str, path: Optional[Path] = None, mtime_ns: int = 0, size: int = 0):
+        self.name = name
+        self.source = source
+        self.path = path
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.formats: Optional[List[str]] = None
+        self.fields: List[str] = []
+        self.errors: List[str] = []
+        self._segments: List[Tuple[str, Optional[str], str, Optional[str]]] = []
+        self._simple = True
+        self._split: Optional[Tuple['CompiledTemplate', 'CompiledTemplate']] = None
+
+        try:
+            self.formats, self.text = template_formats(source)
+            self._segments = list(Formatter().parse(self.text))
+        except ValueError as e:
+            self.text = source
+            self.errors.append(str(e))
+            return
+
+        for _, field, spec, _ in self._segments:
+            if field is None:
+                continue
+            root = field.split('.', 1)[0].split('[', 1)[0]
+            if not root or root.isdigit():
+                self.errors.append(f"positional placeholder '{{{field}}}' is not supported")
+                continue
+            if root not in self.fields:
+                self.fields.append(root)
+            if root != field or '{' in (spec or ''):
+                # Attribute/index lookups and nested specs go through str.format
+                self._simple = False
+
+    @property
+    def unknown_fields(self) -> List[str]:
+        return [field for field in self.fields if field not in PROMPT_FIELDS]
+
+    @property
+    def missing_fields(self) -> List[str]:
+        return [field for field in REQUIRED_PROMPT_FIELDS if field not in self.fields]
+
+    @property
+    def is_prompt(self) -> bool:
+        """Whether build_prompt can fill every placeholder of this template."""
+        return not self.errors and not self.unknown_fields
+
+    def check_prompt(self) -> None:
+        """Raise ValueError if this template cannot be used as a prompt."""
+        if self.errors:
+            raise ValueError(f"Template '{self.name}' is invalid: {'; '.join(self.errors)}")
+        if self.unknown_fields:
+            raise ValueError(
+                f"Template '{self.name}' uses unknown placeholders {self.unknown_fields}; "
+                f"available: {sorted(PROMPT_FIELDS)}"
+            )
+
+    def render(self, **data: Any) -> str:
+        """Equivalent of ``text.format(**data)`` using the pre-parsed segments."""
+        if self.errors:
+            raise ValueError(f"Template '{self.name}' is invalid: {'; '.join(self.errors)}")
+        if not self._simple:
+            return self.text.format(**data)
+        parts = []
+        for literal, field, spec, conversion in self._segments:
+            parts.append(literal)
+            if field is None:
+                continue
+            value = data[field]
+            if conversion:
+                value = CONVERSIONS[conversion](value)
+            parts.append(format(value, spec) if spec else str(value))
+        return ''.join(parts)
+
+    def split(self) -> Tuple['CompiledTemplate', 'CompiledTemplate']:
+        """Stable prefix and variable suffix of this template, split by paragraph.
+
+        Paragraphs (blocks separated by blank lines) with a placeholder from
+        ``VARIABLE_FIELDS`` move (in order) to the suffix, so a label stays
+        with the data under it and everything that stays the same across
+        generations (instructions, audience text, previous releases) forms a
+        prefix that providers can cache. Rendering prefix then suffix gives
+        the same content as ``render`` with the data paragraphs moved to the
+        end; the shipped templates already end with their data paragraphs,
+        so for them it is the same text.
+        """
+        if self._split is None:
+            prefix, suffix = [], []
+            for paragraph in PARAGRAPH_RE.split(self.text.strip('\n')):
+                try:
+                    fields = {f.split('.', 1)[0].split('[', 1)[0] for _, f, _, _ in Formatter().parse(paragraph) if f}
+                except ValueError:
+                    # A placeholder spanning paragraphs; keep the whole template together
+                    prefix, suffix = [], [self.text]
+                    break
+                (suffix if fields & VARIABLE_FIELDS else prefix).append(paragraph)
+            prefix_text = '\n\n'.join(prefix).strip('\n')
+            suffix_text = '\n\n'.join(suffix).strip('\n')
+            self._split = (
+                CompiledTemplate(f'{self.name}:prefix', prefix_text),
+                CompiledTemplate(f'{self.name}:suffix', suffix_text),
+            )
+        return self._split
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            'name': self.name,
+            'path': str(self.path) if self.path else None,
+            'modified': datetime.fromtimestamp(self.mtime_ns / 1e9).isoformat() if self.mtime_ns else None,
+            'fields': self.fields,
+            'formats': self.formats,
+            'is_prompt': self.is_prompt,
+            'errors': self.errors,
+            'unknown_fields': self.unknown_fields,
+        }
+
+
+def compile_template(source: str, name: str = '<inline>') -> CompiledTemplate:
+    """Compile template text that does not come from the templates directory."""
+    return CompiledTemplate(name, source)
+
+
+def find_templates_dir(start: Optional[Path] = None) -> Path:
+    """``templates/`` in the working directory, else the nearest one above this package."""
+    if Path('templates').is_dir():
+        return Path('templates')
+    current = start or Path(__file__).parent
+    while current != current.parent:
+        if (current / 'templates').is_dir():
+            return current / 'templates'
+        current = current.parent
+    return Path('templates')
+
+
+class TemplateRegistry:
+    """All ``*.md`` templates of a directory, compiled and kept current."""
+
+    def __init__(self, directory: Optional[Path] = None, check_interval: float = 1.0):
+        self.directory = Path(directory) if directory else find_templates_dir()
+        self.check_interval = check_interval
+        self._templates: Dict[str, CompiledTemplate] = {}
+        self._checked = 0.0
+        self._lock = threading.Lock()
+        self.refresh(force=True)
+
+    def refresh(self, force: bool = False) -> List[str]:
+        """Recompile templates whose files changed; returns the names that changed.
+
+        Changes are made to a copy that then replaces the mapping in one
+        assignment, so readers never see a half-updated set of templates.
+        """
+        now = time.monotonic()
+        if not force and now - self._checked < self.check_interval:
+            return []
+        with self._lock:
+            self._checked = now
+            templates = dict(self._templates)
+            seen: Dict[str, os.DirEntry] = {}
+            if self.directory.is_dir():
+                with os.scandir(self.directory) as entries:
+                    seen = {
+                        entry.name[:-3]: entry for entry in entries
+                        if entry.name.endswith('.md') and entry.is_file()
+                    }
+
+            changed = [name for name in templates if name not in seen]
+            for name in changed:
+                del templates[name]
+            for name, entry in seen.items():
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    # Removed since the directory was listed
+                    if templates.pop(name, None) is not None:
+                        changed.append(name)
+                    continue
+                current = templates.get(name)
+                if (current is not None and not force
+                        and (current.mtime_ns, current.size) == (stat.st_mtime_ns, stat.st_size)):
+                    continue
+                path = Path(entry.path)
+                try:
+                    source = path.read_text(encoding='utf-8')
+                except OSError as e:
+                    print(f"Warning: could not read template {path}: {e}")
+                    continue
+                compiled = CompiledTemplate(name, source, path, stat.st_mtime_ns, stat.st_size)
+                templates[name] = compiled
+                changed.append(name)
+                self._warn(compiled)
+            self._templates = templates
+            return changed
+
+    def reload(self) -> List[str]:
+        """Recompile every template now."""
+        return self.refresh(force=True)
+
+    def _warn(self, compiled: CompiledTemplate) -> None:
+        if compiled.errors:
+            print(f"Warning: template '{compiled.name}' is invalid: {'; '.join(compiled.errors)}")
+        elif compiled.name.startswith('prompt'):
+            if compiled.unknown_fields:
+                print(f"Warning: prompt template '{compiled.name}' uses unknown placeholders "
+                      f"{compiled.unknown_fields}")
+            if compiled.missing_fields:
+                print(f"Warning: prompt template '{compiled.name}' has no placeholder for "
+                      f"{compiled.missing_fields}")
+
+    def get(self, name: str) -> Optional[CompiledTemplate]:
+        """Template by name, with or without the ``.md`` suffix."""
+        self.refresh()
+        if name.endswith('.md'):
+            name = name[:-3]
+        return self._templates.get(name)
+
+    def templates(self) -> List[CompiledTemplate]:
+        self.refresh()
+        templates = self._templates
+        return [templates[name] for name in sorted(templates)]
+
+    def prompt_template(self, audience: Optional[str] = None) -> CompiledTemplate:
+        """``prompt_<audience>`` if present, else the default ``prompt`` template."""
+        compiled = (audience and self.get(f'prompt_{audience}')) or self.get('prompt')
+        if compiled is None:
+            raise ValueError(f"No prompt template found in {self.directory}")
+        return compiled
+
+
+_registry: Optional[TemplateRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_template_registry() -> TemplateRegistry:
+    """Process-wide registry, created (and all templates compiled) on first use."""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = TemplateRegistry()
+    return _registry
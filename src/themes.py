@@ -0,0 +1,215 @@
+"""Optional theme clustering of commits and issues (needs numpy and scipy).
+
+Each commit/issue becomes a sparse TF-IDF vector over its words, its
+conventional-commit scope and the directories it touches. Spherical
+k-means groups the vectors into themes, and each theme is labelled with
+its centroid's top terms and most common paths. The prompt builder can
+then present changes grouped by theme instead of as one flat list.
+"""
+import math
+import re
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+from scripts.classify_change import parse_conventional
+from src.dedup import STOPWORDS
+from src.prompt_packer import label_names
+
+DEFAULT_MAX_THEMES = 8
+MAX_ITERATIONS = 12
+MIN_DF = 2
+MAX_DF_RATIO = 0.5
+PATH_PREFIX = 'path:'
+TOKEN_RE = re.compile(r'[a-z][a-z0-9_]{2,}')
+# Words that say what kind of change it is rather than what it is about
+CHANGE_WORDS = frozenset({
+    'add', 'added', 'adds', 'fix', 'fixed', 'fixes', 'update', 'updated', 'updates', 'remove', 'removed',
+    'change', 'changed', 'changes', 'use', 'make', 'improve', 'support', 'new', 'now', 'when', 'not',
+    'feat', 'chore', 'refactor', 'docs', 'bump', 'issue', 'bug', 'should',
+})
+
+
+def _scientific():
+    try:
+        import numpy as np
+        from scipy import sparse
+        return np, sparse
+    except ImportError:
+        raise ValueError("numpy and scipy packages not installed. Run: pip install numpy scipy")
+
+
+class Theme(NamedTuple):
+    label: str
+    terms: List[str]
+    paths: List[str]
+    commits: List[Dict]
+    issues: List[Dict]
+
+
+@lru_cache(maxsize=65536)
+def _directory_term(name: str, depth: int = 2) -> Optional[str]:
+    parts = name.split('/')[:-1][:depth]
+    return PATH_PREFIX + '/'.join(parts) if parts else None
+
+
+@lru_cache(maxsize=65536)
+def _words(text: str) -> tuple:
+    return tuple(w for w in TOKEN_RE.findall(text.lower()) if w not in STOPWORDS and w not in CHANGE_WORDS)
+
+
+@lru_cache(maxsize=65536)
+def _subject_terms(subject: str) -> tuple:
+    header = parse_conventional(subject)
+    terms = _words(header['description'] if header else subject)
+    if header and header['scope']:
+        terms += (header['scope'].lower(),)
+    return terms
+
+
+def commit_terms(commit: Dict) -> List[str]:
+    """Words of the commit description and body start, its scope and touched directories."""
+    terms = list(_subject_terms(commit.get('subject', '')))
+    if commit.get('body'):
+        terms.extend(_words(commit['body'][:200]))
+    if commit.get('scope') and commit['scope'].lower() not in terms:
+        terms.append(commit['scope'].lower())
+    directories = {_directory_term(name) for name in commit.get('files') or []}
+    terms.extend(sorted(d for d in directories if d))
+    return terms
+
+
+def issue_terms(issue: Dict) -> List[str]:
+    """Words of the issue title and its labels."""
+    return list(_words(f"{issue.get('title', '')} {' '.join(label_names(issue))}"))
+
+
+def tfidf_matrix(documents: Sequence[List[str]]):
+    """L2-normalised TF-IDF rows (CSR) and the vocabulary, dropping rare and ubiquitous terms."""
+    np, sparse = _scientific()
+    n = len(documents)
+    index: Dict[str, int] = {}
+    columns = np.fromiter(
+        (index.setdefault(term, len(index)) for doc in documents for term in doc),
+        dtype=np.int64, count=sum(map(len, documents))
+    )
+    rows = np.repeat(np.arange(n), [len(doc) for doc in documents])
+    counts = sparse.csr_matrix(
+        (np.ones(len(columns), dtype=np.float32), (rows, columns)), shape=(n, len(index))
+    )
+    # csr_matrix sums repeated (row, term) entries, so each stored entry is one document
+    df = np.bincount(counts.indices, minlength=len(index))
+    keep = np.flatnonzero((df >= MIN_DF) & (df <= max(MAX_DF_RATIO * n, MIN_DF)))
+    terms = np.asarray(list(index), dtype=object)
+    vocabulary = terms[keep].tolist()
+
+    idf = (np.log((1 + n) / (1 + df[keep])) + 1).astype(np.float32)
+    matrix = counts[:, keep] @ sparse.diags(idf)
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    return sparse.csr_matrix(sparse.diags(1 / norms) @ matrix), vocabulary
+
+
+def spherical_kmeans(matrix, k: int, seed: int = 0, iterations: int = MAX_ITERATIONS):
+    """Cluster assignment per row and the (k, vocab) centroid matrix, by cosine similarity."""
+    np, sparse = _scientific()
+    rng = np.random.default_rng(seed)
+    rows = matrix.shape[0]
+    nonempty = np.flatnonzero(matrix.getnnz(axis=1))
+    # Farthest-point seeding: each new centroid is the row least similar to those chosen so far
+    chosen = [int(rng.choice(nonempty))]
+    closest = np.asarray((matrix @ matrix[chosen[0]].T).todense()).ravel()
+    for _ in range(min(k, len(nonempty)) - 1):
+        candidates = closest[nonempty]
+        nxt = int(nonempty[candidates.argmin()])
+        if nxt in chosen:
+            break
+        chosen.append(nxt)
+        closest = np.maximum(closest, np.asarray((matrix @ matrix[nxt].T).todense()).ravel())
+    centroids = matrix[chosen].toarray()
+    assignment = np.full(rows, -1)
+    for _ in range(iterations):
+        new = np.asarray((matrix @ centroids.T).argmax(axis=1)).ravel()
+        if np.array_equal(new, assignment):
+            break
+        assignment = new
+        members = sparse.csr_matrix(
+            (np.ones(rows, dtype=np.float32), (assignment, np.arange(rows))), shape=(len(centroids), rows)
+        )
+        centroids = np.asarray((members @ matrix).todense())
+        norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        centroids /= norms
+    return assignment, centroids
+
+
+def cluster_themes(
+    commits: Sequence[Dict],
+    issues: Sequence[Dict] = (),
+    max_themes: int = DEFAULT_MAX_THEMES,
+    seed: int = 0,
+) -> List[Theme]:
+    """Group commits and issues into at most ``max_themes`` labelled themes, largest first.
+
+    Items without any informative term are collected in an ``other`` theme.
+    """
+    np, _ = _scientific()
+    documents = [commit_terms(c) for c in commits] + [issue_terms(i) for i in issues]
+    items = list(commits) + list(issues)
+    if not items:
+        return []
+    matrix, vocabulary = tfidf_matrix(documents)
+    k = max(1, min(max_themes, int(math.sqrt(len(items) / 2)) or 1))
+    if not vocabulary:
+        return [Theme('other', [], [], list(commits), list(issues))]
+    assignment, centroids = spherical_kmeans(matrix, k, seed)
+    empty = matrix.getnnz(axis=1) == 0
+
+    groups: Dict[int, List[int]] = {}
+    for row, cluster in enumerate(assignment):
+        groups.setdefault(-1 if empty[row] else int(cluster), []).append(row)
+
+    themes = []
+    commit_count = len(commits)
+    for cluster, members in groups.items():
+        if cluster == -1:
+            terms, paths, label = [], [], 'other'
+        else:
+            order = np.argsort(-centroids[cluster])
+            words = [vocabulary[i] for i in order[:20] if centroids[cluster][i] > 0]
+            terms = [w for w in words if not w.startswith(PATH_PREFIX)][:4]
+            path_counts = Counter(
+                term[len(PATH_PREFIX):] for row in members for term in documents[row]
+                if term.startswith(PATH_PREFIX)
+            )
+            paths = [p for p, _ in path_counts.most_common(2)]
+            label = ', '.join(terms[:3]) or (paths[0] if paths else 'other')
+        themes.append(Theme(
+            label, terms, paths,
+            [items[row] for row in members if row < commit_count],
+            [items[row] for row in members if row >= commit_count],
+        ))
+    themes.sort(key=lambda t: (t.label == 'other', -(len(t.commits) + len(t.issues))))
+    return themes
+
+
+def theme_lookup(themes: Sequence[Theme]) -> Dict[int, str]:
+    """Map ``id(item)`` to its theme label for every commit and issue in ``themes``."""
+    return {id(item): theme.label for theme in themes for item in theme.commits + theme.issues}
+
+
+def describe_themes(themes: Sequence[Theme]) -> List[Dict]:
+    return [
+        {'label': t.label, 'terms': t.terms, 'paths': t.paths,
+         'commits': len(t.commits), 'issues': len(t.issues)}
+        for t in themes
+    ]
+
+
+def theme_heading(theme: Optional[Theme], label: str, commits: int, issues: int) -> str:
+    """Heading line introducing one theme's records in the prompt."""
+    where = f" (paths: {', '.join(theme.paths)})" if theme is not None and theme.paths else ''
+    counts = ', '.join(part for part in (
+        f'{commits} commits' if commits else '', f'{issues} issues' if issues else ''
+    ) if part)
+    return f'Theme "{label}"{where} - {counts}:'
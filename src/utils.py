@@ -49,3 +49,9 @@ def load_config(path='config.yaml'):
 
 def env(key, default=None):
     return os.getenv(key, default)
+
+def cache_dir(name):
+    """Directory for on-disk caches, created on demand (RELEASE_NOTES_CACHE_DIR overrides .cache)."""
+    path = Path(os.getenv('RELEASE_NOTES_CACHE_DIR', '.cache')) / name
+    path.mkdir(parents=True, exist_ok=True)
+    return path
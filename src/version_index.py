@@ -0,0 +1,275 @@
+"""SemVer-aware index over repository tags, built from a single listing."""
+import re
+import subprocess
+import time
+from functools import total_ordering
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import requests
+
+
+SEMVER_RE = re.compile(
+    r'^(?P<prefix>[vV]?)(?P<major>\d+)\.(?P<minor>\d+)(?:\.(?P<patch>\d+))?'
+    r'(?:-(?P<pre>[0-9A-Za-z.-]+))?(?:\+(?P<build>[0-9A-Za-z.-]+))?$'
+)
+
+# Conventional-commit types that force a bump level
+MAJOR_TYPES = {'breaking'}
+MINOR_TYPES = {'feature', 'feat'}
+
+# How long a built index is reused before the tags are listed again
+INDEX_TTL_SECONDS = 300
+
+
+@total_ordering
+class SemVer:
+    """Parsed semantic version with SemVer 2.0 precedence rules."""
+
+    __slots__ = ('prefix', 'major', 'minor', 'patch', 'prerelease', 'build')
+
+    def __init__(self, major: int, minor: int, patch: int, prerelease: Tuple[str, ...] = (),
+                 build: str = '', prefix: str = 'v'):
+        self.prefix = prefix
+        self.major = major
+        self.minor = minor
+        self.patch = patch
+        self.prerelease = prerelease
+        self.build = build
+
+    @classmethod
+    def parse(cls, tag: str) -> Optional['SemVer']:
+        """Parse a tag such as ``v1.2.3-rc.1``; returns None for non-SemVer tags."""
+        match = SEMVER_RE.match(tag.strip())
+        if not match:
+            return None
+        pre = match.group('pre')
+        return cls(
+            int(match.group('major')),
+            int(match.group('minor')),
+            int(match.group('patch') or 0),
+            tuple(pre.split('.')) if pre else (),
+            match.group('build') or '',
+            match.group('prefix'),
+        )
+
+    @property
+    def is_prerelease(self) -> bool:
+        return bool(self.prerelease)
+
+    def sort_key(self) -> tuple:
+        # A release sorts after all of its prereleases; numeric identifiers sort
+        # numerically and before alphanumeric ones. Build metadata is ignored.
+        if not self.prerelease:
+            pre_key: tuple = (1,)
+        else:
+            pre_key = (0, tuple(
+                (0, int(part), '') if part.isdigit() else (1, 0, part)
+                for part in self.prerelease
+            ))
+        return (self.major, self.minor, self.patch, pre_key)
+
+    def bump(self, level: str) -> 'SemVer':
+        """Return the next release version for ``major``, ``minor`` or ``patch``."""
+        if level == 'major':
+            return SemVer(self.major + 1, 0, 0, prefix=self.prefix)
+        if level == 'minor':
+            return SemVer(self.major, self.minor + 1, 0, prefix=self.prefix)
+        if self.prerelease:
+            # 1.2.3-rc.1 is released as 1.2.3
+            return SemVer(self.major, self.minor, self.patch, prefix=self.prefix)
+        return SemVer(self.major, self.minor, self.patch + 1, prefix=self.prefix)
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, SemVer):
+            return NotImplemented
+        return self.sort_key() == other.sort_key()
+
+    def __lt__(self, other) -> bool:
+        if not isinstance(other, SemVer):
+            return NotImplemented
+        return self.sort_key() < other.sort_key()
+
+    def __hash__(self) -> int:
+        return hash(self.sort_key())
+
+    def __str__(self) -> str:
+        version = f'{self.prefix}{self.major}.{self.minor}.{self.patch}'
+        if self.prerelease:
+            version += '-' + '.'.join(self.prerelease)
+        if self.build:
+            version += '+' + self.build
+        return version
+
+    def __repr__(self) -> str:
+        return f'SemVer({str(self)!r})'
+
+
+def bump_level(commit_types: Iterable) -> str:
+    """Derive the bump level from commit types or classified commit dicts."""
+    level = 'patch'
+    for item in commit_types:
+        if isinstance(item, dict):
+            if item.get('breaking'):
+                return 'major'
+            kind = item.get('type', '')
+        else:
+            kind = item
+        if kind in MAJOR_TYPES:
+            return 'major'
+        if kind in MINOR_TYPES:
+            level = 'minor'
+    return level
+
+
+class TagIndex:
+    """Tags ordered by SemVer precedence, newest first.
+
+    Each entry is a dict with ``tag`` plus whatever the source provides
+    (``sha``, ``date``). Tags that are not SemVer are kept in ``other_tags``
+    in listing order and are never used for ordering queries.
+    """
+
+    def __init__(self, entries: Iterable[Dict]):
+        parsed = []
+        self.other_tags: List[Dict] = []
+        for entry in entries:
+            version = SemVer.parse(entry['tag'])
+            if version is None:
+                self.other_tags.append(entry)
+            else:
+                parsed.append((version, entry))
+        parsed.sort(key=lambda item: item[0].sort_key(), reverse=True)
+        self._versions = [version for version, _ in parsed]
+        self.entries: List[Dict] = [entry for _, entry in parsed]
+        self._by_tag = {entry['tag']: i for i, entry in enumerate(self.entries)}
+
+    @classmethod
+    def from_tags(cls, tags: Iterable[str]) -> 'TagIndex':
+        return cls({'tag': tag} for tag in tags if tag and tag.strip())
+
+    @classmethod
+    def from_local(cls, path: str = '.') -> 'TagIndex':
+        """Build the index from one ``git for-each-ref`` call."""
+        out = subprocess.check_output(
+            ['git', '-C', path, 'for-each-ref',
+             '--format=%(refname:short)%09%(objectname)%09%(*objectname)%09%(creatordate:iso)',
+             'refs/tags'],
+            text=True, stderr=subprocess.DEVNULL
+        )
+        entries = []
+        for line in out.splitlines():
+            parts = line.split('\t')
+            if len(parts) != 4 or not parts[0]:
+                continue
+            tag, sha, peeled, date = parts
+            # Annotated tags point at a tag object; the peeled sha is the commit
+            entries.append({'tag': tag, 'sha': peeled or sha, 'date': date})
+        return cls(entries)
+
+    @classmethod
+    def from_github(cls, repo: str, token: Optional[str] = None) -> 'TagIndex':
+        """Build the index from the paginated GitHub tags listing."""
+        headers = {'Accept': 'application/vnd.github.v3+json'}
+        if token:
+            headers['Authorization'] = f'token {token}'
+
+        url = f'https://api.github.com/repos/{repo}/tags'
+        params = {'per_page': 100}
+        entries = []
+        while url:
+            r = requests.get(url, headers=headers, params=params, timeout=30)
+            r.raise_for_status()
+            for tag in r.json():
+                entries.append({'tag': tag['name'], 'sha': tag.get('commit', {}).get('sha', '')})
+            if 'next' in r.links:
+                url = r.links['next']['url']
+                params = {}  # Params already in URL
+            else:
+                url = None
+        return cls(entries)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, tag: str) -> bool:
+        return tag in self._by_tag
+
+    def tags(self, include_prerelease: bool = True) -> List[str]:
+        return [
+            entry['tag'] for version, entry in zip(self._versions, self.entries)
+            if include_prerelease or not version.is_prerelease
+        ]
+
+    def latest(self, include_prerelease: bool = False) -> Optional[str]:
+        tags = self.tags(include_prerelease)
+        return tags[0] if tags else None
+
+    def _position_below(self, tag: str) -> int:
+        """Index of the first entry strictly older than ``tag``."""
+        if tag in self._by_tag:
+            return self._by_tag[tag] + 1
+        version = SemVer.parse(tag)
+        if version is None:
+            raise ValueError(f"Not a semantic version: {tag}")
+        key = version.sort_key()
+        # Entries are sorted descending, so bisect on the reversed key manually
+        lo, hi = 0, len(self._versions)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._versions[mid].sort_key() >= key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def previous(self, tag: str, include_prerelease: bool = False) -> Optional[str]:
+        """Tag that precedes ``tag``; works for tags that do not exist yet."""
+        for i in range(self._position_below(tag), len(self.entries)):
+            if include_prerelease or not self._versions[i].is_prerelease:
+                return self.entries[i]['tag']
+        return None
+
+    def between(self, start: str, end: str, include_prerelease: bool = True) -> List[str]:
+        """Tags newer than ``start`` up to and including ``end``, oldest first."""
+        newer_than_start = self._by_tag.get(start, self._position_below(start))
+        first_at_or_below_end = self._by_tag.get(end, self._position_below(end))
+        return [
+            self.entries[i]['tag'] for i in range(newer_than_start - 1, first_at_or_below_end - 1, -1)
+            if include_prerelease or not self._versions[i].is_prerelease
+        ]
+
+    def suggest_next(self, commit_types: Optional[Iterable] = None, level: Optional[str] = None) -> str:
+        """Suggest the next version from the latest release and the commit types."""
+        latest = next((v for v in self._versions if not v.is_prerelease), None)
+        if latest is None and self._versions:
+            latest = self._versions[0]
+        if latest is None:
+            return 'v1.0.0'
+        level = level or bump_level(commit_types or [])
+        if level == 'major' and latest.major == 0:
+            # Pre-1.0 projects signal breaking changes with a minor bump
+            level = 'minor'
+        return str(latest.bump(level))
+
+    def suggestions(self) -> Dict[str, str]:
+        return {level: self.suggest_next(level=level) for level in ('patch', 'minor', 'major')}
+
+
+_index_cache: Dict[Tuple[str, str], Tuple[float, TagIndex]] = {}
+
+
+def get_tag_index(repo: Optional[str] = None, token: Optional[str] = None, path: str = '.',
+                  refresh: bool = False) -> TagIndex:
+    """Return a cached index from GitHub when ``repo`` is given, else from local git."""
+    key = ('github', repo) if repo else ('local', path)
+    cached = _index_cache.get(key)
+    if cached and not refresh and time.monotonic() - cached[0] < INDEX_TTL_SECONDS:
+        return cached[1]
+
+    index = TagIndex.from_github(repo, token) if repo else TagIndex.from_local(path)
+    _index_cache[key] = (time.monotonic(), index)
+    return index
+
+
+def clear_tag_index_cache() -> None:
+    _index_cache.clear()
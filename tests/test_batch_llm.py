@@ -0,0 +1,121 @@
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+import src.llm_cache
+from src.batch_llm import AnthropicBatchClient, load_manifest
+from src.llm_service import LLMService
+
+
+class BatchServer(BaseHTTPRequestHandler):
+    """Stand-in for the OpenAI and Anthropic batch endpoints; batches end on the second status check."""
+
+    batches = {}
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, payload, jsonl=False):
+        body = ('\n'.join(json.dumps(p) for p in payload) if jsonl else json.dumps(payload)).encode()
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length'])).decode()
+        if self.path == '/files':
+            lines = [json.loads(line) for line in body.splitlines() if line.startswith('{"custom_id"')]
+            self.batches['file-1'] = lines
+            self._send({'id': 'file-1'})
+        elif self.path == '/batches':
+            self.batches['batch-1'] = {'file': json.loads(body)['input_file_id'], 'checks': 0}
+            self._send({'id': 'batch-1', 'status': 'validating'})
+        elif self.path == '/messages/batches':
+            self.batches['msgbatch-1'] = {'requests': json.loads(body)['requests'], 'checks': 0}
+            self._send({'id': 'msgbatch-1', 'processing_status': 'in_progress'})
+
+    def do_GET(self):
+        base = f'http://127.0.0.1:{self.server.server_port}'
+        if self.path == '/batches/batch-1':
+            batch = self.batches['batch-1']
+            batch['checks'] += 1
+            done = batch['checks'] > 1
+            self._send({'id': 'batch-1', 'status': 'completed' if done else 'in_progress',
+                        'output_file_id': 'out-1' if done else None,
+                        'request_counts': {'total': 2, 'completed': 2 if done else 0, 'failed': 0}})
+        elif self.path == '/files/out-1/content':
+            self._send([{
+                'custom_id': r['custom_id'],
+                'response': {'status_code': 200, 'body': {
+                    'choices': [{'message': {'content': f"## Highlights\n- Notes for {r['custom_id']}"},
+                                 'finish_reason': 'stop'}],
+                    'usage': {'prompt_tokens': 100, 'completion_tokens': 20,
+                              'prompt_tokens_details': {'cached_tokens': 64}}}},
+            } for r in self.batches['file-1']], jsonl=True)
+        elif self.path == '/messages/batches/msgbatch-1':
+            self._send({'id': 'msgbatch-1', 'processing_status': 'ended', 'results_url': f'{base}/results',
+                        'request_counts': {'succeeded': 1, 'errored': 1}})
+        elif self.path == '/results':
+            ok, bad = self.batches['msgbatch-1']['requests']
+            self._send([
+                {'custom_id': ok['custom_id'], 'result': {'type': 'succeeded', 'message': {
+                    'content': [{'type': 'text', 'text': 'Notes'}], 'stop_reason': 'end_turn',
+                    'usage': {'input_tokens': 10, 'cache_read_input_tokens': 90, 'output_tokens': 5}}}},
+                {'custom_id': bad['custom_id'], 'result': {'type': 'errored', 'error': {
+                    'type': 'error', 'error': {'type': 'invalid_request_error', 'message': 'prompt too long'}}}},
+            ], jsonl=True)
+
+
+@pytest.fixture
+def server():
+    server = HTTPServer(('127.0.0.1', 0), BatchServer)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{server.server_port}'
+    server.shutdown()
+
+
+def test_openai_batch_round_trip_maps_results_to_versions(server, tmp_path, monkeypatch):
+    monkeypatch.setenv('RELEASE_NOTES_CACHE_DIR', str(tmp_path))
+    monkeypatch.setenv('OPENAI_API_KEY', 'test-key')
+    monkeypatch.setattr(src.llm_cache, '_cache', None)
+    service = LLMService({'llm': {'model': 'gpt-4o-mini', 'dedup_threshold': 0,
+                                  'batch': {'base_urls': {'openai': server}, 'poll_interval': 0.01}}})
+    commits = [{'sha': 'a1', 'message': 'feat: add export', 'author': 'dev'}]
+    jobs = [service.prepare_batch_job(v, commits, []) for v in ('v1.0.0', 'v1.1.0')]
+
+    async def run():
+        manifest = await service.submit_batch(jobs)
+        return manifest, await service.collect_batch(load_manifest(manifest['batch_id']))
+
+    manifest, results = asyncio.run(run())
+    assert manifest['batch_id'] == 'batch-1'
+    assert [line['body']['model'] for line in BatchServer.batches['file-1']] == ['gpt-4o-mini'] * 2
+    assert results['v1.1.0:users']['raw_output'].endswith('Notes for v1.1.0:users')
+    assert results['v1.0.0:users']['metadata']['usage']['cached_tokens'] == 64
+    assert results['v1.0.0:users']['metadata']['mode'] == 'batch'
+
+    # Batch answers are cached under the synchronous key, so a later call does not hit the provider
+    async def unreachable(*args):
+        raise AssertionError('provider called')
+
+    service.providers['openai'] = unreachable
+    prompt = service._build_prompt_parts('v1.0.0', commits, [], 'users', model='gpt-4o-mini')
+    assert asyncio.run(service.call_llm(prompt, 'gpt-4o-mini')).endswith('Notes for v1.0.0:users')
+
+
+def test_anthropic_batch_reports_errored_requests(server):
+    client = AnthropicBatchClient('test-key', server)
+    batch_id = client.submit([{'custom_id': 'v1:users', 'body': {}}, {'custom_id': 'v2:users', 'body': {}}])
+    results = client.results(client.status(batch_id))
+    assert results['v1:users']['usage'] == {'input_tokens': 100, 'cached_tokens': 90, 'output_tokens': 5}
+    assert results['v2:users'] == {'error': 'prompt too long'}
+
+
+def test_providers_without_batch_api_are_rejected():
+    service = LLMService({'llm': {}})
+    with pytest.raises(ValueError, match='no batch API'):
+        asyncio.run(service.submit_batch([], model='minimax/minimax-m2:free'))
@@ -0,0 +1,89 @@
+from src.changelog import ChangelogIndex
+
+CHANGELOG = """# Changelog
+
+## [Unreleased]
+- Work in progress
+
+## [1.2.0] - 2024-03-01
+### Added
+- Feature B
+
+## v1.1.0
+- Fix A
+
+# 1.0
+- First release
+"""
+
+
+def test_index_and_sections(tmp_path):
+    path = tmp_path / 'CHANGELOG.md'
+    path.write_text(CHANGELOG, encoding='utf-8')
+    index = ChangelogIndex(str(path))
+
+    assert index.versions() == ['1.2.0', 'v1.1.0', '1.0']
+    assert index.section('1.2.0') == '### Added\n- Feature B\n\n'
+    assert index.section('v1.2.0', limit=9) == '### Added'
+    assert index.section('1.1.0') == '- Fix A\n\n'
+    assert index.section('9.9.9') is None
+
+    releases = index.releases(count=2, current_version='v1.2.0')
+    assert [r['version'] for r in releases] == ['v1.1.0', '1.0']
+    assert releases[1]['body'] == '- First release\n'
+    index.close()
+
+
+def test_prepend_keeps_index_consistent(tmp_path):
+    path = tmp_path / 'CHANGELOG.md'
+    path.write_text(CHANGELOG, encoding='utf-8')
+    index = ChangelogIndex(str(path))
+    index.versions()
+
+    index.prepend('1.3.0', '- Feature C', release_date='2024-04-01')
+
+    assert index.versions() == ['1.3.0', '1.2.0', 'v1.1.0', '1.0']
+    assert index.section('1.3.0') == '\n- Feature C\n\n'
+    assert index.section('1.2.0') == '### Added\n- Feature B\n\n'
+    content = path.read_text(encoding='utf-8')
+    assert content.index('## [1.3.0] - 2024-04-01') > content.index('[Unreleased]')
+    assert content.index('## [1.3.0]') < content.index('## [1.2.0]')
+
+    rescanned = ChangelogIndex(str(path))
+    assert rescanned.versions() == index.versions()
+    assert all(rescanned.span(v) == index.span(v) for v in index.versions())
+    rescanned.close()
+    index.close()
+
+
+def test_prepend_creates_missing_file(tmp_path):
+    path = tmp_path / 'CHANGELOG.md'
+    index = ChangelogIndex(str(path))
+    assert index.versions() == []
+
+    index.prepend('v0.1.0', '- Initial', release_date='2024-01-01')
+    assert index.versions() == ['v0.1.0']
+    assert index.section('v0.1.0') == '\n- Initial\n\n'
+    index.close()
+
+
+def test_prepend_replaces_an_existing_version(tmp_path):
+    path = tmp_path / 'CHANGELOG.md'
+    path.write_text(CHANGELOG, encoding='utf-8')
+    index = ChangelogIndex(str(path))
+
+    index.prepend('1.2.0', '- Feature B, reworded', release_date='2024-03-02')
+    index.prepend('v1.1.0', '- Fix A\n- Fix A2', release_date='2024-02-01')
+
+    content = path.read_text(encoding='utf-8')
+    assert content.count('1.2.0') == 1 and '## [1.2.0] - 2024-03-02' in content
+    assert index.versions() == ['1.2.0', 'v1.1.0', '1.0']
+    assert index.section('1.2.0') == '\n- Feature B, reworded\n\n'
+    assert index.section('v1.1.0') == '\n- Fix A\n- Fix A2\n\n'
+    assert index.section('1.0') == '- First release\n'
+
+    rescanned = ChangelogIndex(str(path))
+    assert rescanned.versions() == index.versions()
+    assert all(rescanned.span(v) == index.span(v) for v in index.versions())
+    rescanned.close()
+    index.close()
@@ -1,4 +1,4 @@
-from scripts.classify_change import classify_commit
+from scripts.classify_change import classify_commit, classify_commits, classify_subjects, parse_conventional
 
 def test_feature():
     assert classify_commit('feat: add new API') == 'feature'
@@ -14,5 +14,35 @@ def test_docs():
 def test_refactor():
     assert classify_commit('refactor: cleanup code') == 'refactor'
 
+def test_chore():
+    assert classify_commit('chore: bump deps') == 'chore'
+    assert classify_commit('Bump requests from 2.31 to 2.32') == 'chore'
+
 def test_unknown():
-    assert classify_commit('chore: bump deps') == 'unknown'
+    assert classify_commit('Initial commit') == 'unknown'
+
+def test_keyword_priority():
+    assert classify_commit('Cleanup docs and fix typo') == 'bug'
+    assert classify_commit('address review comments') == 'unknown'
+
+def test_parse_conventional():
+    assert parse_conventional('feat(api)!: drop v1 endpoints') == {
+        'type': 'feat', 'scope': 'api', 'breaking': True, 'description': 'drop v1 endpoints'
+    }
+    assert parse_conventional('Update README') is None
+
+def test_batch_classification():
+    results = classify_subjects(['feat(ui): dark mode', 'perf: faster index', 'random words'])
+    assert [r.type for r in results] == ['feature', 'refactor', 'unknown']
+    assert results[0].scope == 'ui' and results[0].conventional
+
+def test_classify_commits_breaking_trailer():
+    commits = [
+        {'subject': 'fix(parser): reject empty tags', 'body': 'BREAKING CHANGE: empty tags now raise'},
+        {'subject': 'feat!: new config format'},
+        {'subject': 'docs: typo'},
+    ]
+    classify_commits(commits)
+    assert [c['type'] for c in commits] == ['bug', 'feature', 'docs']
+    assert [c['breaking'] for c in commits] == [True, True, False]
+    assert commits[0]['scope'] == 'parser'
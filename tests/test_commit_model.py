@@ -0,0 +1,33 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from scripts.classify_change import classify_commits
+from scripts.commit_model import HashedNaiveBayes, weak_labels
+
+HISTORY = [
+    'feat: add dark mode toggle', 'feat(ui): add export button', 'feat: support new config keys',
+    'fix: crash when token missing', 'fix(api): handle empty response', 'fix: wrong date in header',
+    'docs: explain setup steps', 'docs: document the publish flow', 'docs(readme): update install guide',
+]
+
+
+def test_weak_labels_strip_prefix():
+    subjects, labels = weak_labels([{'subject': s} for s in HISTORY + ['random words']])
+    assert subjects[0] == 'add dark mode toggle'
+    assert labels.count('feature') == 3 and len(labels) == 9
+
+
+def test_fit_predict_and_roundtrip(tmp_path):
+    model = HashedNaiveBayes(n_features=2 ** 12).fit(*weak_labels([{'subject': s} for s in HISTORY]))
+    predictions = model.predict(['Crash when response is empty', 'Update the setup guide', 'Add a new toggle'])
+    assert [label for label, _ in predictions] == ['bug', 'docs', 'feature']
+
+    path = tmp_path / 'model.npz'
+    model.save(str(path))
+    loaded = HashedNaiveBayes.load(str(path))
+    assert np.allclose(loaded.predict_log_proba(['handle crash']), model.predict_log_proba(['handle crash']))
+
+    commits = [{'subject': 'Crash when response is empty'}, {'subject': 'fix: typo'}]
+    classify_commits(commits, model=loaded)
+    assert [c['type'] for c in commits] == ['bug', 'bug']
@@ -0,0 +1,45 @@
+import asyncio
+
+import src.data_ingestion
+from src.data_ingestion import DataIngestionService
+
+
+def test_previous_releases_skip_drafts_across_pages(monkeypatch):
+    pages = {
+        '/releases': [{'tag_name': 'v2.0.0'}, {'tag_name': 'v1.9.0-draft', 'draft': True},
+                      {'tag_name': 'v1.9.0', 'draft': True}, {'tag_name': 'v1.8.0'},
+                      {'tag_name': 'v1.8.0-rc', 'draft': True}, {'tag_name': 'v1.7.0', 'body': 'x' * 1000}],
+        '/releases?page=2': [{'tag_name': 'v1.6.0'}, {'tag_name': 'v1.5.0'}],
+        '/releases?page=3': [{'tag_name': 'v1.4.0'}],
+    }
+    requested = []
+
+    class Response:
+        def __init__(self, url):
+            self.data = pages[url]
+            following = f'/releases?page={int(url.partition("=")[2] or 1) + 1}'
+            self.links = {'next': {'url': following}} if following in pages else {}
+
+        def raise_for_status(self):
+            pass
+
+        def json(self):
+            return self.data
+
+    def get(url, headers=None, params=None):
+        url = url.replace('https://api.github.com/repos/o/r', '')
+        requested.append((url, params))
+        return Response(url)
+
+    monkeypatch.setattr(src.data_ingestion.requests, 'get', get)
+    monkeypatch.setattr(DataIngestionService, '_release_context_cache', {})
+    monkeypatch.setattr(DataIngestionService, '_get_github_token', lambda self: 'token')
+    service = DataIngestionService({'repo': 'o/r'})
+
+    releases = asyncio.run(service._fetch_github_releases(None, 3, 'v2.0.0'))
+    assert [r['version'] for r in releases] == ['v1.8.0', 'v1.7.0', 'v1.6.0']
+    assert len(releases[1]['body']) == src.data_ingestion.RELEASE_CONTEXT_CHARS
+    # Pages are followed by their next links and the last one is never requested
+    assert requested == [('/releases', {'per_page': 6}), ('/releases?page=2', {})]
+    assert asyncio.run(service._fetch_github_releases(None, 3, 'v2.0.0')) == releases
+    assert len(requested) == 2
@@ -0,0 +1,48 @@
+from src.dedup import _signatures_python, cluster_subjects, collapse_duplicates, shingles, signatures
+
+
+def test_near_duplicates_cluster_and_distinct_fixes_do_not():
+    subjects = ['fix lint', 'fix lint again', 'Fix lint (#123)', 'address review', 'address review comments',
+                'fix bug in parser', 'fix bug in lexer', 'bump deps to 1.2.3', 'bump deps to 1.2.4']
+    clusters = cluster_subjects(subjects)
+    assert clusters[:3] == [0, 0, 0]
+    assert clusters[3] == clusters[4] == 3
+    assert clusters[5] != clusters[6]
+    assert clusters[7] == clusters[8] == 7
+
+
+def test_default_threshold_keeps_distinct_features_apart():
+    commits = [
+        {'subject': 'Add export button to settings page', 'type': 'feature'},
+        {'subject': 'Add import button to settings page', 'type': 'feature'},
+        {'subject': 'Add export button to settings page (#42)', 'type': 'feature'},
+    ]
+    result = collapse_duplicates(commits)
+    assert [c['subject'] for c in result] == [commits[0]['subject'], commits[1]['subject']]
+    assert result[0]['count'] == 2
+
+
+def test_numpy_and_python_signatures_agree():
+    sets = [shingles(s) for s in ['fix lint', 'add dark mode support', '']]
+    assert [tuple(row) for row in signatures(sets)] == _signatures_python(sets)
+
+
+def test_collapse_keeps_order_counts_and_breaking_changes():
+    commits = [
+        {'subject': 'fix lint', 'type': 'bug'},
+        {'subject': 'feat: new api', 'type': 'feature'},
+        {'subject': 'fix lint again', 'type': 'bug'},
+        {'subject': 'fix lint', 'type': 'bug', 'breaking': True},
+        {'subject': 'fix lint', 'type': 'chore'},
+    ]
+    result = collapse_duplicates(commits)
+    assert [c['subject'] for c in result] == ['fix lint', 'feat: new api', 'fix lint', 'fix lint']
+    assert result[0]['count'] == 2 and 'count' not in commits[0]
+    assert 'count' not in result[2] and result[2]['breaking']
+    assert collapse_duplicates(commits, threshold=0) == commits
+
+
+def test_scales_linearly_on_repeated_subjects():
+    commits = [{'subject': f'address review comments round {i}', 'type': 'chore'} for i in range(100000)]
+    result = collapse_duplicates(commits)
+    assert len(result) == 1 and result[0]['count'] == 100000
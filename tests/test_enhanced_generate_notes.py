@@ -0,0 +1,26 @@
+import asyncio
+
+import src.enhanced_generate_notes as generate
+from src.llm_service import LLMService
+
+
+def test_failed_generation_keeps_previous_notes(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    async def ingest(**kwargs):
+        return {'commits': [], 'issues': [], 'previous_releases': []}
+
+    async def fail(self, **kwargs):
+        kwargs['on_token']('users', '## Highl')
+        raise ValueError('provider down')
+
+    monkeypatch.setattr(generate, 'ingest_all_data', ingest)
+    monkeypatch.setattr(LLMService, 'generate_for_audiences', fail)
+    path = generate.release_output_path('v1.0')
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text('# Release v1.0\n', encoding='utf-8')
+
+    result = asyncio.run(generate.generate_enhanced_release_notes(version='v1.0', repo='o/r'))
+    assert result['status'] == 'error'
+    assert path.read_text(encoding='utf-8') == '# Release v1.0\n'
+    assert list(path.parent.iterdir()) == [path]
@@ -0,0 +1,53 @@
+import subprocess
+
+import pytest
+
+from scripts.classify_change import classify_commits
+from scripts.extract_commits import extract_commits_local, load_commit_bodies
+
+
+@pytest.fixture
+def repo(tmp_path):
+    def git(*args):
+        subprocess.run(['git', '-C', str(tmp_path), *args], check=True, capture_output=True)
+
+    git('init', '-q')
+    git('config', 'user.email', 'dev@example.com')
+    git('config', 'user.name', 'Dev')
+    for message in ['Add export\n\nFirst line of the body.\nSecond line.\n\nThird paragraph.',
+                    'Rework settings storage\n\nBREAKING CHANGE: settings move to settings.toml',
+                    'Fix typo']:
+        git('commit', '-q', '--allow-empty', '-m', message)
+    return str(tmp_path)
+
+
+def test_breaking_trailer_is_classified_without_bodies(repo):
+    commits = extract_commits_local(repo)
+    assert all('body' not in c for c in commits)
+    classify_commits(commits)
+    assert [c['breaking'] for c in commits] == [False, True, False]
+    assert all('breaking_trailer' not in c for c in commits)
+
+
+def test_load_commit_bodies_handles_multiline_missing_and_max_chars(repo):
+    commits = extract_commits_local(repo)
+    missing = {'hash': '0' * 40, 'subject': 'gone'}
+    load_commit_bodies([commits[2], missing, commits[1], commits[0]], repo)
+    assert commits[2]['body'] == 'First line of the body.\nSecond line.\n\nThird paragraph.'
+    assert missing['body'] == ''
+    assert commits[1]['body'] == 'BREAKING CHANGE: settings move to settings.toml'
+    assert commits[0]['body'] == ''
+
+    fresh = extract_commits_local(repo)
+    load_commit_bodies(fresh, repo, max_chars=10)
+    assert fresh[2]['body'] == 'First line'
+
+
+def test_developer_prompts_read_bodies_from_the_configured_repo(repo):
+    from src.llm_service import LLMService
+
+    # The working directory is not the repository the commits came from
+    commits = extract_commits_local(repo)
+    service = LLMService({'repo_path': repo, 'llm': {'model': 'gpt-4o'}})
+    prompt = service.build_prompt('1.0.0', commits, [], audience='developers')
+    assert 'settings move to settings.toml' in prompt
@@ -0,0 +1,87 @@
+import scripts.fetch_releases
+from scripts.fetch_releases import fetch_changelog_from_repo, get_previous_release_notes
+
+
+def test_previous_release_notes_page_forward_past_drafts(monkeypatch):
+    tags = [('v3.0', False), ('v2.9', True), ('v2.8', True), ('v2.7', True), ('v2.6', False),
+            ('v2.5', False), ('v2.4', False)]
+    requested = []
+
+    class Page:
+        def __init__(self, number, per_page):
+            self.data = [{'tag_name': tag, 'draft': draft}
+                         for tag, draft in tags[(number - 1) * per_page:number * per_page]]
+            self.links = {'next': {'url': f'page={number + 1}'}} if number * per_page < len(tags) else {}
+
+        def raise_for_status(self):
+            pass
+
+        def json(self):
+            return self.data
+
+    def get(url, headers=None, params=None):
+        requested.append(url)
+        return Page(int(url.partition('page=')[2] or 1), 6)
+
+    monkeypatch.setattr(scripts.fetch_releases.requests, 'get', get)
+    monkeypatch.setattr(scripts.fetch_releases, '_previous_release_cache', {})
+
+    previous = get_previous_release_notes('o/r', 'token', 'v3.0', count=3)
+    assert [r['tag_name'] for r in previous] == ['v2.6', 'v2.5', 'v2.4']
+    # Each page is requested once, following the next link
+    assert requested == ['https://api.github.com/repos/o/r/releases', 'page=2']
+    assert [r['tag_name'] for r in get_previous_release_notes('o/r', 'token', 'v3.0', count=5)] == \
+        ['v2.6', 'v2.5', 'v2.4']  # all there is
+
+
+class Response:
+    def __init__(self, data=None, content=b'', status_code=200):
+        self.data = data
+        self.content = content
+        self.status_code = status_code
+
+    def json(self):
+        return self.data
+
+
+def test_changelog_lookup_prefers_names_in_order_and_caches_blobs(monkeypatch, tmp_path):
+    listing = [
+        {'name': 'HISTORY.md', 'sha': 'h1', 'type': 'file'},
+        {'name': 'CHANGELOG', 'sha': 'c1', 'type': 'file'},
+        {'name': 'CHANGELOG.md', 'sha': 'd1', 'type': 'dir'},
+    ]
+    requested = []
+
+    def get(url, headers=None, params=None):
+        requested.append(url.rsplit('/', 1)[-1] or 'contents')
+        if url.endswith('/contents/'):
+            return Response(listing)
+        return Response(content=b'## [1.0.0]\n- First')
+
+    monkeypatch.setenv('RELEASE_NOTES_CACHE_DIR', str(tmp_path))
+    monkeypatch.setattr(scripts.fetch_releases.requests, 'get', get)
+    monkeypatch.setattr(scripts.fetch_releases, '_changelog_blobs', {})
+
+    assert fetch_changelog_from_repo('o/r', 'token') == '## [1.0.0]\n- First'
+    # A directory named CHANGELOG.md is skipped; CHANGELOG beats HISTORY.md
+    assert requested == ['contents', 'c1']
+    assert (tmp_path / 'changelogs' / 'c1').read_text(encoding='utf-8') == '## [1.0.0]\n- First'
+    assert list((tmp_path / 'changelogs').iterdir()) == [tmp_path / 'changelogs' / 'c1']
+
+    # Same SHA in a new process: served from disk without downloading the blob
+    monkeypatch.setattr(scripts.fetch_releases, '_changelog_blobs', {})
+    assert fetch_changelog_from_repo('o/r', 'token') == '## [1.0.0]\n- First'
+    assert requested == ['contents', 'c1', 'contents']
+
+    # A new SHA means the file changed
+    listing[1]['sha'] = 'c2'
+    fetch_changelog_from_repo('o/r', 'token')
+    assert requested[-2:] == ['contents', 'c2']
+
+
+def test_changelog_lookup_without_candidates(monkeypatch):
+    monkeypatch.setattr(scripts.fetch_releases.requests, 'get',
+                        lambda url, headers=None: Response([{'name': 'README.md', 'sha': 'r', 'type': 'file'}]))
+    assert fetch_changelog_from_repo('o/r', 'token') is None
+    monkeypatch.setattr(scripts.fetch_releases.requests, 'get', lambda url, headers=None: Response(status_code=404))
+    assert fetch_changelog_from_repo('o/r', 'token') is None
@@ -0,0 +1,57 @@
+import asyncio
+import os
+
+import src.llm_cache
+import src.llm_service
+from src.llm_cache import ResponseCache, cache_key
+from src.llm_service import LLMResponse, LLMService, PromptParts
+
+
+def test_key_depends_on_every_request_field():
+    base = cache_key('openai', 'gpt-4', 0.0, 2000, 'a', 'b')
+    assert base == cache_key('openai', 'gpt-4', 0.0, 2000, 'a', 'b')
+    assert len({base, cache_key('openai', 'gpt-4', 0.2, 2000, 'a', 'b'),
+                cache_key('openai', 'gpt-4', 0.0, 1000, 'a', 'b'),
+                cache_key('openai', 'gpt-4', 0.0, 2000, 'ab', '')}) == 4
+
+
+def test_disk_store_survives_restart_and_evicts_least_recently_used(tmp_path):
+    cache = ResponseCache(tmp_path, memory_entries=1, max_bytes=400)
+    for n in range(3):
+        cache.put(f'{n:02d}' * 32, {'text': 'x' * 100})
+        os.utime(cache._path(f'{n:02d}' * 32), (n, n))
+    cache.put('03' * 32, {'text': 'x' * 100})
+
+    reopened = ResponseCache(tmp_path)
+    assert reopened.get('00' * 32) is None
+    assert reopened.get('03' * 32)['text'] == 'x' * 100
+    assert reopened.stats()['bytes'] <= 400
+    stored = reopened.stats()['entries']
+    assert reopened.invalidate() == stored and reopened.stats()['entries'] == 0
+
+
+def test_service_reuses_cached_response_unless_bypassed(tmp_path, monkeypatch):
+    monkeypatch.setattr(src.llm_cache, '_cache', ResponseCache(tmp_path))
+    service = LLMService({'llm': {}})
+    calls = []
+
+    async def fake_openai(parts, model, temperature):
+        calls.append(parts)
+        return LLMResponse(f'notes {len(calls)}', 'stop', {'input_tokens': 10, 'output_tokens': 2})
+
+    service.providers['openai'] = fake_openai
+    prompt = PromptParts('instructions', 'data')
+    assert asyncio.run(service.call_llm(prompt, 'gpt-4')) == 'notes 1'
+    assert asyncio.run(service.call_llm(prompt, 'gpt-4')) == 'notes 1'
+    assert asyncio.run(service.call_llm(prompt, 'gpt-4', 0.7)) == 'notes 2'
+
+    async def with_mode(mode):
+        token = src.llm_service._cache_mode.set(mode)
+        try:
+            return await service.call_llm(prompt, 'gpt-4')
+        finally:
+            src.llm_service._cache_mode.reset(token)
+
+    assert asyncio.run(with_mode('bypass')) == 'notes 3'
+    assert asyncio.run(with_mode('refresh')) == 'notes 4'
+    assert asyncio.run(service.call_llm(prompt, 'gpt-4')) == 'notes 4'
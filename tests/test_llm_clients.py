@@ -0,0 +1,59 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import src.llm_clients
+from src.llm_clients import close_clients, get_async_client, run_async
+from src.llm_service import LLMService, PromptParts
+
+
+def test_clients_are_shared_per_key_and_loop():
+    async def lookup():
+        clients = get_async_client('openai', 'k1'), get_async_client('openai', 'k1'), get_async_client('openai', 'k2')
+        return clients, len(src.llm_clients._clients)
+
+    (first, again, other), count = asyncio.run(lookup())
+    assert first is again and first is not other and count == 2
+    # A new loop gets new clients; those of the closed first loop are dropped
+    (second, _, _), count = asyncio.run(lookup())
+    assert second is not first and count == 2
+
+    async def shutdown():
+        get_async_client('openai', 'k1')
+        return await close_clients()
+
+    assert asyncio.run(shutdown()) == 1
+
+
+def test_run_async_reuses_one_loop_and_its_clients():
+    async def lookup():
+        return get_async_client('openai', 'k3'), asyncio.get_running_loop()
+
+    first, loop = run_async(lookup())
+    second, again = run_async(lookup())
+    assert first is second and loop is again and not loop.is_closed()
+    assert run_async(close_clients()) == 1
+
+
+def test_concurrent_calls_overlap(monkeypatch):
+    async def create(**kwargs):
+        await asyncio.sleep(0.2)
+        message = SimpleNamespace(content='ok')
+        return SimpleNamespace(choices=[SimpleNamespace(message=message, finish_reason='stop')], usage=None)
+
+    fake = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    monkeypatch.setattr(src.llm_clients, '_create', lambda provider, key: fake)
+    monkeypatch.setenv('OPENAI_API_KEY', 'test')
+    service = LLMService({'llm': {'cache': False}})
+
+    async def run():
+        started = time.perf_counter()
+        results = await asyncio.gather(*[
+            service.call_llm(PromptParts('', f'prompt {n}'), 'gpt-4') for n in range(5)
+        ])
+        src.llm_clients._clients.clear()
+        return results, time.perf_counter() - started
+
+    results, elapsed = asyncio.run(run())
+    assert results == ['ok'] * 5
+    assert elapsed < 0.6
@@ -0,0 +1,234 @@
+import asyncio
+
+import pytest
+
+from src.llm_service import LLMResponse, LLMService, PromptParts
+
+
+def test_generation_reports_cached_and_uncached_tokens():
+    service = LLMService({'llm': {'model': 'template-basic', 'dedup_threshold': 0}})
+    sent = []
+
+    async def fake_provider(parts, model, temperature):
+        sent.append(parts)
+        return LLMResponse('## Highlights\n- ok', 'stop',
+                           {'input_tokens': 1200, 'cached_tokens': 1024, 'output_tokens': 10})
+
+    service.providers['template'] = fake_provider
+    commits = [{'hash': 'abc1234', 'subject': 'feat: add export', 'type': 'feature', 'author': 'a'}]
+    result = asyncio.run(service.generate_release_notes('1.2.0', commits, [], mode='single'))
+
+    assert isinstance(sent[0], PromptParts)
+    assert '1.2.0' in sent[0].suffix and '1.2.0' not in sent[0].prefix
+    assert 'add export' in sent[0].suffix
+    usage = result['metadata']['usage']
+    assert (usage['cached_tokens'], usage['uncached_tokens'], len(usage['calls'])) == (1024, 176, 1)
+    assert asyncio.run(service.call_llm('plain', 'template-basic')) == '## Highlights\n- ok'
+    assert sent[-1] == PromptParts('', 'plain')
+
+
+def test_stream_local_generate_api(monkeypatch):
+    import json
+    import threading
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+            self.send_response(200)
+            self.end_headers()
+            for word in ['## ', 'Highlights', '\n- fast']:
+                self.wfile.write(json.dumps({'response': word, 'done': False}).encode() + b'\n')
+            self.wfile.write(json.dumps({'done': True, 'done_reason': 'stop', 'prompt_eval_count': len(body['prompt']),
+                                         'eval_count': 3}).encode() + b'\n')
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setenv('LOCAL_LLM_BASE_URL', f'http://127.0.0.1:{server.server_port}')
+    service = LLMService({'llm': {'cache': False}})
+
+    async def collect():
+        return [piece async for piece in service.stream_llm(PromptParts('abc', 'de'), 'mistral')]
+
+    try:
+        assert asyncio.run(collect()) == ['## ', 'Highlights', '\n- fast']
+        seen = []
+        result = asyncio.run(service.generate_release_notes(
+            '1.0', [{'subject': 'fix: x', 'type': 'bug'}], [], model='mistral', mode='single', on_token=seen.append))
+    finally:
+        server.shutdown()
+    assert ''.join(seen) == result['raw_output'] == '## Highlights\n- fast'
+    assert result['metadata']['usage']['output_tokens'] == 3
+
+
+def test_audiences_share_preparation_and_run_concurrently(monkeypatch):
+    import time
+
+    import src.llm_service
+
+    prepared = []
+    monkeypatch.setattr(src.llm_service, 'collapse_duplicates',
+                        lambda commits, threshold: prepared.append(1) or commits)
+    service = LLMService({'llm': {'model': 'template-basic', 'cache': False}})
+
+    async def slow_provider(parts, model, temperature):
+        await asyncio.sleep(0.2)
+        return LLMResponse(parts.prefix)
+
+    service.providers['template'] = slow_provider
+    commits = [{'hash': 'abc1234', 'subject': 'feat: add export', 'type': 'feature', 'author': 'a'}]
+    started = time.perf_counter()
+    results = asyncio.run(service.generate_for_audiences(
+        '1.2.0', commits, [], ['users', 'developers', 'managers'], mode='single'))
+
+    assert time.perf_counter() - started < 0.5
+    assert prepared == [1]
+    assert list(results) == ['users', 'developers', 'managers']
+    assert all(results[a]['metadata']['audience'] == a and a in results[a]['raw_output'] for a in results)
+
+
+def test_failing_audience_cancels_the_others_before_raising():
+    service = LLMService({'llm': {'model': 'template-basic', 'cache': False}})
+    cancelled = []
+
+    async def provider(parts, model, temperature):
+        if 'developers' in parts.prefix:
+            await asyncio.sleep(0.05)
+            raise ValueError('bad request')
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(parts.prefix)
+            raise
+        return LLMResponse('late')
+
+    service.providers['template'] = provider
+    commits = [{'hash': 'abc1234', 'subject': 'feat: add export', 'type': 'feature', 'author': 'a'}]
+
+    async def run():
+        with pytest.raises(ValueError, match='bad request'):
+            await service.generate_for_audiences('1.2.0', commits, [], ['users', 'developers'], mode='single')
+        # Already stopped when the error arrives, not only when the loop shuts down
+        return list(cancelled)
+
+    assert len(asyncio.run(run())) == 1
+
+
+def test_hedged_stream_falls_back_when_primary_stalls_or_fails():
+    service = LLMService({'llm': {'cache': False, 'hedge_after_seconds': 0.05,
+                                  'fallback_models': ['ollama/llama3', 'template-basic']}})
+    cancelled = []
+
+    async def stalled(parts, model, temperature, response):
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(model)
+            raise
+        yield 'late'
+
+    async def broken(parts, model, temperature, response):
+        raise ValueError('connection refused')
+        yield
+
+    service.stream_providers['openrouter'] = stalled
+    service.stream_providers['ollama'] = broken
+
+    async def run():
+        outcome = {}
+        text = ''.join([p async for p in service.hedged_stream('prompt', 'minimax/m2:free', 0.0, outcome)])
+        return text, outcome
+
+    text, outcome = asyncio.run(run())
+    assert text.startswith('# Release Notes')
+    assert outcome['model'] == 'template-basic'
+    assert outcome['tried'] == ['minimax/m2:free', 'ollama/llama3', 'template-basic']
+    assert outcome['errors'] == ['ollama/llama3: connection refused']
+    assert cancelled == ['minimax/m2:free']
+
+
+def test_structured_generation_uses_json_schema_and_renders_markdown(monkeypatch):
+    import json
+    from types import SimpleNamespace
+
+    import src.llm_service
+
+    notes = {'title': 'Release 1.2.0', 'summary': 'Exports arrive.', 'sections': [
+        {'heading': 'New Features', 'items': [{'text': 'Add CSV export', 'refs': ['abc1234']}]}]}
+    requests = []
+
+    async def create(**kwargs):
+        requests.append(kwargs)
+        message = SimpleNamespace(content=json.dumps(notes))
+        return SimpleNamespace(choices=[SimpleNamespace(message=message, finish_reason='stop')], usage=None)
+
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    monkeypatch.setattr(src.llm_service, 'get_async_client', lambda provider, key: client)
+    monkeypatch.setenv('OPENAI_API_KEY', 'test-key')
+    service = LLMService({'llm': {'model': 'gpt-4o-mini', 'dedup_threshold': 0, 'cache': False}})
+    pieces = []
+    commits = [{'hash': 'abc1234', 'subject': 'feat: add export', 'type': 'feature', 'author': 'a'}]
+    result = asyncio.run(service.generate_release_notes(
+        '1.2.0', commits, [], mode='single', structured=True, on_token=pieces.append))
+
+    assert requests[0]['response_format']['json_schema']['name'] == 'release_notes'
+    assert 'JSON object' in requests[0]['messages'][0]['content']
+    assert result['notes'] == notes
+    assert result['raw_output'].startswith('# Release 1.2.0\n\nExports arrive.\n\n## New Features')
+    assert pieces == [result['raw_output']]
+    assert result['structured'] == {'new_features': '- Add CSV export (abc1234)'}
+
+
+def test_cut_off_response_is_continued_and_joined(monkeypatch):
+    from types import SimpleNamespace
+
+    import src.llm_service
+
+    answers = iter([('## Highlights\n- Add CSV ex', 'length'), ('port\n- Faster sync', 'stop')])
+    requests = []
+
+    async def create(**kwargs):
+        requests.append(kwargs)
+        text, reason = next(answers)
+        usage = SimpleNamespace(prompt_tokens=100, completion_tokens=5, prompt_tokens_details=None)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=text), finish_reason=reason)],
+                               usage=usage)
+
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    monkeypatch.setattr(src.llm_service, 'get_async_client', lambda provider, key: client)
+    monkeypatch.setenv('OPENAI_API_KEY', 'test-key')
+    service = LLMService({'llm': {'cache': False}})
+    response = asyncio.run(service.complete(PromptParts('Write release notes.', 'feat: add export'), 'gpt-4'))
+
+    assert response.text == '## Highlights\n- Add CSV export\n- Faster sync'
+    assert response.finish_reason == 'stop'
+    assert response.usage == {'input_tokens': 200, 'cached_tokens': 0, 'output_tokens': 10}
+    assert requests[1]['messages'][2] == {'role': 'assistant', 'content': '## Highlights\n- Add CSV ex'}
+    assert requests[1]['messages'][3]['role'] == 'user'
+    assert requests[1]['max_tokens'] < requests[0]['max_tokens'] <= 8192
+
+
+def test_cut_off_response_is_not_continued_without_room(monkeypatch):
+    from types import SimpleNamespace
+
+    import src.llm_service
+
+    requests = []
+
+    async def create(**kwargs):
+        requests.append(kwargs)
+        message = SimpleNamespace(content='word ' * 3000)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message, finish_reason='length')], usage=None)
+
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    monkeypatch.setattr(src.llm_service, 'get_async_client', lambda provider, key: client)
+    monkeypatch.setenv('OPENAI_API_KEY', 'test-key')
+    service = LLMService({'llm': {'cache': False}})
+    prompt = PromptParts('Write release notes.', 'feat: add export\n' * 1000)
+    response = asyncio.run(service.complete(prompt, 'gpt-4'))
+
+    # The cut-off answer leaves no useful room in gpt-4's 8192-token window
+    assert len(requests) == 1 and response.finish_reason == 'length'
@@ -0,0 +1,29 @@
+from src.map_reduce import batch_texts, partition_changes
+
+
+def test_partition_covers_everything_within_budget():
+    commits = [{'subject': f'c{i}', 'scope': ['api', 'ui', ''][i % 3], 'type': 'bug'} for i in range(90)]
+    issues = [{'title': f'i{i}', 'labels': [{'name': 'Docs'}]} for i in range(10)]
+    chunks = partition_changes(commits, issues, 100, lambda c: 7, lambda i: 5)
+
+    assert all(chunk.tokens <= 100 for chunk in chunks)
+    assert sorted(c['subject'] for chunk in chunks for c in chunk.commits) == sorted(c['subject'] for c in commits)
+    assert sum(len(chunk.issues) for chunk in chunks) == 10
+    for chunk in chunks:
+        assert set(chunk.components) <= {'api', 'ui', 'bug', 'docs'}
+        # Items of one component never leak into another component's chunk
+        assert all((c['scope'] or 'bug') in chunk.components for c in chunk.commits)
+
+
+def test_small_groups_share_a_chunk_and_oversized_items_stand_alone():
+    commits = [{'subject': 'a', 'scope': 'x'}, {'subject': 'b', 'scope': 'y'}, {'subject': 'big', 'scope': 'x'}]
+    cost = lambda c: 500 if c['subject'] == 'big' else 10
+    chunks = partition_changes(commits, [], 100, cost, len)
+
+    assert len(chunks) == 2
+    assert [c['subject'] for c in chunks[0].commits] == ['big']
+    assert sorted(chunks[1].components) == ['x', 'y']
+
+
+def test_batch_texts():
+    assert batch_texts(['aa', 'bb', 'cccc', 'd'], 4, len) == [['aa', 'bb'], ['cccc'], ['d']]
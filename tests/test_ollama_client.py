@@ -0,0 +1,118 @@
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.llm_service import LLMService
+from src.ollama_client import LOAD_TIMEOUT, OllamaClient
+
+
+class OllamaServer(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    received = []
+    connections = set()
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, body: bytes):
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        self.connections.add(self.client_address)
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        self.received.append(body)
+        if 'prompt' not in body:  # warm-up
+            self._send(json.dumps({'model': body['model'], 'done': True, 'done_reason': 'load'}).encode())
+        elif body['stream']:
+            lines = [{'response': 'Hello', 'done': False},
+                     {'response': ' world', 'done': True, 'done_reason': 'stop',
+                      'prompt_eval_count': 7, 'eval_count': 2, 'load_duration': 1_500_000_000}]
+            self._send(b''.join(json.dumps(line).encode() + b'\n' for line in lines))
+        else:
+            self._send(json.dumps({'response': 'Hello', 'done': True, 'done_reason': 'stop',
+                                   'prompt_eval_count': 7, 'eval_count': 1}).encode())
+
+    def do_GET(self):
+        self._send(json.dumps({'models': [{'name': 'llama3:latest', 'size_vram': 123}]}).encode())
+
+
+@pytest.fixture
+def server():
+    OllamaServer.received, OllamaServer.connections = [], set()
+    server = ThreadingHTTPServer(('127.0.0.1', 0), OllamaServer)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{server.server_port}'
+    server.shutdown()
+
+
+def test_warm_up_keeps_model_resident_and_reports_status(server):
+    client = OllamaClient(server, keep_alive='1h')
+    assert client._timeout('llama3')[1] == LOAD_TIMEOUT  # unknown models may still need loading
+    client.warm_in_background(['llama3']).join(5)
+    assert OllamaServer.received == [{'model': 'llama3', 'keep_alive': '1h'}]
+    status = client.status()
+    assert status['reachable'] and status['models']['llama3']['state'] == 'ready'
+    assert status['loaded'][0]['name'] == 'llama3:latest'
+    assert client._timeout('llama3')[1] < LOAD_TIMEOUT
+
+
+def test_service_streams_local_models_over_one_pooled_connection(server, monkeypatch):
+    monkeypatch.setenv('LOCAL_LLM_BASE_URL', server)
+    service = LLMService({'llm': {'cache': False, 'ollama': {'keep_alive': -1}}})
+
+    async def run():
+        pieces = [piece async for piece in service.stream_llm('Summarize', 'ollama/llama3')]
+        response = await service.complete('Summarize', 'ollama/llama3')
+        return pieces, response
+
+    pieces, response = asyncio.run(run())
+    assert pieces == ['Hello', ' world'] and response.text == 'Hello world'
+    assert response.usage['output_tokens'] == 2
+    assert [(body['model'], body['stream']) for body in OllamaServer.received] == [('llama3', True)] * 2
+    assert all(body['keep_alive'] == -1 for body in OllamaServer.received)
+    assert len(OllamaServer.connections) == 1
+    status = service._ollama_client().status()['models']['llama3']
+    assert status['state'] == 'ready' and status['load_seconds'] == 1.5
+
+
+def test_cancelled_stream_releases_its_thread_and_connection(monkeypatch):
+    import time
+
+    release = threading.Event()
+
+    class SlowServer(OllamaServer):
+        def do_POST(self):
+            self.rfile.read(int(self.headers['Content-Length']))
+            self.send_response(200)
+            self.end_headers()
+            self.wfile.write(json.dumps({'response': 'Hel', 'done': False}).encode() + b'\n')
+            self.wfile.flush()
+            release.wait(10)
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), SlowServer)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setenv('LOCAL_LLM_BASE_URL', f'http://127.0.0.1:{server.server_port}')
+    service = LLMService({'llm': {'cache': False}})
+
+    async def run():
+        return [piece async for piece in service.stream_llm('Summarize', 'ollama/slow')]
+
+    started = time.monotonic()
+    try:
+        with pytest.raises(asyncio.TimeoutError):
+            asyncio.run(asyncio.wait_for(run(), 0.5))
+        elapsed = time.monotonic() - started
+    finally:
+        release.set()
+        server.shutdown()
+    assert elapsed < 3
+    for thread in threading.enumerate():
+        if thread.name == 'ollama-stream':
+            thread.join(1)
+            assert not thread.is_alive()
@@ -0,0 +1,72 @@
+import json
+
+from src.prompt_packer import (
+    context_window, count_tokens, join_json, output_limit, pack, render_json, score_commit, score_issue
+)
+
+
+def test_context_window_lookup():
+    assert context_window('gpt-4') == 8192
+    assert context_window('gpt-4o-mini') == 128000
+    assert context_window('unknown-model') == 8192
+    assert context_window('gpt-4', {'llm': {'context_window': 32000}}) == 32000
+
+
+def test_output_limit_fills_the_window_up_to_the_model_cap():
+    assert output_limit('gpt-4o-mini', 1000) == 16384
+    assert output_limit('gpt-4', 5000) == 8192 - 5250
+    assert output_limit('gpt-4o', 1000, {'llm': {'max_output_tokens': 3000}}) == 3000
+
+
+def test_output_limit_never_exceeds_the_room_left_in_the_window():
+    assert output_limit('gpt-4', 7600) == 8192 - 7980
+    assert output_limit('gpt-4', 8000) == 0
+    assert output_limit('gpt-4', 9000) == 0
+
+
+def test_output_limit_for_a_fully_packed_large_window_prompt():
+    # What the packer fills: the template plus 95% of the window left after it and the reserved output
+    for model, window in (('gpt-4o', 128000), ('claude-3-5-sonnet', 200000)):
+        packed = 1000 + int((window - 2000 - 1000) * 0.95)
+        assert 1900 < output_limit(model, packed) <= window - packed
+
+
+def test_scoring_prefers_valuable_items():
+    assert score_commit({'type': 'feature'}) > score_commit({'type': 'chore'})
+    assert score_commit({'type': 'chore', 'breaking': True}) > score_commit({'type': 'feature'})
+    assert score_commit({'type': 'bug', 'subject': 'fix crash (#12)'}) > score_commit({'type': 'bug'})
+    assert score_issue({'labels': [{'name': 'Bug'}]}) > score_issue({'labels': ['wontfix']})
+
+
+def test_pack_respects_budget_and_reports_drops():
+    commits = [{'subject': f'chore: bump dep {i}', 'type': 'chore'} for i in range(50)]
+    commits.insert(25, {'subject': 'feat: new exporter', 'type': 'feature'})
+    prepared = []
+    result = pack(commits, 60, json.dumps, score_commit, prepare=prepared.extend, batch_size=8)
+
+    assert result.tokens <= 60
+    assert commits[25] in result.included
+    assert len(result.included) + len(result.dropped) == len(commits)
+    assert result.included == [c for c in commits if c in result.included]
+    assert len(prepared) < len(commits)
+    assert result.report()['dropped'] == len(result.dropped)
+
+
+def test_pack_rescores_a_batch_after_loading_bodies():
+    commits = [{'hash': f'c{i}', 'subject': f'fix: parser edge case {i}', 'type': 'bug'} for i in range(4)]
+    bodies = {'c2': 'Closes #41 and #42.'}
+
+    def load_bodies(batch):
+        for commit in batch:
+            commit.setdefault('body', bodies.get(commit['hash'], ''))
+
+    cost = count_tokens(json.dumps({**commits[2], 'body': bodies['c2']}))
+    result = pack(commits, cost, json.dumps, score_commit, prepare=load_bodies)
+    # The issue references only visible in the body win the single slot
+    assert [c['hash'] for c in result.included] == ['c2']
+
+
+def test_render_json_matches_list_dump():
+    records = [{'a': 1, 'b': [1, 2]}, {'c': 'x'}]
+    assert join_json([render_json(r) for r in records]) == json.dumps(records, indent=2)
+    assert count_tokens('') == 0
@@ -0,0 +1,52 @@
+import json
+
+import pytest
+
+from src.prompt_packer import count_tokens
+from src.prompt_serialization import (
+    cheapest_format, render_record, serialize, template_formats, token_report
+)
+
+RECORDS = [
+    {'subject': 'feat: add export', 'type': 'feature', 'author': 'Jane Doe'},
+    {'subject': 'fix: tab\there\nand newline', 'type': 'bug', 'author': 'Bob Smith'},
+    {'subject': 'docs: readme', 'type': 'docs', 'author': 'Jane Doe', 'labels': ['a', 'b']},
+]
+
+
+def test_json_formats_round_trip():
+    assert json.loads(serialize(RECORDS, 'json')) == RECORDS
+    assert json.loads(serialize(RECORDS, 'json-pretty')) == RECORDS
+
+
+def test_tsv_has_one_header_and_escaped_rows():
+    lines = serialize(RECORDS, 'tsv').split('\n')
+    assert lines[0] == 'subject\ttype\tauthor\tlabels'
+    assert len(lines) == 4
+    assert lines[2] == 'fix: tab here\\nand newline\tbug\tBob Smith\t'
+    assert lines[3].endswith('\ta,b')
+
+
+def test_tsv_legend_aliases_repeated_authors():
+    text = serialize(RECORDS, 'tsv-legend')
+    assert text.split('\n')[0] == 'authors: A1=Jane Doe; A2=Bob Smith'
+    assert text.count('Jane Doe') == 1
+    # Packing cost of a row never under-counts the aliased row
+    assert count_tokens(render_record(RECORDS[0], 'tsv-legend', list(RECORDS[2]))) >= \
+        count_tokens(text.split('\n')[2])
+
+
+def test_report_and_cheapest_format():
+    report = token_report(RECORDS * 10)
+    assert report['json'] < report['json-pretty']
+    fmt, _ = cheapest_format(RECORDS * 10, ['json-pretty', 'tsv'])
+    assert fmt == 'tsv'
+    assert cheapest_format(RECORDS, ['json'])[0] == 'json'
+
+
+def test_template_formats_hint():
+    formats, body = template_formats('<!-- formats: json, tsv -->\nCommits: {commits}')
+    assert formats == ['json', 'tsv'] and body == 'Commits: {commits}'
+    assert template_formats('Commits: {commits}') == (None, 'Commits: {commits}')
+    with pytest.raises(ValueError):
+        template_formats('<!-- formats: yaml -->\n')
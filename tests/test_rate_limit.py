@@ -0,0 +1,124 @@
+import asyncio
+
+import pytest
+
+import src.rate_limit
+import src.resilience
+from src.llm_service import LLMResponse, LLMService
+from src.rate_limit import AdmissionController, Limiter, RateLimitTimeout
+
+
+class Clock:
+    now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_token_bucket_reserves_refills_and_reconciles():
+    clock = Clock()
+    limiter = Limiter('openai', concurrency=2, tokens_per_minute=600, clock=clock)
+    assert limiter.fits(500)
+    limiter.take(500)
+    assert not limiter.fits(500)
+    limiter.release(500 - 120)  # the call used 120 of the 500 reserved tokens
+    assert limiter.tokens == pytest.approx(480) and limiter.in_flight == 0
+    limiter.take(480)
+    clock.now = 30  # half a minute refills half the bucket
+    assert limiter.fits(300) and not limiter.fits(301)
+    assert not limiter.fits(10_000)
+    clock.now = 90  # larger than the bucket: admitted once it is full
+    assert limiter.fits(10_000)
+
+
+def test_concurrency_cap_queues_in_order():
+    controller = AdmissionController({'providers': {'openai': {'concurrency': 1}}})
+    order = []
+
+    async def call(name):
+        ticket = await controller.acquire('openai', 'gpt-4', 10)
+        order.append(name)
+        await asyncio.sleep(0.01)
+        controller.release(ticket, 10)
+
+    async def main():
+        await asyncio.gather(*(call(i) for i in range(3)))
+
+    asyncio.run(main())
+    assert order == [0, 1, 2]
+    assert controller.snapshot()['limiters']['providers:openai']['in_flight'] == 0
+
+
+def test_flows_are_served_round_robin():
+    controller = AdmissionController({'providers': {'openai': {'concurrency': 1}}})
+    served = []
+
+    async def call(flow):
+        ticket = await controller.acquire('openai', 'gpt-4', 1, flow=flow)
+        served.append(flow)
+        await asyncio.sleep(0.01)
+        controller.release(ticket, 1)
+
+    async def main():
+        big = [asyncio.create_task(call('big')) for _ in range(4)]
+        await asyncio.sleep(0)
+        await asyncio.gather(call('small'), *big)
+
+    asyncio.run(main())
+    # The small request is served second, not behind the whole big flow
+    assert served == ['big', 'small', 'big', 'big', 'big']
+
+
+def test_waiter_times_out_and_gives_up_its_place():
+    controller = AdmissionController({'providers': {'openai': {'concurrency': 1}}})
+
+    async def main():
+        held = await controller.acquire('openai', 'gpt-4', 1)
+        with pytest.raises(RateLimitTimeout):
+            await controller.acquire('openai', 'gpt-4', 1, timeout=0.05)
+        controller.release(held)
+        return controller.snapshot()
+
+    snapshot = asyncio.run(main())
+    assert snapshot['waiting'] == {} and snapshot['limiters']['providers:openai']['in_flight'] == 0
+
+
+def test_service_reconciles_reservation_with_reported_usage(monkeypatch):
+    monkeypatch.setattr(src.rate_limit, '_controller', None)
+    monkeypatch.setattr(src.resilience, '_breakers', {})
+    service = LLMService({'llm': {'cache': False, 'rate_limits': {
+        'providers': {'openai': {'concurrency': 2, 'tokens_per_minute': 100_000}}}}})
+
+    async def fake(parts, model, temperature):
+        return LLMResponse('notes', 'stop', {'input_tokens': 300, 'output_tokens': 200})
+
+    service.providers['openai'] = fake
+    assert asyncio.run(service.call_llm('Summarize', 'gpt-4')) == 'notes'
+    limiter = src.rate_limit.get_admission_controller().snapshot()['limiters']['providers:openai']
+    assert limiter['in_flight'] == 0
+    assert 99_400 <= limiter['tokens_available'] <= 99_600
+
+
+def test_admission_timeout_frees_the_half_open_probe(monkeypatch):
+    monkeypatch.setattr(src.rate_limit, '_controller', None)
+    breaker = src.resilience.CircuitBreaker('openai')
+    breaker.state = src.resilience.HALF_OPEN
+    monkeypatch.setattr(src.resilience, '_breakers', {'openai': breaker})
+    service = LLMService({'llm': {'cache': False, 'rate_limits': {
+        'queue_timeout': 0.05, 'providers': {'openai': {'concurrency': 1}}}}})
+
+    async def fake(parts, model, temperature):
+        return LLMResponse('notes', 'stop', {'input_tokens': 3, 'output_tokens': 1})
+
+    service.providers['openai'] = fake
+
+    async def main():
+        controller = src.rate_limit.get_admission_controller(service.llm_config['rate_limits'])
+        held = await controller.acquire('openai', 'gpt-4', 1)
+        with pytest.raises(RateLimitTimeout):
+            await service.call_llm('Summarize', 'gpt-4')
+        controller.release(held)
+        return await service.call_llm('Summarize', 'gpt-4')
+
+    assert asyncio.run(main()) == 'notes'
+    assert breaker.state == src.resilience.CLOSED
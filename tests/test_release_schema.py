@@ -0,0 +1,43 @@
+import pytest
+
+from src.release_schema import notes_from_markdown, parse_notes
+from src.renderers import render, render_confluence, render_email, render_slack
+
+NOTES = {
+    'title': 'Release v2.0.0',
+    'summary': 'Faster & safer.',
+    'sections': [
+        {'heading': 'Highlights', 'items': [{'text': 'New <b>engine</b>', 'refs': ['#12', 'abc1234']}]},
+        {'heading': 'Known Issues', 'items': []},
+    ],
+}
+
+
+def test_parse_notes_accepts_fenced_json_and_reports_schema_errors():
+    assert parse_notes('```json\n{"title": "T", "summary": "", "sections": []}\n```')['title'] == 'T'
+    with pytest.raises(ValueError, match=r'sections\[0\].items\[0\] needs a string text'):
+        parse_notes('{"title": "T", "summary": "", "sections": [{"heading": "H", "items": [{"refs": []}]}]}')
+    with pytest.raises(ValueError, match='not valid JSON'):
+        parse_notes('# Release\n- item')
+
+
+def test_markdown_fallback_keeps_sections_and_refs():
+    notes = notes_from_markdown('# Release v1\n\nSmall fixes.\n\n## Bug Fixes\n- Fix crash (#4, abc1234)\n* Tidy\n')
+    assert notes['title'] == 'Release v1' and notes['summary'] == 'Small fixes.'
+    assert notes['sections'] == [{'heading': 'Bug Fixes', 'items': [
+        {'text': 'Fix crash', 'refs': ['#4', 'abc1234']}, {'text': 'Tidy', 'refs': []}]}]
+
+
+def test_renderers_derive_every_format_from_the_notes():
+    assert render(NOTES, 'markdown') == (
+        '# Release v2.0.0\n\nFaster & safer.\n\n## Highlights\n- New <b>engine</b> (#12, abc1234)\n\n## Known Issues\n'
+    )
+    assert '<li>New &lt;b&gt;engine&lt;/b&gt; (<code>#12</code>, <code>abc1234</code>)</li>' in render_confluence(NOTES)
+    slack = render_slack(NOTES, 'v2.0.0', 'acme/app')
+    assert slack['blocks'][0]['text']['text'] == '🚀 acme/app - Release v2.0.0'
+    assert slack['blocks'][2]['text']['text'] == '*Highlights*\n• New &lt;b&gt;engine&lt;/b&gt; (#12, abc1234)'
+    assert slack['blocks'][-1]['type'] == 'actions'  # empty sections are skipped
+    email = render_email(NOTES, 'v2.0.0')
+    assert email['subject'] == 'Release Notes - v2.0.0' and '<h2>Highlights</h2>' in email['html']
+    with pytest.raises(ValueError):
+        render(NOTES, 'pdf')
@@ -0,0 +1,94 @@
+import asyncio
+import random
+
+import pytest
+
+import src.resilience
+from src.llm_service import LLMResponse, LLMService
+from src.resilience import CircuitBreaker, CircuitOpenError, backoff_delays, is_retryable
+
+
+class Clock:
+    now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class StatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f'HTTP {status_code}')
+        self.status_code = status_code
+
+
+def test_breaker_opens_probes_and_closes():
+    clock = Clock()
+    breaker = CircuitBreaker('openrouter', {'min_calls': 3, 'failure_rate': 0.5, 'open_seconds': 10}, clock)
+    breaker.record_success(0.2)
+    for _ in range(2):
+        breaker.record_failure(1.0, StatusError(503))
+    assert breaker.state == 'open'
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+
+    clock.now = 10
+    assert breaker.allow() and not breaker.allow()  # a single half-open probe
+    breaker.record_failure(1.0, StatusError(503))
+    assert breaker.snapshot()['state'] == 'open' and breaker.open_seconds == 20
+
+    clock.now = 30
+    assert breaker.allow()
+    breaker.record_success(0.3)
+    assert breaker.snapshot()['state'] == 'closed'
+
+
+def test_retryable_errors_and_backoff_bounds():
+    assert is_retryable(StatusError(429)) and is_retryable(StatusError(502))
+    assert not is_retryable(StatusError(400)) and not is_retryable(ValueError('no key'))
+    delays = list(backoff_delays(5, 0.5, 4.0, random.Random(1)))
+    assert len(delays) == 5 and all(0 <= d <= min(4.0, 0.5 * 2 ** i) for i, d in enumerate(delays))
+
+
+def test_service_retries_then_fails_fast(monkeypatch):
+    monkeypatch.setattr(src.resilience, '_breakers', {})
+    service = LLMService({'llm': {'cache': False, 'resilience': {
+        'retries': 2, 'backoff_base': 0.001, 'min_calls': 6, 'open_seconds': 60}}})
+    attempts = []
+
+    async def flaky(parts, model, temperature):
+        attempts.append(model)
+        if len(attempts) < 3:
+            raise StatusError(503)
+        return LLMResponse('ok')
+
+    async def down(parts, model, temperature):
+        attempts.append(model)
+        raise StatusError(500)
+
+    service.providers['openai'] = flaky
+    assert asyncio.run(service.call_llm('p', 'gpt-4')) == 'ok' and len(attempts) == 3
+
+    service.providers['openai'] = down
+    with pytest.raises(StatusError):
+        asyncio.run(service.call_llm('p', 'gpt-4'))
+    assert src.resilience.breaker_states()['openai']['state'] == 'open'
+    attempts.clear()
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(service.call_llm('p', 'gpt-4'))
+    assert attempts == []
+
+
+def test_wrapped_local_connection_errors_are_retried_and_counted(monkeypatch):
+    import socket
+
+    monkeypatch.setattr(src.resilience, '_breakers', {})
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    monkeypatch.setenv('LOCAL_LLM_BASE_URL', f'http://127.0.0.1:{port}')  # nothing listening
+    service = LLMService({'llm': {'cache': False, 'resilience': {'retries': 1, 'backoff_base': 0.001}}})
+
+    with pytest.raises(ValueError, match='local LLM') as raised:
+        asyncio.run(service.call_llm('p', 'mistral'))
+    assert is_retryable(raised.value)
+    assert src.resilience.breaker_states()['local']['calls'] == 2
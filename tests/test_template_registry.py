@@ -0,0 +1,95 @@
+import os
+
+import pytest
+
+from src.template_registry import TemplateRegistry, compile_template, find_templates_dir
+
+
+def test_render_matches_str_format():
+    text = 'v{version!r} on {date:>12} -- {{literal}} {commits}'
+    data = {'version': '1.0', 'date': '2024-01-01', 'commits': '[]'}
+    assert compile_template(text).render(**data) == text.format(**data)
+
+
+def test_validation_reports_placeholder_problems():
+    assert compile_template('{version} {commits}').is_prompt
+    unknown = compile_template('{version} {highlights}')
+    assert unknown.unknown_fields == ['highlights']
+    with pytest.raises(ValueError, match='highlights'):
+        unknown.check_prompt()
+    broken = compile_template('{version')
+    assert broken.errors and not broken.is_prompt
+    assert compile_template('{0}').errors
+
+
+def test_registry_reloads_changed_and_removed_files(tmp_path):
+    (tmp_path / 'prompt.md').write_text('<!-- formats: tsv -->\nA {commits}', encoding='utf-8')
+    registry = TemplateRegistry(tmp_path, check_interval=0)
+    assert registry.get('prompt.md').formats == ['tsv']
+    assert registry.prompt_template('users').render(commits='x') == 'A x'
+
+    path = tmp_path / 'prompt_users.md'
+    path.write_text('B {commits}', encoding='utf-8')
+    assert registry.prompt_template('users').render(commits='x') == 'B x'
+
+    path.write_text('C {commits} {version}', encoding='utf-8')
+    os.utime(path, ns=(1, 1))
+    assert registry.get('prompt_users').fields == ['commits', 'version']
+
+    path.unlink()
+    assert registry.get('prompt_users') is None
+    assert [t.name for t in registry.templates()] == ['prompt']
+
+
+def test_split_moves_variable_paragraphs_after_the_stable_prefix():
+    compiled = compile_template('Release {version}\n\nWrite for {audience}.\n\nCommits:\n{commits}\n\n\nBe brief.')
+    prefix, suffix = compiled.split()
+    assert prefix.render(audience='users') == 'Write for users.\n\nBe brief.'
+    # Labels on their own line stay with the data below them
+    assert suffix.render(version='1.0', commits='[]') == 'Release 1.0\n\nCommits:\n[]'
+    assert compile_template('{commits}').split()[0].text == ''
+
+
+def test_shipped_templates_keep_stable_text_in_the_prefix():
+    registry = TemplateRegistry(find_templates_dir())
+    for name in ('prompt', 'prompt_users', 'prompt_developers', 'prompt_managers', 'map_summary', 'reduce_notes'):
+        compiled = registry.get(name)
+        prefix, suffix = compiled.split()
+        assert 'audience' in prefix.fields and 'version' not in prefix.fields
+        assert suffix.text.startswith('Release data:\n') and suffix.text.count('Release data:') == 1
+        # The data already comes last, so splitting does not reorder anything
+        assert prefix.text + '\n\n' + suffix.text == compiled.text.strip('\n')
+
+
+def test_readers_see_a_complete_set_during_reloads(tmp_path):
+    import threading
+
+    for name in ('prompt', 'prompt_users', 'prompt_developers'):
+        (tmp_path / f'{name}.md').write_text(f'{name} {{commits}}', encoding='utf-8')
+    registry = TemplateRegistry(tmp_path, check_interval=0)
+    errors, done = [], threading.Event()
+
+    def read():
+        while not done.is_set():
+            try:
+                assert len(registry.templates()) in (3, 4)
+                assert registry.prompt_template('users').name == 'prompt_users'
+            except Exception as e:
+                errors.append(e)
+                return
+
+    readers = [threading.Thread(target=read) for _ in range(4)]
+    for reader in readers:
+        reader.start()
+    extra = tmp_path / 'extra.md'
+    for n in range(200):
+        # Added and removed files change the mapping's size while readers iterate it
+        if n % 2:
+            extra.unlink()
+        else:
+            extra.write_text('{commits}', encoding='utf-8')
+        registry.reload()
+    done.set()
+    for reader in readers:
+        reader.join()
+    assert errors == []
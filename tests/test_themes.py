@@ -0,0 +1,43 @@
+import pytest
+
+pytest.importorskip('scipy')
+
+from src.themes import cluster_themes, commit_terms, theme_lookup
+
+
+def _commits():
+    topics = {
+        'auth': ['login', 'token', 'oauth', 'session'],
+        'export': ['pdf', 'csv', 'download', 'report'],
+    }
+    commits = []
+    for i in range(40):
+        name = 'auth' if i % 2 else 'export'
+        words = topics[name]
+        commits.append({
+            'subject': f'feat({name}): add {words[i % 4]} {words[(i + 1) % 4]} handling',
+            'files': [f'src/{name}/module.py'],
+        })
+    return commits
+
+
+def test_commit_terms_use_description_scope_and_paths():
+    terms = commit_terms({'subject': 'fix(api): handle token refresh', 'files': ['src/api/auth.py', 'README']})
+    assert terms == ['handle', 'token', 'refresh', 'api', 'path:src/api']
+
+
+def test_themes_separate_topics_and_are_labelled():
+    commits = _commits()
+    issues = [{'title': 'pdf download broken', 'labels': [{'name': 'bug'}]},
+              {'title': 'oauth login loop', 'labels': []}]
+    themes = cluster_themes(commits, issues, max_themes=2)
+
+    assert len(themes) == 2
+    by_path = {theme.paths[0]: theme for theme in themes}
+    assert set(by_path) == {'src/auth', 'src/export'}
+    assert all('auth' in c['subject'] for c in by_path['src/auth'].commits)
+    assert by_path['src/export'].issues == [issues[0]]
+    assert 'export' in by_path['src/export'].terms
+
+    labels = theme_lookup(themes)
+    assert len(labels) == len(commits) + len(issues)
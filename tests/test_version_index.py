@@ -0,0 +1,37 @@
+from src.version_index import SemVer, TagIndex, bump_level
+
+TAGS = ['v1.0.0', 'v1.2.0-rc.1', 'v1.2.0', 'v1.1.0', 'v1.2.0-beta.2', 'v1.2.0-beta.10', 'nightly', 'v1.10.0']
+
+
+def test_prerelease_ordering():
+    versions = sorted(SemVer.parse(t) for t in ['1.0.0', '1.0.0-rc.1', '1.0.0-alpha', '1.0.0-alpha.1', '1.0.0-beta'])
+    assert [str(v) for v in versions] == ['1.0.0-alpha', '1.0.0-alpha.1', '1.0.0-beta', '1.0.0-rc.1', '1.0.0']
+    assert SemVer.parse('v1.2.0-beta.2') < SemVer.parse('v1.2.0-beta.10')
+    assert SemVer.parse('release-candidate') is None
+
+
+def test_index_ordering_and_previous():
+    index = TagIndex.from_tags(TAGS)
+    assert index.tags()[0] == 'v1.10.0'
+    assert index.latest() == 'v1.10.0'
+    assert index.previous('v1.2.0') == 'v1.1.0'
+    assert index.previous('v1.2.0', include_prerelease=True) == 'v1.2.0-rc.1'
+    assert index.previous('v1.3.0') == 'v1.2.0'
+    assert index.other_tags == [{'tag': 'nightly'}]
+
+
+def test_between():
+    index = TagIndex.from_tags(TAGS)
+    assert index.between('v1.1.0', 'v1.2.0') == ['v1.2.0-beta.2', 'v1.2.0-beta.10', 'v1.2.0-rc.1', 'v1.2.0']
+    assert index.between('v1.1.0', 'v1.2.0', include_prerelease=False) == ['v1.2.0']
+    assert index.between('v1.0.0', 'v1.5.0', include_prerelease=False) == ['v1.1.0', 'v1.2.0']
+
+
+def test_suggest_next():
+    index = TagIndex.from_tags(TAGS)
+    assert index.suggest_next() == 'v1.10.1'
+    assert index.suggest_next(['bug', 'feature']) == 'v1.11.0'
+    assert index.suggest_next([{'type': 'bug', 'breaking': True}]) == 'v2.0.0'
+    assert TagIndex.from_tags(['0.3.1']).suggest_next(['breaking']) == '0.4.0'
+    assert TagIndex.from_tags([]).suggest_next() == 'v1.0.0'
+    assert bump_level(['docs', 'chore']) == 'patch'